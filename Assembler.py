@@ -0,0 +1,268 @@
+"""
+Assembler.py
+
+Two-pass assembler for the instructions the simulator supports. Source looks like:
+
+            .data
+    array:  .word 0x101, 0x110, 17      # comments run to the end of the line
+            .text
+    main:   addi $t1, $zero, 1
+    loop:   lw   $t0, 0($a0)
+            beq  $t0, $t1, done
+            addi $a0, $a0, 4
+            j    loop
+    done:
+
+The first pass splits every line into labels, a directive or an instruction and its operands, and gives each label
+its address. The second pass resolves labels and encodes each instruction straight into a 32-bit machine word from
+opcode/funct tables with shifts and masks (no binary strings), so a 100k line source assembles in a fraction of a
+second.
+
+Branch targets and jump targets may be labels or numbers; a number is used as the raw field value, just like the
+arguments of Instruction (the branch offset in words, or the jump address field). lw/sw accept both "offset($rs)"
+and the "$rt, $rs, offset" form used with Instruction, and the offset may be a data label.
+"""
+import re
+from array import array
+from collections import namedtuple
+
+from Instruction import compact_instruction, REGISTER_NAMES, REGISTER_NUMBERS, WORD_MASK, WORD_TYPECODE
+
+# name -> (format, opcode, funct)
+INSTRUCTION_TABLE = {'add': ('R', 0, 32), 'sub': ('R', 0, 34), 'and': ('R', 0, 36), 'or': ('R', 0, 37),
+                     'xor': ('R', 0, 38), 'slt': ('R', 0, 42), 'mult': ('R', 0, 24), 'div': ('R', 0, 26),
+                     'addi': ('I', 8, 0), 'andi': ('I', 12, 0), 'lw': ('M', 35, 0), 'sw': ('M', 43, 0),
+                     'beq': ('B', 4, 0), 'bne': ('B', 5, 0), 'j': ('J', 2, 0)}
+
+OPERAND_COUNTS = {'R': 3, 'I': 3, 'M': (2, 3), 'B': 3, 'J': 1}
+
+LABEL_PATTERN = re.compile(r'[A-Za-z_.][\w.]*$')
+
+# words: array of the encoded instruction words; statements: list of (mnemonic, operand tuple) in program order, with
+# labels resolved, ready for Instruction; data: dictionary of address -> word for the initial data image; labels:
+# dictionary of label -> address
+AssembledProgram = namedtuple('AssembledProgram', ['text_address', 'words', 'statements', 'data_address', 'data',
+                                                   'labels'])
+
+
+def _error(line_number, message):
+    return Exception("(Assembler): Error! line %d: %s" % (line_number, message))
+
+
+def _parse_number(text):
+    """
+    :return: the integer value of a decimal, hex (0x), octal (0o) or binary (0b) literal, or None if text isn't one
+    """
+    try:
+        return int(text, 0)
+    except ValueError:
+        return None
+
+
+class Assembler(object):
+    def __init__(self, text_address=0, data_address=0):
+        """
+        :param text_address: address of the first instruction, unless the source gives one with .text
+        :param data_address: address of the first data word, unless the source gives one with .data
+        """
+        self.text_address = text_address
+        self.data_address = data_address
+
+    @staticmethod
+    def _register(operand, line_number):
+        number = REGISTER_NUMBERS.get(operand)
+        if number is None:
+            number = REGISTER_NUMBERS.get(operand.lower())
+            if number is None:
+                raise _error(line_number, "unknown register '%s'" % operand)
+        return number
+
+    @staticmethod
+    def _resolve(operand, labels, line_number):
+        """
+        :return: value of a numeric literal, or address of a label
+        """
+        value = labels.get(operand)  # labels can't start with a digit, so they never shadow a number
+        if value is None:
+            value = _parse_number(operand)
+            if value is None:
+                raise _error(line_number, "undefined label '%s'" % operand)
+        return value
+
+    def _first_pass(self, source):
+        """
+        Splits the source into statements and assigns every label its address
+        :return: (text statements, data statements, labels, text address, data address). Statements are
+        (line number, address, mnemonic, operands).
+        """
+        text, data, labels = [], [], {}
+        text_address, data_address = self.text_address, self.data_address
+        text_pc, data_pc = text_address, data_address
+        in_text = True
+        text_started = False
+
+        for line_number, line in enumerate(source.splitlines(), 1):
+            comment = line.find('#')
+            if comment >= 0:
+                line = line[:comment]
+            line = line.strip()
+            while line:
+                colon = line.find(':')
+                if colon < 0:
+                    break
+                label = line[:colon].strip()
+                if not LABEL_PATTERN.match(label):
+                    raise _error(line_number, "bad label '%s'" % label)
+                if label in labels:
+                    raise _error(line_number, "label '%s' is defined twice" % label)
+                labels[label] = text_pc if in_text else data_pc
+                line = line[colon + 1:].strip()
+            if not line:
+                continue
+
+            parts = line.split(None, 1)
+            mnemonic = parts[0].lower()
+            operands = ''.join(parts[1].split()).split(',') if len(parts) > 1 else []  # operands hold no spaces
+
+            if mnemonic == '.text' or mnemonic == '.data':
+                address = None
+                if operands:
+                    address = _parse_number(operands[0])
+                    if address is None or address % 4 or len(operands) > 1:
+                        raise _error(line_number, "%s takes a single word aligned address" % mnemonic)
+                in_text = mnemonic == '.text'
+                if in_text and address is not None:
+                    if text_started and address != text_pc:
+                        raise _error(line_number, "instruction memory has to be contiguous")
+                    text_address = text_pc = address
+                elif address is not None:
+                    data_pc = address
+                    if not data:
+                        data_address = address
+            elif mnemonic == '.word':
+                if in_text:
+                    raise _error(line_number, ".word is only allowed in .data")
+                if not operands or '' in operands:
+                    raise _error(line_number, ".word needs at least one value")
+                for operand in operands:
+                    data.append((line_number, data_pc, operand))
+                    data_pc += 4
+            elif mnemonic[0] == '.':
+                raise _error(line_number, "unknown directive '%s'" % mnemonic)
+            else:
+                if not in_text:
+                    raise _error(line_number, "instructions are only allowed in .text")
+                text.append((line_number, text_pc, mnemonic, operands))
+                text_pc += 4
+                text_started = True
+
+        return text, data, labels, text_address, data_address
+
+    def _encode(self, statement, labels):
+        """
+        Encodes one instruction
+        :param statement: (line number, address, mnemonic, operands)
+        :return: (machine word, (mnemonic, operand tuple for Instruction))
+        """
+        line_number, address, mnemonic, operands = statement
+        entry = INSTRUCTION_TABLE.get(mnemonic)
+        if entry is None:
+            raise _error(line_number, "unknown instruction '%s'" % mnemonic)
+        form, opcode, funct = entry
+        count = OPERAND_COUNTS[form]
+        if len(operands) != count and not (isinstance(count, tuple) and len(operands) in count):
+            raise _error(line_number, "wrong number of operands for %s" % mnemonic)
+        register = self._register
+
+        if form == 'R':
+            rd, rs, rt = register(operands[0], line_number), register(operands[1], line_number), \
+                register(operands[2], line_number)
+            word = (rs << 21) | (rt << 16) | (rd << 11) | funct
+            return word, (mnemonic, (REGISTER_NAMES[rd], REGISTER_NAMES[rs], REGISTER_NAMES[rt]))
+
+        if form == 'J':
+            target = self._resolve(operands[0], labels, line_number)
+            if operands[0] in labels:
+                target = (target >> 2) & 0x3FFFFFF
+            elif not 0 <= target < (1 << 26):
+                raise _error(line_number, "jump address field out of range")
+            return (opcode << 26) | target, (mnemonic, (str(target),))
+
+        if form == 'M':
+            rt = register(operands[0], line_number)
+            if len(operands) == 3:
+                base, offset_text = operands[1], operands[2]
+            else:
+                operand = operands[1]
+                open_paren = operand.find('(')
+                if open_paren < 0 or not operand.endswith(')'):
+                    raise _error(line_number, "expected offset($register), got '%s'" % operand)
+                base, offset_text = operand[open_paren + 1:-1], operand[:open_paren] or '0'
+            rs = register(base, line_number)
+            immediate = self._resolve(offset_text, labels, line_number)
+        elif form == 'I':
+            rt, rs = register(operands[0], line_number), register(operands[1], line_number)
+            immediate = self._resolve(operands[2], labels, line_number)
+        else:  # branch: the first two operands are rs and rt
+            rs, rt = register(operands[0], line_number), register(operands[1], line_number)
+            immediate = self._resolve(operands[2], labels, line_number)
+            if operands[2] in labels:
+                immediate = (immediate - address - 4) >> 2
+                if not -0x8000 <= immediate < 0x8000:
+                    raise _error(line_number, "branch target '%s' is out of range" % operands[2])
+            word = (opcode << 26) | (rs << 21) | (rt << 16) | self._immediate(immediate, line_number)
+            return word, (mnemonic, (REGISTER_NAMES[rs], REGISTER_NAMES[rt], str(immediate)))
+
+        word = (opcode << 26) | (rs << 21) | (rt << 16) | self._immediate(immediate, line_number)
+        return word, (mnemonic, (REGISTER_NAMES[rt], REGISTER_NAMES[rs], str(immediate)))
+
+    @staticmethod
+    def _immediate(value, line_number):
+        if not -0x8000 <= value <= 0xFFFF:
+            raise _error(line_number, "immediate %d doesn't fit in 16 bits" % value)
+        return value & 0xFFFF
+
+    def assemble(self, source):
+        """
+        :param source: assembly source text
+        :return: AssembledProgram
+        """
+        text, data, labels, text_address, data_address = self._first_pass(source)
+
+        words = array(WORD_TYPECODE, bytes(4 * len(text)))
+        statements = [None] * len(text)
+        encode = self._encode
+        for index, statement in enumerate(text):
+            words[index], statements[index] = encode(statement, labels)
+
+        data_image = {}
+        for line_number, address, operand in data:
+            data_image[address] = self._resolve(operand, labels, line_number) & WORD_MASK
+
+        return AssembledProgram(text_address, words, statements, data_address, data_image, labels)
+
+
+def assemble(source, text_address=0, data_address=0):
+    """
+    Assembles source with a default Assembler
+    :return: AssembledProgram
+    """
+    return Assembler(text_address, data_address).assemble(source)
+
+
+def assemble_file(path, text_address=0, data_address=0):
+    """
+    Assembles a .s file
+    :return: AssembledProgram
+    """
+    with open(path) as source_file:
+        return assemble(source_file.read(), text_address, data_address)
+
+
+def instruction_list(program):
+    """
+    Builds the instruction objects for an assembled program, to hand to PipelineInterface and the other engines
+    :param program: AssembledProgram
+    :return: list of (shared) CompactInstruction objects
+    """
+    return [compact_instruction(mnemonic, *operands) for mnemonic, operands in program.statements]
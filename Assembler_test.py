@@ -0,0 +1,128 @@
+import unittest
+
+from Assembler import assemble, assemble_file, instruction_list
+from FunctionalSimulator import FunctionalSimulator
+from Instruction import Instruction, decode_asm_register
+from Interface_test import build_test_program
+
+TEST_PROGRAM_SOURCE = """
+# TestProgram.py, with labels instead of hand computed offsets
+        .data 0x10
+        .word 0x0101, 0x0110, 0x0011, 0x00F0, 0x00FF
+
+        .text
+        addi $t7, $zero, 4
+        addi $t6, $zero, 32512
+        addi $t5, $zero, 8
+        addi $t3, $zero, 256
+        addi $t1, $zero, 1
+        addi $t8, $zero, 255
+loop:   slt  $t2, $a1, $t1
+        beq  $t2, $t1, exit
+        sub  $a1, $a1, $t1
+        lw   $t0, 0($a0)
+        slt  $t4, $t3, $t0
+        beq  $t4, $zero, else
+        div  $v0, $v0, $t5
+        or   $v1, $v1, $v0
+        sw   $t6, 0($a0)
+        j    end
+else:   mult $s2, $s2, $t7
+        xor  $s3, $s3, $s2
+        sw   $t8, 0($a0)
+        j    end
+end:    addi $a0, $a0, 4
+        j    loop
+exit:   addi $t8, $zero, 0
+"""
+
+
+class AssemblerTest(unittest.TestCase):
+    def test_matches_instruction_encoding(self):
+        program = assemble(TEST_PROGRAM_SOURCE)
+        instructions, registers, memory = build_test_program()
+        self.assertEqual([int(instruction.binary_version(), 2) for instruction in instructions], list(program.words))
+        self.assertEqual({'loop': 24, 'else': 64, 'end': 80, 'exit': 88}, program.labels)
+        self.assertEqual({16: 0x101, 20: 0x110, 24: 0x11, 28: 0xF0, 32: 0xFF}, program.data)
+        self.assertEqual((0, 16), (program.text_address, program.data_address))
+
+    def test_runs_like_test_program(self):
+        program = assemble(TEST_PROGRAM_SOURCE)
+        instructions, registers, memory = build_test_program()
+        expected = FunctionalSimulator(instructions, 0, list(registers), dict(memory))
+        expected.run()
+        assembled = FunctionalSimulator(instruction_list(program), program.text_address, list(registers),
+                                        dict(program.data))
+        assembled.run()
+        self.assertEqual(list(expected.retrieve_register_list()), list(assembled.retrieve_register_list()))
+
+    def test_operand_forms(self):
+        program = assemble("""
+            .text 0x100
+            lw $8, -4($a0)          # numeric register names
+            lw $t0, $a0, -4         # Instruction style
+            sw t1, ($sp)
+            lw $t2, value($zero)
+            beq $t0, $t1, 2         # numeric operands are raw field values
+            j 0x40
+            .data
+    value:  .word value, -1
+        """)
+        self.assertEqual(program.words[0], program.words[1])
+        self.assertEqual(Instruction('sw', '$t1', '$sp', '0').binary_version(), '{:032b}'.format(program.words[2]))
+        self.assertEqual(Instruction('lw', '$t2', '$zero', '0').binary_version(),
+                         '{:032b}'.format(program.words[3]))
+        self.assertEqual(Instruction('beq', '$t0', '$t1', '2').binary_version(), '{:032b}'.format(program.words[4]))
+        self.assertEqual(Instruction('j', '64').binary_version(), '{:032b}'.format(program.words[5]))
+        self.assertEqual({0: 0, 4: 0xFFFFFFFF}, program.data)
+        self.assertEqual(0x100, program.text_address)
+
+    def test_backward_branch_and_jump_labels(self):
+        program = assemble("""
+            .text 0x40
+    top:    addi $t0, $t0, -1
+            bne $t0, $zero, top
+            j top
+        """)
+        self.assertEqual(0xFFFE, program.words[1] & 0xFFFF)
+        self.assertEqual(0x40 >> 2, program.words[2] & 0x3FFFFFF)
+        self.assertEqual(('bne', ('$t0', '$zero', '-2')), program.statements[1])
+
+    def test_errors(self):
+        far_branch = "beq $t0, $t1, far\n" + "add $t0, $t0, $t0\n" * 40000 + "far: j 0"
+        bad_sources = [far_branch, "add $t0, $t1", "addi $t0, $t1, 70000", "nop", "beq $t0, $t1, nowhere",
+                       "add $t0, $t1, $x9", "a: addi $t0, $t0, 1\na: addi $t0, $t0, 1", ".data\nadd $t0, $t0, $t0", ".word 1",
+                       ".align 2", "lw $t0, 4", ".text 3", "add $t0, $t0, $t0\n.text 0x100", "9bad: j 0"]
+        for source in bad_sources:
+            self.assertRaises(Exception, assemble, source)
+        try:
+            assemble("\n\n  nop")
+        except Exception as e:
+            self.assertIn("line 3", str(e))
+
+    def test_assemble_file(self):
+        import os
+        import tempfile
+        handle, path = tempfile.mkstemp(suffix='.s')
+        try:
+            with os.fdopen(handle, 'w') as source_file:
+                source_file.write(TEST_PROGRAM_SOURCE)
+            self.assertEqual(list(assemble(TEST_PROGRAM_SOURCE).words), list(assemble_file(path).words))
+        finally:
+            os.remove(path)
+
+    def test_large_source(self):
+        lines = ['        .text', 'start:']
+        for index in range(100000):
+            if index % 3:
+                lines.append('l%d: addi $t%d, $t%d, %d  # comment' % (index, index % 8, (index + 1) % 8, index % 1000))
+            else:
+                lines.append('    beq $t0, $t1, l%d' % (index + 1))
+        lines.append('l100000:')
+        source = '\n'.join(lines)
+        program = assemble(source)
+        self.assertEqual(100000, len(program.words))
+
+
+if __name__ == '__main__':
+    unittest.main()
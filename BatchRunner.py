@@ -0,0 +1,169 @@
+"""
+BatchRunner.py
+
+Runs many independent simulations across every core with a ProcessPoolExecutor. Results are streamed back in the
+same order as the jobs, so a batch gives the same output no matter how many workers ran it.
+
+Command line use:
+    python BatchRunner.py jobs.json [--workers N] [--engine functional|pipeline]
+
+where jobs.json holds a list of jobs like:
+    {"program": [["addi", "$t7", "$zero", "4"], ["j", "0"]],
+     "starting_pc": 0,
+     "registers": {"a0": 16, "a1": 5},
+     "memory": {"16": 257, "20": 272},
+     "max_cycles": 10000}
+One JSON result is printed per line, in job order.
+"""
+import argparse
+import json
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from DataMemory import DataMemory
+from FunctionalSimulator import FunctionalSimulator
+from Instruction import compact_instruction, decode_asm_register
+from PipelineInterface import PipelineInterface
+
+# registers and memory are what the program starts with: a list of 32 register values and a dictionary of
+# address -> word (either may use binary strings or ints)
+SimulationJob = namedtuple('SimulationJob', ['instruction_list', 'registers', 'memory', 'max_cycles',
+                                             'starting_pc_address'])
+SimulationJob.__new__.__defaults__ = (None, 0)
+
+# touched_memory holds address -> value for every word whose value changed. error is None if the run succeeded;
+# otherwise registers, touched_memory and cycles are the state at the point of the fault (or None if the job couldn't
+# be set up).
+SimulationResult = namedtuple('SimulationResult', ['job_number', 'registers', 'touched_memory', 'cycles', 'halted',
+                                                   'error'])
+
+ENGINES = ['functional', 'pipeline']
+
+
+def _run_pipeline(job, memory):
+    """
+    Runs a job on the (integer datapath) pipeline
+    :return: (register list, cycles, halted, error message or None)
+    """
+    interface = PipelineInterface(job.instruction_list, job.starting_pc_address, list(job.registers), memory, True)
+    error = None
+    try:
+        interface.run(job.max_cycles)
+    except Exception as e:
+        error = str(e)
+    return list(interface.retrieve_register_list()), interface.cycles, interface.halted, error
+
+
+def _run_functional(job, memory):
+    """
+    Runs a job on the functional simulator (one cycle per instruction, like the single-cycle pipeline)
+    :return: (register list, cycles, halted, error message or None)
+    """
+    simulator = FunctionalSimulator(job.instruction_list, job.starting_pc_address, list(job.registers), memory)
+    error = None
+    try:
+        simulator.run(job.max_cycles)
+    except Exception as e:
+        error = str(e)
+    return list(simulator.retrieve_register_list()), simulator.instructions_executed, simulator.halted, error
+
+
+def run_job(job_number, job, engine='functional'):
+    """
+    Runs a single job. Any exception raised by the simulation is reported in the result rather than raised, along with
+    the registers, memory and cycle count at the point it was raised.
+    :param job_number: position of the job in its batch
+    :param job: SimulationJob
+    :param engine: 'functional' or 'pipeline'
+    :return: SimulationResult
+    """
+    try:
+        memory = DataMemory.from_dict(job.memory)
+        initial_image = bytes(memory.view())
+        if engine == 'functional':
+            registers, cycles, halted, error = _run_functional(job, memory)
+        elif engine == 'pipeline':
+            registers, cycles, halted, error = _run_pipeline(job, memory)
+        else:
+            raise Exception("(BatchRunner): Error! Unknown engine '%s'" % engine)
+    except Exception as e:
+        return SimulationResult(job_number, None, None, None, False, str(e))
+
+    final_image = bytes(memory.view())
+    touched_memory = {}
+    for address in range(0, len(final_image), 4):
+        if final_image[address:address + 4] != initial_image[address:address + 4]:
+            touched_memory[address] = memory.load_word(address)
+    return SimulationResult(job_number, registers, touched_memory, cycles, halted, error)
+
+
+def _run_numbered_job(arguments):
+    return run_job(*arguments)
+
+
+def run_batch(jobs, max_workers=None, engine='functional', chunk_size=1):
+    """
+    Fans the jobs out over a process pool and yields their results as they finish, in job order
+    :param jobs: iterable of SimulationJob
+    :param max_workers: number of worker processes (defaults to one per core)
+    :param engine: 'functional' or 'pipeline'
+    :param chunk_size: number of jobs handed to a worker at a time
+    :return: generator of SimulationResult
+    """
+    if engine not in ENGINES:
+        raise Exception("(BatchRunner): Error! Unknown engine '%s'" % engine)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        numbered_jobs = ((job_number, job, engine) for job_number, job in enumerate(jobs))
+        for result in executor.map(_run_numbered_job, numbered_jobs, chunksize=chunk_size):
+            yield result
+
+
+def job_from_json(description):
+    """
+    Builds a SimulationJob from its JSON description (see the module docstring)
+    :param description: dictionary loaded from JSON
+    :return: SimulationJob
+    """
+    instruction_list = [compact_instruction(*instruction) for instruction in description['program']]
+    registers = [0] * 32
+    for name, value in description.get('registers', {}).items():
+        registers[decode_asm_register(name.lower())] = value
+    memory = {int(address, 0): value for address, value in description.get('memory', {}).items()}
+    return SimulationJob(instruction_list, registers, memory, description.get('max_cycles'),
+                         description.get('starting_pc', 0))
+
+
+def result_to_json(result):
+    """
+    :param result: SimulationResult
+    :return: dictionary that can be dumped as JSON
+    """
+    touched_memory = None
+    if result.touched_memory is not None:
+        touched_memory = {str(address): value for address, value in result.touched_memory.items()}
+    return {'job': result.job_number, 'registers': result.registers, 'touched_memory': touched_memory,
+            'cycles': result.cycles, 'halted': result.halted, 'error': result.error}
+
+
+def main(argv=None, output=sys.stdout):
+    parser = argparse.ArgumentParser(description="Run a batch of independent MIPS simulations on every core.")
+    parser.add_argument('jobs', help="JSON file holding a list of jobs")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument('--engine', choices=ENGINES, default='functional', help="simulation engine to use")
+    arguments = parser.parse_args(argv)
+
+    with open(arguments.jobs) as jobs_file:
+        jobs = [job_from_json(description) for description in json.load(jobs_file)]
+
+    failures = 0
+    for result in run_batch(jobs, arguments.workers, arguments.engine):
+        if result.error is not None:
+            failures += 1
+        output.write(json.dumps(result_to_json(result)) + '\n')
+        output.flush()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from BatchRunner import SimulationJob, run_batch, run_job, job_from_json, main
+from FunctionalSimulator import FunctionalSimulator
+from Instruction import Instruction, create_sized_binary_num, decode_asm_register
+from Interface_test import build_test_program
+
+
+class BatchRunnerTest(unittest.TestCase):
+    def sweep_jobs(self, max_cycles=None):
+        instructions, registers, memory = build_test_program()
+        jobs = []
+        for a1 in range(0, 6):
+            lane = list(registers)
+            lane[decode_asm_register('a1')] = create_sized_binary_num(a1, 32)
+            jobs.append(SimulationJob(instructions, lane, memory, max_cycles))
+        return jobs
+
+    def test_run_job(self):
+        instructions, registers, memory = build_test_program()
+        result = run_job(0, SimulationJob(instructions, registers, memory))
+        simulator = FunctionalSimulator(instructions, 0, list(registers), dict(memory))
+        self.assertEqual(simulator.run(), result.cycles)
+        self.assertTrue(result.halted)
+        self.assertIsNone(result.error)
+        self.assertEqual(list(simulator.retrieve_register_list()), result.registers)
+        self.assertEqual({16: 0x7F00, 20: 0x7F00, 24: 0x00FF, 28: 0x00FF}, result.touched_memory)
+
+    def test_pipeline_engine_matches_functional_engine(self):
+        job = self.sweep_jobs()[5]
+        self.assertEqual(run_job(0, job, 'functional'), run_job(0, job, 'pipeline'))
+
+    def test_budget(self):
+        for engine in ['functional', 'pipeline']:
+            result = run_job(0, self.sweep_jobs(max_cycles=10)[5], engine)
+            self.assertEqual(10, result.cycles)
+            self.assertFalse(result.halted)
+
+    def test_budget_ends_on_last_instruction(self):
+        job = SimulationJob([Instruction('addi', '$t0', '$zero', '1')], [0] * 32, {}, 1)
+        for engine in ['functional', 'pipeline']:
+            self.assertTrue(run_job(0, job, engine).halted)
+
+    def test_errors_are_reported(self):
+        job = SimulationJob([Instruction('lw', '$t0', '$a0', '2')], [0] * 32, {})
+        result = run_job(3, job)
+        self.assertEqual(3, result.job_number)
+        self.assertTrue("aligned" in result.error)
+
+    def test_errors_report_the_state_at_the_fault(self):
+        # the sw and the addi before the misaligned lw have run when it faults
+        instructions = [Instruction('addi', '$t0', '$zero', '7'), Instruction('sw', '$t0', '$zero', '8'),
+                        Instruction('lw', '$t1', '$t0', '0'), Instruction('addi', '$t2', '$zero', '1')]
+        job = SimulationJob(instructions, [0] * 32, {})
+        for engine in ['functional', 'pipeline']:
+            result = run_job(0, job, engine)
+            self.assertTrue("aligned" in result.error)
+            self.assertEqual(7, result.registers[decode_asm_register('t0')])
+            self.assertEqual(0, result.registers[decode_asm_register('t2')])
+            self.assertEqual({8: 7}, result.touched_memory)
+            self.assertEqual(2, result.cycles)
+            self.assertFalse(result.halted)
+
+    def test_run_batch_is_ordered(self):
+        jobs = self.sweep_jobs()
+        results = list(run_batch(jobs, max_workers=2))
+        self.assertEqual(list(range(len(jobs))), [result.job_number for result in results])
+        self.assertEqual([run_job(number, job) for number, job in enumerate(jobs)], results)
+
+    def test_job_from_json(self):
+        job = job_from_json({'program': [['addi', '$t7', '$zero', '4']], 'registers': {'$a0': 16},
+                             'memory': {'0x10': 257}, 'max_cycles': 5})
+        self.assertEqual(16, job.registers[decode_asm_register('a0')])
+        self.assertEqual({16: 257}, job.memory)
+        self.assertEqual(5, job.max_cycles)
+        self.assertEqual(0, job.starting_pc_address)
+
+    def test_command_line(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'jobs.json')
+            with open(path, 'w') as jobs_file:
+                json.dump([{'program': [['addi', '$t0', '$a0', '1'], ['sw', '$t0', '$zero', '8']],
+                            'registers': {'a0': value}} for value in range(3)], jobs_file)
+            output = io.StringIO()
+            self.assertEqual(0, main([path, '--workers', '2'], output))
+            results = [json.loads(line) for line in output.getvalue().splitlines()]
+            self.assertEqual([0, 1, 2], [result['job'] for result in results])
+            self.assertEqual([{'8': 1}, {'8': 2}, {'8': 3}], [result['touched_memory'] for result in results])
+            self.assertEqual([2, 2, 2], [result['cycles'] for result in results])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
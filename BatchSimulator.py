@@ -0,0 +1,208 @@
+"""
+BatchSimulator.py
+
+Runs one program against many machine states at once, in lockstep, using NumPy. The N register files are kept as an
+(N, 32) uint32 array and the N data memories as an (N, words) uint32 array, so every instruction is executed for all
+of the lanes that are at its address with a handful of vectorized operations. Lanes that take a different branch
+direction are masked off until they reach the instruction being executed again (the lowest pending program counter
+is always executed next, so diverged lanes reconverge at the end of an if/else).
+
+Requires numpy.
+"""
+from DataMemory import DataMemory
+from Decoder import predecode_program
+from Faults import DivisionByZero, MemoryFault, UnsupportedInstruction
+from Instruction import to_word, WORD_MASK
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class BatchSimulator(object):
+    def __init__(self, instruction_list, starting_pc_address, register_files, data_memories):
+        """
+        Creates a batch of machine states that all run the same program
+        :param instruction_list: list of Instruction objects in the order they should appear in instruction memory,
+        or the program's machine words (see Decoder.py)
+        :param starting_pc_address: integer starting address for every lane's program counter, and base address of
+        instruction memory
+        :param register_files: (N, 32) array-like of register values, one row per lane
+        :param data_memories: (N, words) array-like of data memory words, one row per lane (word i is at byte
+        address 4 * i)
+        """
+        if numpy is None:
+            raise Exception("(BatchSimulator): Error! numpy is required for the batch simulator")
+        if len(instruction_list) == 0:
+            raise Exception("Instruction list must have at least one instruction present!")
+
+        self.base_address = int(starting_pc_address)
+        self.predecoded_instructions = predecode_program(instruction_list)
+
+        self.registers = numpy.array(register_files, dtype=numpy.uint32)
+        self.memories = numpy.array(data_memories, dtype=numpy.uint32)
+        if self.registers.ndim != 2 or self.registers.shape[1] != 32:
+            raise Exception("(BatchSimulator): Error! register_files must have the shape (N, 32)")
+        if self.memories.ndim != 2 or self.memories.shape[0] != self.registers.shape[0]:
+            raise Exception("(BatchSimulator): Error! data_memories must have the shape (N, words)")
+        self.registers[:, 0] = 0
+
+        self.lanes = self.registers.shape[0]
+        self.memory_words = self.memories.shape[1]
+        self.program_counters = numpy.full(self.lanes, self.base_address, dtype=numpy.int64)
+        self.instructions_executed = numpy.zeros(self.lanes, dtype=numpy.int64)
+        self.steps = 0  # number of (vectorized) instruction executions, across all lanes
+
+        self._signed_registers = self.registers.view(numpy.int32)  # zero-copy signed view for slt/div
+        self._end_address = self.base_address + 4 * len(self.predecoded_instructions)
+
+    @classmethod
+    def from_states(cls, instruction_list, starting_pc_address, register_lists, data_memory, memory_size=None):
+        """
+        Builds a batch from per-lane register lists and one data memory that every lane starts with
+        :param register_lists: list of register lists (binary strings or ints), one per lane
+        :param data_memory: dictionary or DataMemory that every lane starts with
+        :param memory_size: size of each lane's memory in bytes, if data_memory is a dictionary (defaults to the
+        same size DataMemory.from_dict would pick)
+        :return: BatchSimulator
+        """
+        if numpy is None:
+            raise Exception("(BatchSimulator): Error! numpy is required for the batch simulator")
+        if isinstance(data_memory, dict):
+            data_memory = DataMemory.from_dict(data_memory, memory_size)
+        byte_order = '>u4' if data_memory.byteorder == 'big' else '<u4'
+        words = numpy.frombuffer(data_memory.view(), dtype=byte_order).astype(numpy.uint32)
+
+        registers = numpy.array([[to_word(value) for value in register_list] for register_list in register_lists],
+                                dtype=numpy.uint32)
+        return cls(instruction_list, starting_pc_address, registers, numpy.tile(words, (len(register_lists), 1)))
+
+    def active_lanes(self):
+        """
+        :return: boolean array, True for lanes whose program counter is still inside instruction memory
+        """
+        pcs = self.program_counters
+        return (pcs >= self.base_address) & (pcs < self._end_address)
+
+    @property
+    def halted(self):
+        return not self.active_lanes().any()
+
+    def step(self):
+        """
+        Executes the instruction at the lowest pending program counter for every lane sitting at that address
+        :return: number of lanes that executed an instruction (0 once every lane has halted)
+        """
+        active = self.active_lanes()
+        if not active.any():
+            return 0
+        pc = int(self.program_counters[active].min())
+        lanes = numpy.nonzero(self.program_counters == pc)[0]
+        entry = self.predecoded_instructions[(pc - self.base_address) >> 2]
+        self._execute(entry, pc, lanes)
+        self.instructions_executed[lanes] += 1
+        self.steps += 1
+        return len(lanes)
+
+    def run(self, max_steps=None):
+        """
+        Steps until every lane has left instruction memory, or max_steps vectorized steps have been executed
+        :param max_steps: step budget for this call (None for no limit)
+        :return: number of steps executed by this call
+        """
+        count = 0
+        while max_steps is None or count < max_steps:
+            if self.step() == 0:
+                break
+            count += 1
+        return count
+
+    def _memory_index(self, entry, lanes):
+        """
+        Works out the word index of a lw/sw for each lane, checking alignment and bounds
+        :return: array of word indices
+        """
+        addresses = self.registers[lanes, entry.rs] + numpy.uint32(entry.immediate)
+        if (addresses & 3).any():
+            raise MemoryFault("(BatchSimulator): Error! Unaligned word address in lanes %s" %
+                              lanes[(addresses & 3) != 0].tolist())
+        indices = addresses >> 2
+        if (indices >= self.memory_words).any():
+            raise MemoryFault("(BatchSimulator): Error! Word address outside of data memory in lanes %s" %
+                              lanes[indices >= self.memory_words].tolist())
+        return indices
+
+    def _execute(self, entry, pc, lanes):
+        """
+        Executes a single instruction for the given lanes
+        :param entry: PredecodedInstruction
+        :param pc: address of the instruction
+        :param lanes: array of lane numbers at this address
+        :return: None
+        """
+        regs = self.registers
+        signed = self._signed_registers
+        next_pc = (pc + 4) & WORD_MASK
+        new_pc = next_pc
+
+        if entry.opcode == 0:
+            rs = regs[lanes, entry.rs]
+            rt = regs[lanes, entry.rt]
+            if entry.funct == 32:
+                result = rs + rt
+            elif entry.funct == 34:
+                result = rs - rt
+            elif entry.funct == 36:
+                result = rs & rt
+            elif entry.funct == 37:
+                result = rs | rt
+            elif entry.funct == 38:
+                result = rs ^ rt
+            elif entry.funct == 42:
+                result = (signed[lanes, entry.rs] < signed[lanes, entry.rt]).astype(numpy.uint32)
+            elif entry.funct == 24:
+                result = rs * rt  # the low 32 bits are the same whether the operands are signed or not
+            elif entry.funct == 26:
+                dividend = signed[lanes, entry.rs].astype(numpy.int64)
+                divisor = signed[lanes, entry.rt].astype(numpy.int64)
+                if (divisor == 0).any():
+                    raise DivisionByZero("(BatchSimulator): Error! Division by zero in lanes %s" %
+                                         lanes[divisor == 0].tolist())
+                quotient = numpy.abs(dividend) // numpy.abs(divisor)
+                result = numpy.where((dividend < 0) != (divisor < 0), -quotient, quotient).astype(numpy.uint32)
+            else:
+                raise UnsupportedInstruction("(BatchSimulator): Error! Unsupported funct field (%d)" % entry.funct)
+            if entry.rd:
+                regs[lanes, entry.rd] = result
+
+        elif entry.opcode == 8:  # addi
+            if entry.rt:
+                regs[lanes, entry.rt] = regs[lanes, entry.rs] + numpy.uint32(entry.immediate)
+
+        elif entry.opcode == 12:  # andi, with the sign-extended immediate like the ALU
+            if entry.rt:
+                regs[lanes, entry.rt] = regs[lanes, entry.rs] & numpy.uint32(entry.immediate)
+
+        elif entry.opcode == 4 or entry.opcode == 5:
+            equal = regs[lanes, entry.rs] == regs[lanes, entry.rt]
+            taken = equal if entry.opcode == 4 else ~equal
+            branch_target = (next_pc + (entry.immediate << 2)) & WORD_MASK
+            new_pc = numpy.where(taken, branch_target, next_pc)
+
+        elif entry.opcode == 35:
+            indices = self._memory_index(entry, lanes)
+            if entry.rt:
+                regs[lanes, entry.rt] = self.memories[lanes, indices]
+
+        elif entry.opcode == 43:
+            indices = self._memory_index(entry, lanes)
+            self.memories[lanes, indices] = regs[lanes, entry.rt]
+
+        elif entry.opcode == 2:
+            new_pc = (next_pc & 0xF0000000) | (entry.address << 2)
+
+        else:
+            raise UnsupportedInstruction("(BatchSimulator): Error! Unsupported opcode (%d)" % entry.opcode)
+
+        self.program_counters[lanes] = new_pc
@@ -0,0 +1,83 @@
+import unittest
+
+from BatchSimulator import BatchSimulator, numpy
+from Faults import MemoryFault
+from FunctionalSimulator import FunctionalSimulator
+from Instruction import Instruction, create_sized_binary_num, decode_asm_register
+from Interface_test import build_test_program
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class BatchSimulatorTest(unittest.TestCase):
+    def sweep_registers(self, registers):
+        """
+        :return: one register list per ($a0, $a1) input pair
+        """
+        register_lists = []
+        for a0 in range(16, 40, 4):
+            for a1 in range(0, 6):
+                lane = list(registers)
+                lane[decode_asm_register('a0')] = create_sized_binary_num(a0, 32)
+                lane[decode_asm_register('a1')] = create_sized_binary_num(a1, 32)
+                register_lists.append(lane)
+        return register_lists
+
+    def test_sweep_matches_functional_simulator(self):
+        instructions, registers, memory = build_test_program()
+        register_lists = self.sweep_registers(registers)
+        batch = BatchSimulator.from_states(instructions, 0, register_lists, memory)
+        batch.run()
+        self.assertTrue(batch.halted)
+
+        for lane, register_list in enumerate(register_lists):
+            simulator = FunctionalSimulator(instructions, 0, list(register_list), dict(memory))
+            executed = simulator.run()
+            self.assertEqual(executed, batch.instructions_executed[lane])
+            self.assertEqual(simulator.retrieve_current_pc_address(), batch.program_counters[lane])
+            self.assertEqual(list(simulator.retrieve_register_list()), batch.registers[lane].tolist())
+            memory_words = [simulator.retrieve_data_memory().load_word(address)
+                            for address in range(0, len(simulator.retrieve_data_memory()), 4)]
+            self.assertEqual(memory_words, batch.memories[lane].tolist())
+
+    def test_lanes_run_in_lockstep(self):
+        instructions, registers, memory = build_test_program()
+        register_lists = self.sweep_registers(registers)
+        batch = BatchSimulator.from_states(instructions, 0, register_lists, memory)
+        batch.run()
+        self.assertTrue(batch.steps < batch.instructions_executed.sum())
+
+    def test_alu_instructions_match_functional_simulator(self):
+        instructions = [Instruction('addi', '$t1', '$zero', '-7'), Instruction('add', '$t2', '$t1', '$t0'),
+                        Instruction('sub', '$t3', '$t1', '$t0'), Instruction('and', '$t4', '$t1', '$t0'),
+                        Instruction('or', '$t5', '$t1', '$t0'), Instruction('xor', '$t6', '$t1', '$t0'),
+                        Instruction('slt', '$t7', '$t1', '$t0'), Instruction('mult', '$s0', '$t1', '$t0'),
+                        Instruction('div', '$s1', '$t1', '$t0'), Instruction('andi', '$s2', '$t1', '-4'),
+                        Instruction('add', '$zero', '$t1', '$t0')]
+        register_lists = [[0] * 8 + [value] + [0] * 23 for value in [1, 3, -2, 0x7FFFFFFF]]
+        batch = BatchSimulator.from_states(instructions, 0, register_lists, {})
+        batch.run()
+        for lane, register_list in enumerate(register_lists):
+            simulator = FunctionalSimulator(instructions, 0, list(register_list), {})
+            simulator.run()
+            self.assertEqual(list(simulator.retrieve_register_list()), batch.registers[lane].tolist())
+
+    def test_bad_memory_address(self):
+        instructions = [Instruction('lw', '$t0', '$a0', '0')]
+        batch = BatchSimulator(instructions, 0, [[0] * 32, [0] * 4 + [6] + [0] * 27], [[0] * 4, [0] * 4])
+        with self.assertRaises(MemoryFault) as cm:
+            batch.step()
+        self.assertTrue("Unaligned word address in lanes [1]" in str(cm.exception))
+
+        batch = BatchSimulator(instructions, 0, [[0] * 32, [0] * 4 + [64] + [0] * 27], [[0] * 4, [0] * 4])
+        with self.assertRaises(MemoryFault) as cm:
+            batch.step()
+        self.assertTrue("outside of data memory in lanes [1]" in str(cm.exception))
+
+    def test_bad_register_shape(self):
+        with self.assertRaises(Exception) as cm:
+            BatchSimulator([Instruction('j', '0')], 0, [[0] * 31], [[0]])
+        self.assertTrue("(N, 32)" in str(cm.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
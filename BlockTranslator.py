@@ -0,0 +1,268 @@
+"""
+BlockTranslator.py
+
+Dynamic binary translation for the functional simulator. The first time execution reaches an address, the basic
+block starting there (straight-line code up to and including the next branch or jump) is translated into Python
+source, compiled with compile(), and kept in a block cache keyed by its entry address. After that the whole block
+runs as a single Python function call, so a hot loop is just a handful of compiled blocks.
+"""
+from Decoder import FUNCT_TABLE
+from Faults import UnsupportedInstruction
+from FunctionalSimulator import FunctionalSimulator, divide_word
+from Instruction import to_signed_word, WORD_MASK
+
+DEFAULT_MAX_BLOCKS = 1024  # blocks kept in the cache before the oldest is evicted
+DEFAULT_MAX_BLOCK_LENGTH = 64  # instructions in a block, so a long straight run gets split up
+
+
+def _instructions_before_fault(error, function, positions):
+    """
+    :param error: exception raised while running a translated block
+    :param function: the block's compiled function
+    :param positions: line positions of the block (see TranslatingSimulator.block_cache)
+    :return: number of the block's instructions that ran before the one that raised
+    """
+    traceback = error.__traceback__
+    while traceback is not None:
+        if traceback.tb_frame.f_code is function.__code__:
+            return positions[traceback.tb_lineno - 1]
+        traceback = traceback.tb_next
+    return 0
+
+
+class TranslatingSimulator(FunctionalSimulator):
+    def __init__(self, instruction_list, starting_pc_address, register_memory, data_mem,
+                 max_blocks=DEFAULT_MAX_BLOCKS, max_block_length=DEFAULT_MAX_BLOCK_LENGTH):
+        """
+        Creates the simulator with an empty block cache. Takes the same arguments as FunctionalSimulator, plus:
+        :param max_blocks: number of translated blocks to keep. The oldest block is evicted when the cache is full.
+        :param max_block_length: maximum number of instructions translated into a single block
+        """
+        super(TranslatingSimulator, self).__init__(instruction_list, starting_pc_address, register_memory, data_mem)
+        if max_blocks < 1 or max_block_length < 1:
+            raise Exception("(TranslatingSimulator): Error! max_blocks and max_block_length must be at least 1")
+        self.max_blocks = max_blocks
+        self.max_block_length = max_block_length
+
+        # entry address -> (compiled function returning the next pc, instruction count, line positions). The line
+        # positions give, for each line of the block's source, how many of its instructions come before that line, so a
+        # fault can be traced back to the instruction that raised it.
+        self.block_cache = {}
+        self.block_hits = 0
+        self.block_compiles = 0
+        self.block_evictions = 0
+
+        # everything the generated code refers to besides literals
+        self._block_namespace = {'r': self.register_file.words, 'load_word': self.memory.load_word,
+                                 'store_word': self.memory.store_word, 'to_signed_word': to_signed_word,
+                                 'divide_word': divide_word, 'UnsupportedInstruction': UnsupportedInstruction}
+
+    def block_cache_statistics(self):
+        """
+        :return: dictionary of block cache counters
+        """
+        return {'blocks': len(self.block_cache), 'hits': self.block_hits, 'compiles': self.block_compiles,
+                'evictions': self.block_evictions}
+
+    def _find_block(self, entry_pc):
+        """
+        Finds the instructions making up the basic block that starts at entry_pc
+        :param entry_pc: address of the first instruction in the block (must be inside instruction memory)
+        :return: list of (address, PredecodedInstruction)
+        """
+        block = []
+        index = (entry_pc - self.base_address) >> 2
+        while index < len(self.predecoded_instructions) and len(block) < self.max_block_length:
+            entry = self.predecoded_instructions[index]
+            block.append((self.base_address + 4 * index, entry))
+            if entry.control.Branch or entry.control.jump:
+                break
+            index += 1
+        return block
+
+    @staticmethod
+    def _register(number):
+        """
+        :return: source for reading a register, with $zero folded to a constant
+        """
+        return 'r[%d]' % number if number else '0'
+
+    def _translate_instruction(self, entry):
+        """
+        Translates a single non-branching instruction into Python source lines
+        :param entry: PredecodedInstruction
+        :return: list of lines
+        """
+        rs = self._register(entry.rs)
+        rt = self._register(entry.rt)
+        immediate = entry.immediate
+
+        if entry.opcode == 0:
+            if entry.funct not in FUNCT_TABLE:  # raised when the block reaches it, so the instructions before it run
+                return ['raise UnsupportedInstruction("(TranslatingSimulator): Error! Unsupported funct field (%d)")'
+                        % entry.funct]
+            if entry.rd == 0:  # $zero can't be written, so the instruction does nothing, except that a div can fault
+                return ['divide_word(%s, %s)' % (rs, rt)] if entry.funct == 26 else []
+            target = 'r[%d]' % entry.rd
+            if entry.funct == 32:
+                return ['%s = (%s + %s) & 0xFFFFFFFF' % (target, rs, rt)]
+            elif entry.funct == 34:
+                return ['%s = (%s - %s) & 0xFFFFFFFF' % (target, rs, rt)]
+            elif entry.funct == 36:
+                return ['%s = %s & %s' % (target, rs, rt)]
+            elif entry.funct == 37:
+                return ['%s = %s | %s' % (target, rs, rt)]
+            elif entry.funct == 38:
+                return ['%s = %s ^ %s' % (target, rs, rt)]
+            elif entry.funct == 42:  # flipping the sign bit turns a signed comparison into an unsigned one
+                return ['%s = 1 if (%s ^ 0x80000000) < (%s ^ 0x80000000) else 0' % (target, rs, rt)]
+            elif entry.funct == 24:
+                return ['%s = (to_signed_word(%s) * to_signed_word(%s)) & 0xFFFFFFFF' % (target, rs, rt)]
+            else:
+                return ['%s = divide_word(%s, %s)' % (target, rs, rt)]
+
+        elif entry.opcode == 8:  # addi
+            if entry.rt == 0:
+                return []
+            if entry.rs == 0:
+                return ['r[%d] = %d' % (entry.rt, immediate)]
+            return ['r[%d] = (%s + %d) & 0xFFFFFFFF' % (entry.rt, rs, immediate)]
+
+        elif entry.opcode == 12:  # andi, with the sign-extended immediate like the ALU
+            if entry.rt == 0:
+                return []
+            return ['r[%d] = %s & %d' % (entry.rt, rs, immediate)]
+
+        elif entry.opcode == 35:
+            load = 'load_word((%s + %d) & 0xFFFFFFFF)' % (rs, immediate)
+            if entry.rt == 0:
+                return [load]  # still do the load, so a bad address is still caught
+            return ['r[%d] = %s' % (entry.rt, load)]
+
+        elif entry.opcode == 43:
+            return ['store_word((%s + %d) & 0xFFFFFFFF, %s)' % (rs, immediate, rt)]
+
+        else:
+            return ['raise UnsupportedInstruction("(TranslatingSimulator): Error! Unsupported opcode (%d)")'
+                    % entry.opcode]
+
+    def _translate_exit(self, address, entry):
+        """
+        Translates the instruction that ends a block into the lines that return the next program counter
+        :param address: address of the instruction
+        :param entry: PredecodedInstruction
+        :return: list of lines
+        """
+        next_pc = (address + 4) & WORD_MASK
+        if entry.control.jump:
+            return ['return %d' % ((next_pc & 0xF0000000) | (entry.address << 2))]
+
+        branch_target = (next_pc + (entry.immediate << 2)) & WORD_MASK
+        comparison = '==' if entry.opcode == 4 else '!='
+        return ['if %s %s %s:' % (self._register(entry.rs), comparison, self._register(entry.rt)),
+                '    return %d' % branch_target,
+                'return %d' % next_pc]
+
+    def _translate(self, entry_pc):
+        """
+        :return: (source, number of instructions in the block, line positions) for the block starting at entry_pc
+        """
+        block = self._find_block(entry_pc)
+        lines = []
+        positions = [0]  # the def line
+        for position, (address, entry) in enumerate(block[:-1]):
+            instruction_lines = self._translate_instruction(entry)
+            lines.extend(instruction_lines)
+            positions.extend([position] * len(instruction_lines))
+
+        last_address, last_entry = block[-1]
+        if last_entry.control.Branch or last_entry.control.jump:
+            last_lines = self._translate_exit(last_address, last_entry)
+        else:  # ran out of instructions (or hit max_block_length), fall through to the next address
+            last_lines = self._translate_instruction(last_entry) + ['return %d' % ((last_address + 4) & WORD_MASK)]
+        lines.extend(last_lines)
+        positions.extend([len(block) - 1] * len(last_lines))
+
+        source = 'def block():\n' + ''.join('    %s\n' % line for line in lines)
+        return source, len(block), positions
+
+    def translate_block(self, entry_pc):
+        """
+        Generates the Python source for the basic block starting at entry_pc
+        :param entry_pc: address of the first instruction in the block
+        :return: (source, number of instructions in the block)
+        """
+        return self._translate(entry_pc)[:2]
+
+    def _compile_block(self, entry_pc):
+        """
+        Translates and compiles the block starting at entry_pc and adds it to the block cache
+        :return: (function, number of instructions in the block, line positions)
+        """
+        source, length, positions = self._translate(entry_pc)
+        namespace = dict(self._block_namespace)
+        exec(compile(source, '<block 0x%08x>' % entry_pc, 'exec'), namespace)
+
+        if len(self.block_cache) >= self.max_blocks:
+            del self.block_cache[next(iter(self.block_cache))]  # dicts keep insertion order, so this is the oldest
+            self.block_evictions += 1
+
+        block = (namespace['block'], length, positions)
+        self.block_cache[entry_pc] = block
+        self.block_compiles += 1
+        return block
+
+    def run(self, max_instructions=None):
+        """
+        Executes instructions until the program counter leaves instruction memory or max_instructions have run.
+        Whole blocks are run from the block cache; if the budget ends partway through a block, the remaining
+        instructions are interpreted one at a time. If an instruction faults partway through a block, the program
+        counter and instruction count are left at the faulting instruction (the instructions before it in the block
+        have run), as with FunctionalSimulator.
+        :param max_instructions: instruction budget for this call (None for no limit)
+        :return: number of instructions executed by this call
+        """
+        cache = self.block_cache
+        table = self.predecoded_instructions
+        table_length = len(table)
+        handlers = self._opcode_handlers
+        base_address = self.base_address
+        pc = self.program_counter
+        count = 0
+
+        try:
+            while True:
+                index = (pc - base_address) >> 2
+                if index < 0 or index >= table_length:
+                    self.halted = True
+                    break
+                if max_instructions is not None and count >= max_instructions:
+                    break
+
+                block = cache.get(pc)
+                if block is None:
+                    block = self._compile_block(pc)
+                else:
+                    self.block_hits += 1
+
+                function, length, positions = block
+                if max_instructions is not None and count + length > max_instructions:
+                    entry = table[index]
+                    pc = handlers[entry.opcode](entry, pc + 4)
+                    count += 1
+                else:
+                    try:
+                        pc = function()
+                    except Exception as error:
+                        completed = _instructions_before_fault(error, function, positions)
+                        pc = (pc + 4 * completed) & WORD_MASK  # a block only branches at its end
+                        count += completed
+                        raise
+                    count += length
+        except Exception:
+            self.fault_pc = pc
+            raise
+        finally:
+            self.program_counter = pc
+            self.instructions_executed += count
+        return count
@@ -0,0 +1,134 @@
+import unittest
+
+from BlockTranslator import TranslatingSimulator
+from Faults import DivisionByZero, SimulationFault
+from FunctionalSimulator import FunctionalSimulator
+from Instruction import Instruction, decode_asm_register
+from Interface_test import build_test_program
+from ThreadedSimulator import ThreadedSimulator
+
+
+class TranslatingSimulatorTest(unittest.TestCase):
+    def assert_same_state(self, instructions, registers, memory, **options):
+        functional = FunctionalSimulator(instructions, 0, list(registers), dict(memory))
+        translating = TranslatingSimulator(instructions, 0, list(registers), dict(memory), **options)
+
+        self.assertEqual(functional.run(), translating.run())
+        self.assertTrue(translating.halted)
+        self.assertEqual(functional.retrieve_current_pc_address(), translating.retrieve_current_pc_address())
+        self.assertEqual(list(functional.retrieve_register_list()), list(translating.retrieve_register_list()))
+        self.assertEqual(bytes(functional.retrieve_data_memory().view()),
+                         bytes(translating.retrieve_data_memory().view()))
+        return translating
+
+    def test_test_program_matches_functional_simulator(self):
+        simulator = self.assert_same_state(*build_test_program())
+        statistics = simulator.block_cache_statistics()
+        # blocks start at 0 (entry), 24 (LOOP), 32, 48, 64 (ELSE), 80 (END) and 88 (EXIT)
+        self.assertEqual(7, statistics['compiles'])
+        self.assertEqual(7, statistics['blocks'])
+        self.assertEqual(0, statistics['evictions'])
+        self.assertTrue(statistics['hits'] > 0)
+
+    def test_alu_instructions_match_functional_simulator(self):
+        instructions = [Instruction('addi', '$t0', '$zero', '3'), Instruction('addi', '$t1', '$zero', '-7'),
+                        Instruction('addi', '$t1', '$t1', '1'), Instruction('add', '$t2', '$t1', '$t0'),
+                        Instruction('sub', '$t3', '$t1', '$t0'), Instruction('and', '$t4', '$t1', '$t0'),
+                        Instruction('or', '$t5', '$t1', '$t0'), Instruction('xor', '$t6', '$t1', '$t0'),
+                        Instruction('slt', '$t7', '$t1', '$t0'), Instruction('slt', '$t8', '$t0', '$t1'),
+                        Instruction('mult', '$s0', '$t1', '$t0'), Instruction('div', '$s1', '$t1', '$t0'),
+                        Instruction('andi', '$s2', '$t1', '-4'), Instruction('add', '$zero', '$t1', '$t0'),
+                        Instruction('bne', '$t0', '$zero', '0'), Instruction('beq', '$t0', '$zero', '-5')]
+        self.assert_same_state(instructions, [0] * 32, {})
+
+    def test_small_cache_evicts(self):
+        simulator = self.assert_same_state(*build_test_program(), max_blocks=2)
+        statistics = simulator.block_cache_statistics()
+        self.assertEqual(2, statistics['blocks'])
+        self.assertEqual(statistics['compiles'] - 2, statistics['evictions'])
+
+    def test_short_blocks(self):
+        self.assert_same_state(*build_test_program(), max_block_length=2)
+
+    def test_translate_block_source(self):
+        instructions = [Instruction('addi', '$t0', '$zero', '2'), Instruction('addi', '$t0', '$t0', '-1'),
+                        Instruction('bne', '$t0', '$zero', '-2')]
+        simulator = TranslatingSimulator(instructions, 0, [0] * 32, {})
+        source, length = simulator.translate_block(4)
+        self.assertEqual(2, length)
+        self.assertEqual('def block():\n'
+                         '    r[8] = (r[8] + 4294967295) & 0xFFFFFFFF\n'
+                         '    if r[8] != 0:\n'
+                         '        return 4\n'
+                         '    return 12\n', source)
+
+    def test_budget_stops_inside_block(self):
+        instructions, registers, memory = build_test_program()
+        functional = FunctionalSimulator(instructions, 0, list(registers), dict(memory))
+        translating = TranslatingSimulator(instructions, 0, list(registers), dict(memory))
+        self.assertEqual(3, translating.run(3))
+        functional.run(3)
+        self.assertEqual(functional.retrieve_current_pc_address(), translating.retrieve_current_pc_address())
+        self.assertEqual(list(functional.retrieve_register_list()), list(translating.retrieve_register_list()))
+
+    def test_lw_and_sw(self):
+        instructions = [Instruction('sw', '$t6', '$a0', '4'), Instruction('lw', '$t0', '$a0', '4')]
+        registers = [0] * 32
+        registers[decode_asm_register('a0')] = 8
+        registers[decode_asm_register('t6')] = 1995
+        simulator = TranslatingSimulator(instructions, 0, registers, {})
+        simulator.run()
+        self.assertEqual(1995, simulator.retrieve_data_memory().load_word(12))
+        self.assertEqual(1995, simulator.retrieve_register_list()[decode_asm_register('t0')])
+
+    def test_fault_inside_block_matches_functional_simulator(self):
+        # the misaligned lw faults after the two addis have written their registers, in the middle of the block
+        instructions = [Instruction('addi', '$t0', '$zero', '5'), Instruction('addi', '$a0', '$zero', '2'),
+                        Instruction('lw', '$t1', '$a0', '0'), Instruction('addi', '$t2', '$zero', '7'),
+                        Instruction('beq', '$zero', '$zero', '-5')]
+        simulators = [FunctionalSimulator(instructions, 0, [0] * 32, {}),
+                      ThreadedSimulator(instructions, 0, [0] * 32, {}),
+                      TranslatingSimulator(instructions, 0, [0] * 32, {})]
+        for simulator in simulators:
+            self.assertRaises(SimulationFault, simulator.run)
+
+        functional = simulators[0]
+        self.assertEqual(8, functional.fault_pc)
+        self.assertEqual(8, functional.retrieve_current_pc_address())
+        self.assertEqual(2, functional.instructions_executed)
+        for simulator in simulators[1:]:
+            self.assertEqual(functional.fault_pc, simulator.fault_pc)
+            self.assertEqual(functional.retrieve_current_pc_address(), simulator.retrieve_current_pc_address())
+            self.assertEqual(functional.instructions_executed, simulator.instructions_executed)
+            self.assertEqual(list(functional.retrieve_register_list()), list(simulator.retrieve_register_list()))
+
+    def test_fault_in_cached_block(self):
+        # the second pass through the block runs it from the block cache and faults on the sw
+        instructions = [Instruction('addi', '$a0', '$a0', '-2'), Instruction('sw', '$t0', '$a0', '0'),
+                        Instruction('beq', '$zero', '$zero', '-3')]
+        registers = [0] * 32
+        registers[decode_asm_register('a0')] = 10
+        functional = FunctionalSimulator(instructions, 0, list(registers), {})
+        translating = TranslatingSimulator(instructions, 0, list(registers), {})
+        self.assertRaises(SimulationFault, functional.run)
+        self.assertRaises(SimulationFault, translating.run)
+        self.assertEqual(1, translating.block_cache_statistics()['hits'])
+        self.assertEqual(4, translating.fault_pc)
+        self.assertEqual(functional.retrieve_current_pc_address(), translating.retrieve_current_pc_address())
+        self.assertEqual(functional.instructions_executed, translating.instructions_executed)
+        self.assertEqual(list(functional.retrieve_register_list()), list(translating.retrieve_register_list()))
+
+    def test_division_by_zero_into_zero_register(self):
+        instructions = [Instruction('addi', '$t1', '$zero', '7'), Instruction('div', '$zero', '$t1', '$t2'),
+                        Instruction('addi', '$t3', '$zero', '1')]
+        functional = FunctionalSimulator(instructions, 0, [0] * 32, {})
+        translating = TranslatingSimulator(instructions, 0, [0] * 32, {})
+        self.assertRaises(DivisionByZero, functional.run)
+        self.assertRaises(DivisionByZero, translating.run)
+        self.assertEqual(4, translating.fault_pc)
+        self.assertEqual(functional.instructions_executed, translating.instructions_executed)
+        self.assertEqual(list(functional.retrieve_register_list()), list(translating.retrieve_register_list()))
+
+
+if __name__ == '__main__':
+    unittest.main()
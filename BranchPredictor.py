@@ -0,0 +1,295 @@
+"""
+BranchPredictor.py
+
+Branch predictors and a branch target buffer for the pipelined mode. Every predictor works on integer table lookups
+(array-backed tables of small saturating counters indexed by bits of the pc), and keeps per branch pc statistics:
+how many times the branch was executed, how many times it was mispredicted, and how many cycles of penalty it cost.
+
+Predictors:
+    StaticNotTakenPredictor     always predicts not taken
+    BackwardTakenPredictor      predicts backward branches (loops) taken and forward branches not taken
+    OneBitPredictor             table of last outcomes
+    TwoBitPredictor             table of 2-bit saturating counters
+    GSharePredictor             2-bit counters indexed by pc xor global branch history
+    TournamentPredictor         chooses between a 2-bit and a gshare predictor with a table of 2-bit counters
+"""
+from array import array
+
+DEFAULT_TABLE_BITS = 10  # 1024 entry tables
+DEFAULT_BTB_ENTRIES = 256
+
+
+class BranchPredictor(object):
+    def __init__(self):
+        """
+        Base class of the branch predictors. Subclasses override predict() and update().
+        """
+        self.branch_statistics = {}  # branch pc -> [executions, mispredictions, penalty cycles]
+
+    def predict(self, pc, target):
+        """
+        :param pc: address of the branch
+        :param target: address the branch goes to if it is taken
+        :return: True if the branch is predicted taken
+        """
+        raise NotImplementedError
+
+    def prediction_history(self):
+        """
+        The branch history predict() is about to index its tables with. The pipeline reads it when the branch is
+        fetched and hands it back to update(), so a branch trains the counter it was predicted from even if older
+        branches resolve (and shift the history) while it is in flight.
+        :return: global history, or None for a predictor without one
+        """
+        return None
+
+    def update(self, pc, target, taken, history=None):
+        """
+        Trains the predictor with the resolved outcome of a branch
+        :param pc: address of the branch
+        :param target: address the branch goes to if it is taken
+        :param taken: True if the branch was taken
+        :param history: prediction_history() from when the branch was predicted (None to use the current history)
+        :return: None
+        """
+        pass
+
+    def record(self, pc, mispredicted, penalty_cycles=0):
+        """
+        Records a resolved branch in the statistics
+        :param pc: address of the branch
+        :param mispredicted: True if the prediction was wrong
+        :param penalty_cycles: cycles lost because of the misprediction
+        :return: None
+        """
+        statistics = self.branch_statistics.get(pc)
+        if statistics is None:
+            statistics = self.branch_statistics[pc] = [0, 0, 0]
+        statistics[0] += 1
+        if mispredicted:
+            statistics[1] += 1
+        statistics[2] += penalty_cycles
+
+    def add_penalty(self, pc, penalty_cycles):
+        """
+        Charges penalty cycles to a branch without counting an execution (e.g. a bubble while its target is found)
+        :return: None
+        """
+        statistics = self.branch_statistics.get(pc)
+        if statistics is None:
+            statistics = self.branch_statistics[pc] = [0, 0, 0]
+        statistics[2] += penalty_cycles
+
+    def _totals(self, pc=None):
+        if pc is not None:
+            return self.branch_statistics.get(pc, [0, 0, 0])
+        totals = [0, 0, 0]
+        for statistics in self.branch_statistics.values():
+            for index in range(3):
+                totals[index] += statistics[index]
+        return totals
+
+    def accuracy(self, pc=None):
+        """
+        :param pc: address of a branch, or None for every branch
+        :return: fraction of correctly predicted branches (None if no branch has been resolved)
+        """
+        executions, mispredictions, _ = self._totals(pc)
+        if executions == 0:
+            return None
+        return (executions - mispredictions) / executions
+
+    def mispredict_penalty(self, pc=None):
+        """
+        :param pc: address of a branch, or None for every branch
+        :return: penalty cycles charged to the branch (or all branches)
+        """
+        return self._totals(pc)[2]
+
+    def report(self):
+        """
+        :return: dictionary of branch pc -> dictionary of executions, mispredictions, accuracy and penalty cycles
+        """
+        return {pc: {'executions': executions, 'mispredictions': mispredictions,
+                     'accuracy': (executions - mispredictions) / executions if executions else None,
+                     'penalty_cycles': penalty}
+                for pc, (executions, mispredictions, penalty) in sorted(self.branch_statistics.items())}
+
+
+class StaticNotTakenPredictor(BranchPredictor):
+    def predict(self, pc, target):
+        return False
+
+
+class BackwardTakenPredictor(BranchPredictor):
+    def predict(self, pc, target):
+        return target <= pc
+
+
+class OneBitPredictor(BranchPredictor):
+    def __init__(self, table_bits=DEFAULT_TABLE_BITS):
+        """
+        :param table_bits: log2 of the number of entries in the table
+        """
+        super(OneBitPredictor, self).__init__()
+        self.mask = (1 << table_bits) - 1
+        self.table = array('B', bytes(1 << table_bits))
+
+    def predict(self, pc, target):
+        return self.table[(pc >> 2) & self.mask] == 1
+
+    def update(self, pc, target, taken, history=None):
+        self.table[(pc >> 2) & self.mask] = 1 if taken else 0
+
+
+def saturate(counter, taken):
+    """
+    :return: the next value of a 2-bit saturating counter
+    """
+    if taken:
+        return counter + 1 if counter < 3 else 3
+    return counter - 1 if counter > 0 else 0
+
+
+class TwoBitPredictor(BranchPredictor):
+    def __init__(self, table_bits=DEFAULT_TABLE_BITS):
+        """
+        :param table_bits: log2 of the number of entries in the table. Counters start weakly not taken.
+        """
+        super(TwoBitPredictor, self).__init__()
+        self.mask = (1 << table_bits) - 1
+        self.table = array('B', [1]) * (1 << table_bits)
+
+    def predict(self, pc, target):
+        return self.table[(pc >> 2) & self.mask] >= 2
+
+    def update(self, pc, target, taken, history=None):
+        index = (pc >> 2) & self.mask
+        self.table[index] = saturate(self.table[index], taken)
+
+
+class GSharePredictor(BranchPredictor):
+    def __init__(self, table_bits=DEFAULT_TABLE_BITS, history_bits=None):
+        """
+        :param table_bits: log2 of the number of entries in the table
+        :param history_bits: number of global history bits (defaults to table_bits)
+        """
+        super(GSharePredictor, self).__init__()
+        if history_bits is None:
+            history_bits = table_bits
+        self.mask = (1 << table_bits) - 1
+        self.history_mask = (1 << history_bits) - 1
+        self.history = 0
+        self.table = array('B', [1]) * (1 << table_bits)
+
+    def _index(self, pc, history):
+        return ((pc >> 2) ^ history) & self.mask
+
+    def prediction_history(self):
+        return self.history
+
+    def predict(self, pc, target, history=None):
+        """
+        :param history: global history to index with (None for the current history)
+        """
+        return self.table[self._index(pc, self.history if history is None else history)] >= 2
+
+    def update(self, pc, target, taken, history=None):
+        index = self._index(pc, self.history if history is None else history)
+        self.table[index] = saturate(self.table[index], taken)
+        self.history = ((self.history << 1) | (1 if taken else 0)) & self.history_mask
+
+
+class TournamentPredictor(BranchPredictor):
+    def __init__(self, table_bits=DEFAULT_TABLE_BITS, history_bits=None):
+        """
+        :param table_bits: log2 of the number of entries in each of the tables
+        :param history_bits: number of global history bits for the gshare component (defaults to table_bits)
+        """
+        super(TournamentPredictor, self).__init__()
+        self.local = TwoBitPredictor(table_bits)
+        self.global_ = GSharePredictor(table_bits, history_bits)
+        self.mask = (1 << table_bits) - 1
+        self.chooser = array('B', [1]) * (1 << table_bits)  # >= 2 picks the gshare component
+
+    def predict(self, pc, target):
+        if self.chooser[(pc >> 2) & self.mask] >= 2:
+            return self.global_.predict(pc, target)
+        return self.local.predict(pc, target)
+
+    def prediction_history(self):
+        return self.global_.history
+
+    def update(self, pc, target, taken, history=None):
+        index = (pc >> 2) & self.mask
+        local_correct = (self.local.table[index] >= 2) == taken
+        global_correct = self.global_.predict(pc, target, history) == taken
+        if local_correct != global_correct:
+            self.chooser[index] = saturate(self.chooser[index], global_correct)
+        self.local.update(pc, target, taken)
+        self.global_.update(pc, target, taken, history)
+
+
+class BranchTargetBuffer(object):
+    def __init__(self, entries=DEFAULT_BTB_ENTRIES, ways=1):
+        """
+        Set associative branch target buffer with FIFO replacement
+        :param entries: total number of entries (a power of two)
+        :param ways: associativity (must divide entries)
+        """
+        if entries < 1 or entries & (entries - 1) or ways < 1 or entries % ways:
+            raise Exception("(BranchTargetBuffer): Error! entries must be a power of two and divisible by ways")
+        self.entries = entries
+        self.ways = ways
+        self.set_mask = entries // ways - 1
+        self.tags = array('I', bytes(4 * entries))
+        self.targets = array('I', bytes(4 * entries))
+        self.valid = array('B', bytes(entries))
+        self.next_victim = array('I', bytes(4 * (entries // ways)))  # per set
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, pc):
+        """
+        :param pc: address of the branch
+        :return: predicted target address, or None on a miss
+        """
+        base = ((pc >> 2) & self.set_mask) * self.ways
+        for slot in range(base, base + self.ways):
+            if self.valid[slot] and self.tags[slot] == pc:
+                self.hits += 1
+                return self.targets[slot]
+        self.misses += 1
+        return None
+
+    def update(self, pc, target):
+        """
+        Records the target of a taken branch
+        :return: None
+        """
+        set_number = (pc >> 2) & self.set_mask
+        base = set_number * self.ways
+        for slot in range(base, base + self.ways):
+            if self.valid[slot] and self.tags[slot] == pc:
+                self.targets[slot] = target
+                return
+        slot = base + self.next_victim[set_number]
+        self.next_victim[set_number] = (self.next_victim[set_number] + 1) % self.ways
+        self.tags[slot] = pc
+        self.targets[slot] = target
+        self.valid[slot] = 1
+
+
+PREDICTORS = {'not-taken': StaticNotTakenPredictor, 'backward-taken': BackwardTakenPredictor,
+              '1-bit': OneBitPredictor, '2-bit': TwoBitPredictor, 'gshare': GSharePredictor,
+              'tournament': TournamentPredictor}
+
+
+def make_branch_predictor(name, *args, **kwargs):
+    """
+    :param name: one of the keys of PREDICTORS
+    :return: new predictor; any other arguments are passed to its constructor
+    """
+    if name not in PREDICTORS:
+        raise Exception("(BranchPredictor): Error! Unknown branch predictor '%s'" % name)
+    return PREDICTORS[name](*args, **kwargs)
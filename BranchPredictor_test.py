@@ -0,0 +1,184 @@
+import unittest
+
+from BranchPredictor import BackwardTakenPredictor, BranchTargetBuffer, GSharePredictor, OneBitPredictor, \
+    PREDICTORS, StaticNotTakenPredictor, TournamentPredictor, TwoBitPredictor, make_branch_predictor
+from FunctionalSimulator import FunctionalSimulator
+from Instruction import Instruction, decode_asm_register
+from Interface_test import build_test_program
+from PipelinedInterface import PipelinedInterface
+
+
+def build_loop(iterations):
+    """
+    :return: instruction list counting $t0 down from iterations to zero, adding it to $t1 each time
+    """
+    return [Instruction('addi', '$t0', '$zero', str(iterations)),   # 0
+            Instruction('add', '$t1', '$t1', '$t0'),                # 4  LOOP
+            Instruction('addi', '$t0', '$t0', '-1'),                # 8
+            Instruction('bne', '$t0', '$zero', '-3')]               # 12 bne LOOP
+
+
+class BranchPredictorTest(unittest.TestCase):
+    def train(self, predictor, outcomes, pc=0x40, target=0x20):
+        """
+        :return: number of correct predictions
+        """
+        correct = 0
+        for taken in outcomes:
+            prediction = predictor.predict(pc, target)
+            correct += prediction == taken
+            predictor.update(pc, target, taken)
+            predictor.record(pc, prediction != taken)
+        return correct
+
+    def test_static_predictors(self):
+        self.assertFalse(StaticNotTakenPredictor().predict(0x40, 0x20))
+        self.assertTrue(BackwardTakenPredictor().predict(0x40, 0x20))
+        self.assertFalse(BackwardTakenPredictor().predict(0x40, 0x60))
+
+    def test_one_bit_mispredicts_twice_per_loop(self):
+        outcomes = ([True] * 9 + [False]) * 4
+        correct = self.train(OneBitPredictor(), outcomes)
+        self.assertEqual(40 - 1 - 2 * 3 - 1, correct)
+
+    def test_two_bit_mispredicts_once_per_loop(self):
+        predictor = TwoBitPredictor()
+        outcomes = ([True] * 9 + [False]) * 4
+        correct = self.train(predictor, outcomes)
+        self.assertEqual(40 - 2 - 3, correct)  # warming up takes two, then only the loop exits miss
+        self.assertEqual(correct / 40, predictor.accuracy())
+        self.assertEqual(correct / 40, predictor.accuracy(0x40))
+        self.assertIsNone(predictor.accuracy(0x44))
+
+    def test_two_bit_counters_saturate(self):
+        predictor = TwoBitPredictor(4)
+        for _ in range(10):
+            predictor.update(0, 0, True)
+        self.assertEqual(3, predictor.table[0])
+        predictor.update(0, 0, False)
+        self.assertTrue(predictor.predict(0, 0))
+
+    def test_gshare_learns_alternating_pattern(self):
+        predictor = GSharePredictor(8)
+        self.train(predictor, [True, False] * 50)
+        self.assertEqual(20, self.train(predictor, [True, False] * 10))
+
+    def test_update_trains_the_counter_it_predicted_from(self):
+        for predictor in (GSharePredictor(4), TournamentPredictor(4)):
+            gshare = predictor if isinstance(predictor, GSharePredictor) else predictor.global_
+            history = predictor.prediction_history()
+            predictor.predict(0x10, 0)
+            predictor.update(0x40, 0, True)  # an older branch resolves first and shifts the history
+            self.assertNotEqual(history, predictor.prediction_history())
+            predictor.update(0x10, 0, True, history)
+            self.assertEqual(2, gshare.table[gshare._index(0x10, history)])
+
+    def test_tournament_beats_two_bit_on_alternating_pattern(self):
+        outcomes = [True, False] * 100
+        self.assertTrue(self.train(TournamentPredictor(8), outcomes) > self.train(TwoBitPredictor(8), outcomes))
+
+    def test_report(self):
+        predictor = TwoBitPredictor()
+        predictor.record(8, True, 3)
+        predictor.record(8, False)
+        predictor.add_penalty(8, 1)
+        self.assertEqual({8: {'executions': 2, 'mispredictions': 1, 'accuracy': 0.5, 'penalty_cycles': 4}},
+                         predictor.report())
+        self.assertEqual(4, predictor.mispredict_penalty())
+
+    def test_make_branch_predictor(self):
+        self.assertIsInstance(make_branch_predictor('gshare', 6), GSharePredictor)
+        self.assertRaises(Exception, make_branch_predictor, 'oracle')
+
+
+class BranchTargetBufferTest(unittest.TestCase):
+    def test_lookup(self):
+        btb = BranchTargetBuffer(4)
+        self.assertIsNone(btb.lookup(0x10))
+        btb.update(0x10, 0x40)
+        self.assertEqual(0x40, btb.lookup(0x10))
+        btb.update(0x20, 0x80)  # same set as 0x10 in a four entry direct mapped buffer
+        self.assertIsNone(btb.lookup(0x10))
+        self.assertEqual((1, 2), (btb.hits, btb.misses))
+
+    def test_associativity(self):
+        btb = BranchTargetBuffer(4, 2)
+        for pc in (0x10, 0x20):  # both map to set 0
+            btb.update(pc, pc + 0x100)
+        self.assertEqual(0x110, btb.lookup(0x10))
+        self.assertEqual(0x120, btb.lookup(0x20))
+        btb.update(0x30, 0x130)  # evicts the oldest entry
+        self.assertIsNone(btb.lookup(0x10))
+
+    def test_bad_configuration(self):
+        self.assertRaises(Exception, BranchTargetBuffer, 6)
+        self.assertRaises(Exception, BranchTargetBuffer, 8, 3)
+
+
+class PipelinedBranchPredictionTest(unittest.TestCase):
+    def run_program(self, instructions, registers, memory, predictor=None, btb=None):
+        functional = FunctionalSimulator(instructions, 0, list(registers), dict(memory))
+        functional.run()
+        pipelined = PipelinedInterface(instructions, 0, list(registers), dict(memory), branch_predictor=predictor,
+                                       branch_target_buffer=btb)
+        pipelined.run()
+        self.assertEqual(list(functional.retrieve_register_list()), list(pipelined.retrieve_register_list()))
+        self.assertEqual(bytes(functional.retrieve_data_memory().view()),
+                         bytes(pipelined.retrieve_data_memory().view()))
+        self.assertEqual(functional.instructions_executed, pipelined.instructions_retired)
+        return pipelined
+
+    def test_every_predictor_keeps_results(self):
+        for name in PREDICTORS:
+            for btb in (None, BranchTargetBuffer(16)):
+                self.run_program(*build_test_program(), predictor=make_branch_predictor(name), btb=btb)
+                self.run_program(build_loop(10), [0] * 32, {}, make_branch_predictor(name), btb)
+
+    def test_prediction_saves_cycles_on_a_loop(self):
+        no_prediction = self.run_program(build_loop(50), [0] * 32, {})
+        predictor = TwoBitPredictor()
+        predicted = self.run_program(build_loop(50), [0] * 32, {}, predictor)
+        with_btb = self.run_program(build_loop(50), [0] * 32, {}, TwoBitPredictor(), BranchTargetBuffer())
+        self.assertEqual(1275, with_btb.retrieve_register_list()[decode_asm_register('t1')])
+        self.assertTrue(no_prediction.cycles > predicted.cycles > with_btb.cycles)
+
+        statistics = predictor.report()[12]
+        self.assertEqual(50, statistics['executions'])
+        self.assertEqual(2, statistics['mispredictions'])  # one while warming up, one on the way out
+        # three cycles per misprediction, and a bubble for every branch predicted taken (its target is found in
+        # decode without a branch target buffer)
+        self.assertEqual(2 * 3 + 49, statistics['penalty_cycles'])
+
+    def test_back_to_back_branches(self):
+        class RecordingGShare(GSharePredictor):
+            def __init__(self):
+                super(RecordingGShare, self).__init__(6)
+                self.predicted, self.trained = [], []
+
+            def predict(self, pc, target, history=None):
+                self.predicted.append((pc, self._index(pc, self.history if history is None else history)))
+                return super(RecordingGShare, self).predict(pc, target, history)
+
+            def update(self, pc, target, taken, history=None):
+                self.trained.append((pc, self._index(pc, self.history if history is None else history)))
+                super(RecordingGShare, self).update(pc, target, taken, history)
+
+        # two branches one after the other: the second is fetched before the first resolves and shifts the history
+        instructions = [Instruction('addi', '$t0', '$zero', '3'),
+                        Instruction('beq', '$t0', '$zero', '3'),      # 4: exit once $t0 reaches zero
+                        Instruction('bne', '$t0', '$zero', '0'),      # 8: always taken, to the next instruction
+                        Instruction('addi', '$t0', '$t0', '-1'),
+                        Instruction('beq', '$zero', '$zero', '-4')]   # 16: back to 4
+        predictor = RecordingGShare()
+        self.run_program(instructions, [0] * 32, {}, predictor)
+        self.assertEqual(10, len(predictor.trained))
+        for trained in predictor.trained:  # every branch trains the counter it was predicted from
+            self.assertIn(trained, predictor.predicted)
+
+    def test_prediction_needs_hazard_detection(self):
+        self.assertRaises(Exception, PipelinedInterface, build_loop(1), 0, [0] * 32, {}, True, True, False,
+                          TwoBitPredictor())
+
+
+if __name__ == '__main__':
+    unittest.main()
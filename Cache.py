@@ -0,0 +1,210 @@
+"""
+Cache.py
+
+Set associative cache timing model. The cache only keeps tags (the data itself stays in the memory model), held in
+flat arrays indexed by set * associativity + way, so simulating a large cache over millions of accesses costs a few
+integer operations per access and no per-line objects.
+
+A cache is attached to the Fetch stage (instruction cache) and/or the Memory stage (data cache). Every access returns
+its latency in cycles: the hit latency, plus on a miss either the fixed miss latency or, if the cache has a next
+level (another Cache, or the DRAM model in MemoryHierarchy.py), the latency of the access to that level.
+"""
+import random
+from array import array
+
+REPLACEMENT_POLICIES = ['lru', 'fifo', 'random']
+WRITE_POLICIES = ['write-back', 'write-through']
+
+
+def _log2(value, name):
+    """
+    :return: log2 of value, which has to be a power of two
+    """
+    if value < 1 or value & (value - 1):
+        raise Exception("(Cache): Error! %s must be a power of two (got %d)" % (name, value))
+    return value.bit_length() - 1
+
+
+class Cache(object):
+    def __init__(self, size=16 * 1024, line_size=32, associativity=4, replacement='lru', write_policy='write-back',
+                 write_allocate=True, hit_latency=1, miss_latency=20, name='cache', seed=0, next_level=None):
+        """
+        Creates an empty (all lines invalid) cache
+        :param size: capacity in bytes (a power of two)
+        :param line_size: bytes per line (a power of two)
+        :param associativity: ways per set (None for fully associative)
+        :param replacement: 'lru', 'fifo' or 'random'
+        :param write_policy: 'write-back' (dirty lines are written when evicted) or 'write-through' (every write goes
+        to the next level). Writes to the next level are assumed to be buffered, so they don't add latency.
+        :param write_allocate: if False, a write miss goes straight to the next level without filling a line
+        :param hit_latency: cycles for a hit
+        :param miss_latency: extra cycles for a miss (when there is no next level)
+        :param name: name used in reports
+        :param seed: seed for the random replacement policy, so runs are repeatable
+        :param next_level: level behind this one, with an access(address, write) method returning a latency. Misses,
+        write backs and write throughs go to it.
+        """
+        if replacement not in REPLACEMENT_POLICIES:
+            raise Exception("(Cache): Error! Unknown replacement policy '%s'" % replacement)
+        if write_policy not in WRITE_POLICIES:
+            raise Exception("(Cache): Error! Unknown write policy '%s'" % write_policy)
+        size_bits = _log2(size, 'size')
+        self.offset_bits = _log2(line_size, 'line_size')
+        if associativity is None:
+            associativity = size // line_size
+        ways_bits = _log2(associativity, 'associativity')
+        if self.offset_bits + ways_bits > size_bits:
+            raise Exception("(Cache): Error! size must hold at least one set of lines")
+
+        self.name = name
+        self.size = size
+        self.line_size = line_size
+        self.associativity = associativity
+        self.sets = 1 << (size_bits - self.offset_bits - ways_bits)
+        self.set_mask = self.sets - 1
+        self.replacement = replacement
+        self.write_back = write_policy == 'write-back'
+        self.write_allocate = write_allocate
+        self.hit_latency = hit_latency
+        self.miss_latency = miss_latency
+        self.next_level = next_level
+        self._random = random.Random(seed)
+
+        lines = self.sets * associativity
+        self.tags = array('I', bytes(4 * lines))  # line number (address >> offset bits) held in each slot
+        self.valid = array('B', bytes(lines))
+        self.dirty = array('B', bytes(lines))
+        self.stamps = array('Q', bytes(8 * lines))  # last use (LRU) or fill time (FIFO)
+        self._clock = 0
+
+        self.reset_statistics()
+
+    def reset_statistics(self):
+        self.reads = 0
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writebacks = 0
+        self.write_throughs = 0
+        self.cycles = 0
+
+    def _find(self, line):
+        """
+        :return: slot holding the line, or -1
+        """
+        base = (line & self.set_mask) * self.associativity
+        tags = self.tags
+        valid = self.valid
+        for slot in range(base, base + self.associativity):
+            if tags[slot] == line and valid[slot]:
+                return slot
+        return -1
+
+    def _victim(self, line):
+        """
+        :return: slot to fill with the line (an invalid one if the set has any)
+        """
+        base = (line & self.set_mask) * self.associativity
+        end = base + self.associativity
+        valid = self.valid
+        for slot in range(base, end):
+            if not valid[slot]:
+                return slot
+        if self.replacement == 'random':
+            return base + self._random.randrange(self.associativity)
+        stamps = self.stamps
+        victim = base
+        for slot in range(base + 1, end):
+            if stamps[slot] < stamps[victim]:
+                victim = slot
+        return victim
+
+    def contains(self, address):
+        """
+        :return: True if the line holding address is in the cache (doesn't count as an access)
+        """
+        return self._find(address >> self.offset_bits) >= 0
+
+    def fill(self, address, dirty=False):
+        """
+        Brings the line holding address into the cache (if it isn't already there), evicting a line if needed
+        :return: True if a line was evicted
+        """
+        line = address >> self.offset_bits
+        if self._find(line) >= 0:
+            return False
+        slot = self._victim(line)
+        evicted = bool(self.valid[slot])
+        if evicted:
+            self.evictions += 1
+            if self.dirty[slot]:
+                self.writebacks += 1
+                if self.next_level is not None:
+                    self.next_level.access(self.tags[slot] << self.offset_bits, True)
+        self._clock += 1
+        self.tags[slot] = line
+        self.valid[slot] = 1
+        self.dirty[slot] = 1 if dirty else 0
+        self.stamps[slot] = self._clock
+        return evicted
+
+    def access(self, address, write=False):
+        """
+        Looks up the line holding address, filling it on a miss
+        :param address: byte address
+        :param write: True for a store
+        :return: latency of the access in cycles
+        """
+        self._clock += 1
+        line = address >> self.offset_bits
+        slot = self._find(line)
+        if write:
+            self.writes += 1
+        else:
+            self.reads += 1
+
+        if slot >= 0:
+            self.hits += 1
+            if self.replacement == 'lru':
+                self.stamps[slot] = self._clock
+            latency = self.hit_latency
+        else:
+            self.misses += 1
+            if write and not self.write_allocate:  # the write goes around the cache, through the write buffer
+                latency = self.hit_latency
+            else:
+                if self.next_level is None:
+                    latency = self.hit_latency + self.miss_latency
+                else:
+                    latency = self.hit_latency + self.next_level.access(address, False)
+                self.fill(address)
+                if write:
+                    slot = self._find(line)
+
+        if write:
+            if slot >= 0 and self.write_back:
+                self.dirty[slot] = 1
+            else:
+                self.write_throughs += 1
+                if self.next_level is not None:
+                    self.next_level.access(address, True)
+        self.cycles += latency
+        return latency
+
+    def hit_rate(self):
+        """
+        :return: fraction of accesses that hit (None before the first access)
+        """
+        accesses = self.hits + self.misses
+        if accesses == 0:
+            return None
+        return self.hits / accesses
+
+    def statistics(self):
+        """
+        :return: dictionary of the cache counters
+        """
+        return {'name': self.name, 'reads': self.reads, 'writes': self.writes, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions, 'writebacks': self.writebacks,
+                'write_throughs': self.write_throughs, 'hit_rate': self.hit_rate(), 'cycles': self.cycles}
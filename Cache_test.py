@@ -0,0 +1,116 @@
+import unittest
+
+from Cache import Cache
+from FunctionalSimulator import FunctionalSimulator
+from Interface_test import build_test_program, run_to_completion
+from PipelineInterface import PipelineInterface
+from PipelinedInterface import PipelinedInterface
+
+
+class CacheTest(unittest.TestCase):
+    def test_geometry(self):
+        cache = Cache(64 * 1024, 64, 8)
+        self.assertEqual(128, cache.sets)
+        self.assertEqual(1024, len(cache.tags))
+        self.assertEqual(1, Cache(256, 16, None).sets)
+        self.assertRaises(Exception, Cache, 1000)
+        self.assertRaises(Exception, Cache, 1024, 32, 3)
+        self.assertRaises(Exception, Cache, 64, 32, 4)
+        self.assertRaises(Exception, Cache, replacement='mru')
+        self.assertRaises(Exception, Cache, write_policy='write-around')
+
+    def test_hits_and_misses(self):
+        cache = Cache(1024, 16, 2, hit_latency=1, miss_latency=10)
+        self.assertEqual(11, cache.access(0x100))
+        self.assertEqual(1, cache.access(0x104))  # same line
+        self.assertEqual(1, cache.access(0x10C, True))
+        self.assertEqual(11, cache.access(0x110))
+        self.assertEqual((2, 2, 3, 1), (cache.hits, cache.misses, cache.reads, cache.writes))
+        self.assertEqual(0.5, cache.hit_rate())
+        self.assertEqual(24, cache.statistics()['cycles'])
+
+    def conflict(self, replacement):
+        """
+        Three lines mapping to the same set of a two way cache: fill 0 and 1, touch 0 again, then bring in 2
+        :return: the cache
+        """
+        cache = Cache(256, 16, 2, replacement)  # 8 sets, so lines 128 bytes apart share a set
+        for address in (0, 128, 0, 256):
+            cache.access(address)
+        self.assertEqual(1, cache.evictions)
+        return cache
+
+    def test_lru_replacement(self):
+        cache = self.conflict('lru')
+        self.assertTrue(cache.contains(0))
+        self.assertFalse(cache.contains(128))
+
+    def test_fifo_replacement(self):
+        cache = self.conflict('fifo')
+        self.assertFalse(cache.contains(0))
+        self.assertTrue(cache.contains(128))
+
+    def test_random_replacement_is_repeatable(self):
+        addresses = [(index * 7919) % 8192 for index in range(2000)]
+        results = []
+        for _ in range(2):
+            cache = Cache(1024, 16, 4, 'random', seed=3)
+            for address in addresses:
+                cache.access(address)
+            results.append(cache.statistics())
+        self.assertEqual(results[0], results[1])
+
+    def test_write_back(self):
+        cache = Cache(256, 16, 1)
+        cache.access(0, True)
+        cache.access(256)  # evicts the dirty line
+        cache.access(512)  # evicts a clean one
+        self.assertEqual((2, 1, 0), (cache.evictions, cache.writebacks, cache.write_throughs))
+
+    def test_write_through_no_allocate(self):
+        cache = Cache(256, 16, 1, write_policy='write-through', write_allocate=False)
+        cache.access(0, True)
+        self.assertFalse(cache.contains(0))
+        cache.access(0)
+        cache.access(0, True)
+        self.assertEqual((2, 0), (cache.write_throughs, cache.writebacks))
+        self.assertEqual(1, cache.hits)
+
+
+class AttachedCacheTest(unittest.TestCase):
+    def test_single_cycle_pipeline(self):
+        for integer_datapath in (False, True):
+            instructions, registers, memory = build_test_program()
+            expected = PipelineInterface(instructions, 0, list(registers), dict(memory), integer_datapath)
+            run_to_completion(expected)
+
+            instruction_cache, data_cache = Cache(1024, 16, 2), Cache(1024, 16, 2)
+            interface = PipelineInterface(instructions, 0, list(registers), dict(memory), integer_datapath,
+                                          instruction_cache, data_cache)
+            run_to_completion(interface)
+            self.assertEqual(list(expected.retrieve_register_list()), list(interface.retrieve_register_list()))
+
+            self.assertTrue(instruction_cache.hits > 0 and instruction_cache.misses > 0)
+            self.assertTrue(data_cache.reads > 0 and data_cache.writes > 0)
+            self.assertEqual(interface.fetch.cache_accesses, instruction_cache.reads)
+            self.assertEqual(instruction_cache.cycles + data_cache.cycles, interface.memory_cycles())
+
+    def test_pipelined_misses_stall(self):
+        instructions, registers, memory = build_test_program()
+        functional = FunctionalSimulator(instructions, 0, list(registers), dict(memory))
+        functional.run()
+        perfect = PipelinedInterface(instructions, 0, list(registers), dict(memory))
+        perfect.run()
+
+        cached = PipelinedInterface(instructions, 0, list(registers), dict(memory),
+                                    instruction_cache=Cache(1024, 16, 2, miss_latency=10),
+                                    data_cache=Cache(1024, 16, 2, miss_latency=10))
+        cached.run()
+        self.assertEqual(list(functional.retrieve_register_list()), list(cached.retrieve_register_list()))
+        self.assertTrue(cached.memory_stall_cycles > 0)
+        self.assertEqual(perfect.cycles + cached.memory_stall_cycles, cached.cycles)
+        self.assertEqual(0, perfect.memory_stall_cycles)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+Checkpoint.py
+
+Helpers used by PipelineInterface.snapshot()/restore() and PipelinedInterface.snapshot()/restore() to save and put
+back the state of the machine: the register file, data memory, the attributes of every stage, and the timing models
+attached to the datapath (caches, prefetchers, branch predictors, ...).
+
+Only what changes while a program runs is copied. Attribute values that are never modified in place (ints, strings,
+tuples, Instruction objects, control words, ...) are shared between the machine and its snapshots; arrays, lists,
+dicts and sets are copied, one container at a time, with the values they hold shared the same way.
+
+Only a PagedMemory is saved copy-on-write (see DataMemory.py): a snapshot costs one reference per resident page
+rather than a copy of memory, and restoring it costs the same. Every other data memory is copied in full by each
+snapshot and each restore: the contiguous DataMemory (the default on the integer datapath) and MappedMemory copy
+their whole buffer, and the dictionary of binary strings used by the string datapath is copied entry by entry. The
+interfaces never pick a PagedMemory themselves, so a caller that wants cheap forks has to pass one in as data_mem.
+"""
+import copy
+import random
+import types
+from array import array
+from collections import namedtuple
+
+from RegisterFile import RegisterFile
+
+_NOT_COMPONENTS = (type, random.Random, types.FunctionType, types.MethodType, types.ModuleType)
+
+# Stage attributes that aren't saved with the stage: the register file and data memory are saved on their own, and
+# instruction memory never changes
+STAGE_EXCLUDE = frozenset(['register_file', 'memory', 'predecoded_instructions', '_instruction_table'])
+
+# Saved machine state. owner: the interface it was taken from; interface and stages: saved attributes of the interface
+# and of each stage; registers and memory: saved register file and data memory; components: saved timing models;
+# latches: copies of the pipeline registers (empty for the single-cycle datapath)
+Snapshot = namedtuple('Snapshot', ['owner', 'interface', 'stages', 'registers', 'memory', 'components', 'latches'])
+Snapshot.__new__.__defaults__ = ((),)
+
+
+def _copy_value(value):
+    """
+    :return: a private copy of a mutable container (holding private copies of any containers inside it), or value
+    itself
+    """
+    if isinstance(value, array):
+        return value[:]
+    if isinstance(value, dict):
+        return {key: _copy_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_value(item) for item in value]
+    if isinstance(value, set):
+        return set(value)
+    if isinstance(value, random.Random):
+        return copy.copy(value)
+    return value
+
+
+def capture_state(obj, exclude=()):
+    """
+    Saves the attributes of an object
+    :param obj: object to save
+    :param exclude: names of attributes to leave out (state that is saved some other way, or never changes)
+    :return: dictionary of attribute name -> value
+    """
+    return {name: _copy_value(value) for name, value in obj.__dict__.items() if name not in exclude}
+
+
+def restore_state(obj, state, exclude=()):
+    """
+    Puts back the attributes saved by capture_state. Attributes created since the state was captured are removed.
+    The saved values are copied again, so the same state can be restored any number of times.
+    :param obj: object the state was captured from
+    :param state: dictionary from capture_state
+    :param exclude: the names given to capture_state; these attributes are kept as they are
+    :return: None
+    """
+    attributes = obj.__dict__
+    kept = {name: attributes[name] for name in exclude if name in attributes}
+    attributes.clear()
+    attributes.update(kept)
+    attributes.update({name: _copy_value(value) for name, value in state.items()})
+
+
+def _is_component(value):
+    return hasattr(value, '__dict__') and not isinstance(value, _NOT_COMPONENTS)
+
+
+def timing_components(*roots):
+    """
+    Finds every object reachable from the given timing models: a cache's next levels, the cache behind a prefetcher,
+    the components of a tournament predictor, ...
+    :param roots: objects (None entries are skipped)
+    :return: list of distinct objects, each listed once even if it is shared (such as an L2 behind both L1s)
+    """
+    found, pending, seen = [], [root for root in roots if root is not None], set()
+    while pending:
+        component = pending.pop()
+        if id(component) in seen:
+            continue
+        seen.add(id(component))
+        found.append(component)
+        pending.extend(value for value in component.__dict__.values() if _is_component(value))
+    return found
+
+
+def capture_components(components):
+    """
+    :param components: list from timing_components
+    :return: list of (component, saved attributes)
+    """
+    return [(component, capture_state(component)) for component in components]
+
+
+def restore_components(saved):
+    """
+    :param saved: list from capture_components
+    :return: None
+    """
+    for component, state in saved:
+        restore_state(component, state)
+
+
+def snapshot_registers(register_file):
+    """
+    :param register_file: RegisterFile, or list of binary strings
+    :return: saved register values
+    """
+    if isinstance(register_file, RegisterFile):
+        return register_file.snapshot()
+    return list(register_file)
+
+
+def restore_registers(register_file, state):
+    """
+    Writes saved register values back into the same register file
+    :return: None
+    """
+    if isinstance(register_file, RegisterFile):
+        register_file.restore(state)
+    else:
+        register_file[:] = state
+
+
+def snapshot_memory(memory):
+    """
+    :param memory: memory model (DataMemory, PagedMemory, MappedMemory), or dictionary of binary strings
+    :return: saved memory contents: the shared pages of a PagedMemory, a full copy of anything else
+    """
+    if isinstance(memory, dict):
+        return dict(memory)
+    return memory.snapshot()
+
+
+def restore_memory(memory, state):
+    """
+    Writes saved memory contents back into the same memory
+    :return: None
+    """
+    if isinstance(memory, dict):
+        memory.clear()
+        memory.update(state)
+    else:
+        memory.restore(state)
+
+
+def take_snapshot(interface, stages, register_file, memory, components, exclude=(), latches=()):
+    """
+    Saves the state of an execution engine
+    :param interface: the engine (PipelineInterface, PipelinedInterface)
+    :param stages: its stage objects
+    :param register_file: its register file
+    :param memory: its data memory
+    :param components: list from timing_components
+    :param exclude: attributes of the interface that aren't saved with it
+    :param latches: copies of the pipeline registers
+    :return: Snapshot
+    """
+    return Snapshot(interface, capture_state(interface, exclude),
+                    tuple(capture_state(stage, STAGE_EXCLUDE) for stage in stages), snapshot_registers(register_file),
+                    snapshot_memory(memory), capture_components(components), latches)
+
+
+def restore_snapshot(interface, snapshot, stages, register_file, memory, exclude=()):
+    """
+    Puts back the state saved by take_snapshot (except the latches, which the interface restores itself)
+    :param exclude: attributes of the interface that weren't saved with it (as given to take_snapshot)
+    :return: None
+    """
+    if snapshot.owner is not interface:
+        raise Exception("(Checkpoint): Error! A snapshot can only be restored into the machine it was taken from!")
+    restore_state(interface, snapshot.interface, exclude)
+    for stage, state in zip(stages, snapshot.stages):
+        restore_state(stage, state, STAGE_EXCLUDE)
+    restore_registers(register_file, snapshot.registers)
+    restore_memory(memory, snapshot.memory)
+    restore_components(snapshot.components)
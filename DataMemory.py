@@ -0,0 +1,339 @@
+"""
+DataMemory.py
+
+Byte-addressable data memory models for the integer datapath. Every model provides load_word(address) and
+store_word(address, value) with integer addresses and values, which is all the Memory stage needs.
+"""
+import mmap
+import os
+import struct
+
+from Faults import MemoryFault
+from Instruction import create_sized_binary_num, to_word, WORD_MASK
+
+DEFAULT_MEMORY_SIZE = 512  # bytes, the same range the dictionary-based memory allowed
+PAGE_SIZE = 4096  # bytes per page of PagedMemory
+_PAGE_SHIFT = 12
+_PAGE_OFFSET_MASK = PAGE_SIZE - 1
+
+
+def _word_struct(byteorder):
+    """
+    :param byteorder: 'big' or 'little'
+    :return: struct.Struct that packs/unpacks a single unsigned 32-bit word in that byte order
+    """
+    if byteorder == 'big':
+        return struct.Struct('>I')
+    elif byteorder == 'little':
+        return struct.Struct('<I')
+    else:
+        raise Exception("(DataMemory): Error! byteorder must be 'big' or 'little'")
+
+
+class DataMemory(object):
+    def __init__(self, size=DEFAULT_MEMORY_SIZE, byteorder='big'):
+        """
+        Creates a zero-filled, contiguous data memory
+        :param size: size of the memory in bytes, must be a multiple of 4
+        :param byteorder: 'big' (like MIPS) or 'little'
+        """
+        if size <= 0 or size % 4 != 0:
+            raise Exception("(DataMemory): Error! Memory size must be a positive multiple of 4 bytes!")
+        self.size = size
+        self.byteorder = byteorder
+        self._word = _word_struct(byteorder)
+        self._buffer = bytearray(size)
+
+    @classmethod
+    def from_dict(cls, memory_dict, size=None, byteorder='big'):
+        """
+        Builds a DataMemory from the dictionary representation used by the binary string datapath
+        :param memory_dict: dictionary of address -> word, each either a binary string or an int
+        :param size: size in bytes. Defaults to the larger of DEFAULT_MEMORY_SIZE and the highest address in the dict
+        :param byteorder: 'big' or 'little'
+        :return: DataMemory
+        """
+        words = [(to_word(address), to_word(value)) for address, value in memory_dict.items()]
+        if size is None:
+            size = DEFAULT_MEMORY_SIZE
+            if words:
+                size = max(size, (max(address for address, value in words) & ~3) + 4)
+        memory = cls(size, byteorder)
+        for address, value in words:
+            memory.store_word(address, value)
+        return memory
+
+    def _check_address(self, address):
+        if address & 3:
+            raise MemoryFault("(DataMemory): Error! Word address %d isn't aligned to 4 bytes!" % address)
+        if address < 0 or address + 4 > self.size:
+            raise MemoryFault("(DataMemory): Error! Word address %d is outside of data memory!" % address)
+
+    def load_word(self, address):
+        """
+        Reads the 32-bit word starting at address
+        :param address: integer byte address, must be word aligned
+        :return: unsigned int
+        """
+        self._check_address(address)
+        return self._word.unpack_from(self._buffer, address)[0]
+
+    def store_word(self, address, value):
+        """
+        Writes a 32-bit word starting at address
+        :param address: integer byte address, must be word aligned
+        :param value: int to store (masked to 32 bits)
+        :return: None
+        """
+        self._check_address(address)
+        self._word.pack_into(self._buffer, address, value & WORD_MASK)
+
+    def __getitem__(self, address):
+        return self.load_word(address)
+
+    def __setitem__(self, address, value):
+        self.store_word(address, value)
+
+    def __len__(self):
+        return self.size
+
+    def view(self):
+        """
+        :return: zero-copy memoryview of the raw bytes
+        """
+        return memoryview(self._buffer)
+
+    def snapshot(self):
+        """
+        Saves the contents of memory. The memory is contiguous, so this is a copy of the whole buffer; use a
+        PagedMemory for large memories that are snapshotted often.
+        :return: bytes, for restore()
+        """
+        return bytes(self._buffer)
+
+    def restore(self, state):
+        """
+        Puts back the contents saved by snapshot()
+        :param state: value returned by snapshot()
+        :return: None
+        """
+        if len(state) != self.size:
+            raise Exception("(DataMemory): Error! Snapshot is %d bytes, but memory is %d!" % (len(state), self.size))
+        self._buffer[:] = state
+
+    def binary_dict(self):
+        """
+        Compatibility accessor for the dictionary-based memory
+        :return: dictionary of 32-bit binary address string -> 32-bit binary word string, for every word
+        """
+        return {create_sized_binary_num(address, 32): create_sized_binary_num(self.load_word(address), 32)
+                for address in range(0, self.size, 4)}
+
+
+class MappedMemory(DataMemory):
+    def __init__(self, path, size=None, byteorder='big'):
+        """
+        Creates a data memory whose backing store is a file mapped with mmap. Nothing is copied into Python objects:
+        the OS pages the image in as it is touched, and stores land directly in the file.
+        :param path: path of the memory image. Created (zero-filled) if it doesn't exist yet.
+        :param size: size of the memory in bytes. Defaults to the size of the existing file; if the file is smaller
+        it is extended with zeros.
+        :param byteorder: 'big' (like MIPS) or 'little'
+        """
+        if not os.path.exists(path):
+            if size is None:
+                raise Exception("(MappedMemory): Error! A size is needed to create a new memory image!")
+            open(path, 'wb').close()
+
+        self._file = open(path, 'r+b')
+        file_size = os.fstat(self._file.fileno()).st_size
+        if size is None:
+            size = file_size
+        if size <= 0 or size % 4 != 0:
+            self._file.close()
+            raise Exception("(MappedMemory): Error! Memory size must be a positive multiple of 4 bytes!")
+        if file_size < size:
+            self._file.truncate(size)
+
+        self.path = path
+        self.size = size
+        self.byteorder = byteorder
+        self._word = _word_struct(byteorder)
+        self._buffer = mmap.mmap(self._file.fileno(), size)
+
+    def flush(self):
+        """
+        Forces any stores that the OS hasn't written back yet out to the file
+        :return: None
+        """
+        self._buffer.flush()
+
+    def close(self):
+        """
+        Flushes and unmaps the memory image. Any memoryview from view() must be released first.
+        :return: None
+        """
+        if not self._buffer.closed:
+            self._buffer.flush()
+            self._buffer.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PagedMemory(object):
+    def __init__(self, byteorder='big'):
+        """
+        Creates a sparse memory covering the full 32-bit address space. 4 KiB pages are only allocated the first time
+        they are written to; reading a page that was never written returns zeros without allocating anything.
+
+        Pages are copy-on-write once the memory has been snapshotted: a snapshot shares every page with the memory,
+        and the first store to a shared page copies it, so a snapshot costs one reference per resident page.
+        :param byteorder: 'big' (like MIPS) or 'little'
+        """
+        self.size = 1 << 32
+        self.byteorder = byteorder
+        self._word = _word_struct(byteorder)
+        self._pages = {}  # page number -> bytearray(PAGE_SIZE)
+        self._owned = set()  # pages no snapshot shares, which can be written in place
+
+        # lookaside for the most recently used page, since most accesses land on the same page as the last one
+        self._last_page_number = None
+        self._last_page = None
+
+    @classmethod
+    def from_dict(cls, memory_dict, byteorder='big'):
+        """
+        Builds a PagedMemory from the dictionary representation used by the binary string datapath
+        :param memory_dict: dictionary of address -> word, each either a binary string or an int
+        :param byteorder: 'big' or 'little'
+        :return: PagedMemory
+        """
+        memory = cls(byteorder)
+        for address, value in memory_dict.items():
+            memory.store_word(to_word(address), to_word(value))
+        return memory
+
+    @property
+    def resident_pages(self):
+        """
+        :return: number of pages that have been allocated
+        """
+        return len(self._pages)
+
+    @property
+    def resident_bytes(self):
+        """
+        :return: number of bytes of page storage that have been allocated
+        """
+        return len(self._pages) * PAGE_SIZE
+
+    def _check_address(self, address):
+        if address & 3:
+            raise MemoryFault("(PagedMemory): Error! Word address %d isn't aligned to 4 bytes!" % address)
+        if address < 0 or address > WORD_MASK:
+            raise MemoryFault("(PagedMemory): Error! Word address %d is outside of the 32-bit address space!" % address)
+
+    def _find_page(self, page_number):
+        """
+        :return: the page's bytearray, or None if it has never been written
+        """
+        if page_number == self._last_page_number:
+            return self._last_page
+        page = self._pages.get(page_number)
+        if page is not None:
+            self._last_page_number = page_number
+            self._last_page = page
+        return page
+
+    def _allocate_page(self, page_number, contents=None):
+        """
+        :param contents: bytes to fill the page with (a shared page being copied), or None for a zero page
+        """
+        page = bytearray(PAGE_SIZE) if contents is None else bytearray(contents)
+        self._pages[page_number] = page
+        self._owned.add(page_number)
+        self._last_page_number = page_number
+        self._last_page = page
+        return page
+
+    def load_word(self, address):
+        """
+        Reads the 32-bit word starting at address
+        :param address: integer byte address, must be word aligned
+        :return: unsigned int (0 if the page was never written)
+        """
+        self._check_address(address)
+        page = self._find_page(address >> _PAGE_SHIFT)
+        if page is None:
+            return 0
+        return self._word.unpack_from(page, address & _PAGE_OFFSET_MASK)[0]
+
+    def store_word(self, address, value):
+        """
+        Writes a 32-bit word starting at address, allocating its page if this is the first write to it
+        :param address: integer byte address, must be word aligned
+        :param value: int to store (masked to 32 bits)
+        :return: None
+        """
+        self._check_address(address)
+        page_number = address >> _PAGE_SHIFT
+        page = self._find_page(page_number)
+        if page is None:
+            page = self._allocate_page(page_number)
+        elif page_number not in self._owned:  # shared with a snapshot: copy it before the first write
+            page = self._allocate_page(page_number, page)
+        self._word.pack_into(page, address & _PAGE_OFFSET_MASK, value & WORD_MASK)
+
+    def __getitem__(self, address):
+        return self.load_word(address)
+
+    def __setitem__(self, address, value):
+        self.store_word(address, value)
+
+    def __len__(self):
+        return self.size
+
+    def snapshot(self):
+        """
+        Saves the contents of memory without copying any page: from now on, every page is shared with the snapshot
+        and is copied by the first store to it
+        :return: dictionary of page number -> page, for restore()
+        """
+        self._owned.clear()
+        return dict(self._pages)
+
+    def restore(self, state):
+        """
+        Puts back the contents saved by snapshot(). The pages stay shared with the snapshot, so it can be restored
+        again later.
+        :param state: value returned by snapshot()
+        :return: None
+        """
+        self._pages = dict(state)
+        self._owned.clear()
+        self._last_page_number = None
+        self._last_page = None
+
+    def page_numbers(self):
+        """
+        :return: sorted list of the resident page numbers
+        """
+        return sorted(self._pages)
+
+    def binary_dict(self):
+        """
+        Compatibility accessor for the dictionary-based memory
+        :return: dictionary of 32-bit binary address string -> 32-bit binary word string, for every word in every
+        resident page
+        """
+        memory_dict = {}
+        for page_number in self.page_numbers():
+            base = page_number << _PAGE_SHIFT
+            for address in range(base, base + PAGE_SIZE, 4):
+                memory_dict[create_sized_binary_num(address, 32)] = create_sized_binary_num(self.load_word(address), 32)
+        return memory_dict
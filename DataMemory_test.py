@@ -0,0 +1,204 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from DataMemory import DataMemory, PagedMemory, MappedMemory, PAGE_SIZE
+from Instruction import create_sized_binary_num
+
+
+class DataMemoryTest(unittest.TestCase):
+    def test_create_memory(self):
+        memory = DataMemory(1024)
+        self.assertEqual(1024, len(memory))
+        self.assertEqual(0, memory.load_word(1020))
+
+    def test_bad_size(self):
+        with self.assertRaises(Exception) as cm:
+            DataMemory(10)
+        self.assertTrue("positive multiple of 4" in str(cm.exception))
+
+    def test_store_and_load_word(self):
+        memory = DataMemory()
+        memory.store_word(16, 0xDEADBEEF)
+        self.assertEqual(0xDEADBEEF, memory.load_word(16))
+        memory[20] = -1
+        self.assertEqual(0xFFFFFFFF, memory[20])
+
+    def test_big_endian_layout(self):
+        memory = DataMemory(8)
+        memory.store_word(4, 0x01020304)
+        self.assertEqual(b'\x01\x02\x03\x04', bytes(memory.view()[4:8]))
+
+    def test_little_endian_layout(self):
+        memory = DataMemory(8, 'little')
+        memory.store_word(4, 0x01020304)
+        self.assertEqual(b'\x04\x03\x02\x01', bytes(memory.view()[4:8]))
+
+    def test_unaligned_address(self):
+        memory = DataMemory()
+        with self.assertRaises(Exception) as cm:
+            memory.load_word(2)
+        self.assertTrue("aligned" in str(cm.exception))
+
+    def test_out_of_range_address(self):
+        memory = DataMemory(512)
+        with self.assertRaises(Exception) as cm:
+            memory.store_word(512, 1)
+        self.assertTrue("outside of data memory" in str(cm.exception))
+
+    def test_from_dict(self):
+        memory = DataMemory.from_dict({create_sized_binary_num(16, 32): create_sized_binary_num(22, 32), 4096: 7})
+        self.assertEqual(4100, len(memory))
+        self.assertEqual(22, memory.load_word(16))
+        self.assertEqual(7, memory.load_word(4096))
+
+    def test_binary_dict(self):
+        memory = DataMemory(8)
+        memory.store_word(4, 5)
+        self.assertEqual({create_sized_binary_num(0, 32): create_sized_binary_num(0, 32),
+                          create_sized_binary_num(4, 32): create_sized_binary_num(5, 32)}, memory.binary_dict())
+
+    def test_megabyte_memory(self):
+        memory = DataMemory(1 << 20)
+        memory.store_word((1 << 20) - 4, 99)
+        self.assertEqual(99, memory.load_word((1 << 20) - 4))
+
+    def test_snapshot_and_restore(self):
+        memory = DataMemory()
+        memory.store_word(8, 1)
+        snapshot = memory.snapshot()
+        memory.store_word(8, 2)
+        memory.restore(snapshot)
+        self.assertEqual(1, memory.load_word(8))
+        with self.assertRaises(Exception):
+            DataMemory(1024).restore(snapshot)
+
+
+class PagedMemoryTest(unittest.TestCase):
+    def test_create_memory(self):
+        memory = PagedMemory()
+        self.assertEqual(0, memory.resident_pages)
+        self.assertEqual(1 << 32, len(memory))
+
+    def test_reads_do_not_allocate(self):
+        memory = PagedMemory()
+        self.assertEqual(0, memory.load_word(0x10000000))
+        self.assertEqual(0, memory.resident_pages)
+
+    def test_mips_layout(self):
+        memory = PagedMemory()
+        memory.store_word(0x7FFFFFFC, 1234)  # top of the stack
+        memory.store_word(0x10000000, 5678)  # start of static data
+        memory.store_word(0x10000004, 91011)
+        self.assertEqual(1234, memory.load_word(0x7FFFFFFC))
+        self.assertEqual(5678, memory.load_word(0x10000000))
+        self.assertEqual(91011, memory.load_word(0x10000004))
+        self.assertEqual(2, memory.resident_pages)
+        self.assertEqual(2 * PAGE_SIZE, memory.resident_bytes)
+        self.assertEqual([0x10000, 0x7FFFF], memory.page_numbers())
+
+    def test_page_boundary(self):
+        memory = PagedMemory()
+        memory.store_word(PAGE_SIZE - 4, 1)
+        memory.store_word(PAGE_SIZE, 2)
+        self.assertEqual(1, memory.load_word(PAGE_SIZE - 4))
+        self.assertEqual(2, memory.load_word(PAGE_SIZE))
+        self.assertEqual(2, memory.resident_pages)
+
+    def test_last_address(self):
+        memory = PagedMemory('little')
+        memory[0xFFFFFFFC] = -1
+        self.assertEqual(0xFFFFFFFF, memory[0xFFFFFFFC])
+
+    def test_out_of_range_address(self):
+        memory = PagedMemory()
+        with self.assertRaises(Exception) as cm:
+            memory.load_word(1 << 32)
+        self.assertTrue("outside of the 32-bit address space" in str(cm.exception))
+
+    def test_unaligned_address(self):
+        memory = PagedMemory()
+        with self.assertRaises(Exception) as cm:
+            memory.store_word(6, 1)
+        self.assertTrue("aligned" in str(cm.exception))
+
+    def test_from_dict(self):
+        memory = PagedMemory.from_dict({create_sized_binary_num(16, 32): create_sized_binary_num(22, 32)})
+        self.assertEqual(22, memory.load_word(16))
+        self.assertEqual(1, memory.resident_pages)
+        self.assertEqual(PAGE_SIZE // 4, len(memory.binary_dict()))
+
+    def test_snapshot_shares_pages(self):
+        memory = PagedMemory()
+        for page in range(64):
+            memory.store_word(page * PAGE_SIZE, page)
+        snapshot = memory.snapshot()
+        self.assertTrue(all(snapshot[page] is memory._pages[page] for page in range(64)))
+
+        memory.store_word(4, 99)  # the first store to a shared page copies it
+        memory.store_word(8, 100)
+        self.assertIsNot(snapshot[0], memory._pages[0])
+        self.assertTrue(all(snapshot[page] is memory._pages[page] for page in range(1, 64)))
+        self.assertEqual(99, memory.load_word(4))
+        memory.store_word(70 * PAGE_SIZE, 1)
+        self.assertEqual(65, memory.resident_pages)
+
+        for _ in range(2):  # the snapshot is left untouched, so it can be restored again
+            memory.restore(snapshot)
+            self.assertEqual(64, memory.resident_pages)
+            self.assertEqual([0, 0, 0], [memory.load_word(4), memory.load_word(8), memory.load_word(70 * PAGE_SIZE)])
+            self.assertEqual(63, memory.load_word(63 * PAGE_SIZE))
+            memory.store_word(4, 5)
+            self.assertEqual(5, memory.load_word(4))
+
+
+class MappedMemoryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'data.img')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_create_image(self):
+        with MappedMemory(self.path, 4096) as memory:
+            self.assertEqual(4096, len(memory))
+            self.assertEqual(0, memory.load_word(4092))
+        self.assertEqual(4096, os.path.getsize(self.path))
+
+    def test_new_image_needs_size(self):
+        with self.assertRaises(Exception) as cm:
+            MappedMemory(self.path)
+        self.assertTrue("A size is needed" in str(cm.exception))
+
+    def test_load_existing_image(self):
+        with open(self.path, 'wb') as image:
+            image.write(bytes([0, 0, 0, 0, 0x01, 0x02, 0x03, 0x04]))
+        with MappedMemory(self.path) as memory:
+            self.assertEqual(8, len(memory))
+            self.assertEqual(0x01020304, memory.load_word(4))
+
+    def test_stores_land_in_file(self):
+        with MappedMemory(self.path, 16, 'little') as memory:
+            memory.store_word(8, 0x01020304)
+        with open(self.path, 'rb') as image:
+            self.assertEqual(bytes([0x04, 0x03, 0x02, 0x01]), image.read()[8:12])
+
+    def test_existing_image_is_extended(self):
+        with open(self.path, 'wb') as image:
+            image.write(bytes(4))
+        with MappedMemory(self.path, 64) as memory:
+            memory.store_word(60, 5)
+            self.assertEqual(5, memory.load_word(60))
+        self.assertEqual(64, os.path.getsize(self.path))
+
+    def test_out_of_range_address(self):
+        with MappedMemory(self.path, 16) as memory:
+            with self.assertRaises(Exception) as cm:
+                memory.load_word(16)
+            self.assertTrue("outside of data memory" in str(cm.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
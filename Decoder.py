@@ -0,0 +1,237 @@
+"""
+Decoder.py
+
+Table driven decoder for raw 32-bit MIPS machine words, and loaders for program images produced by other tools.
+
+A word is split into its fields with shifts and masks, and its opcode (and funct, for R-format words) is looked up in
+tables built from the same encodings as the Instruction class, so decoding never goes through binary strings. Decoded
+words are memoized, so a program that repeats the same word (a loop body unrolled, nops, ...) decodes it once.
+
+Images can be flat binaries (4 bytes per instruction, big endian by default) or hex text (one or more 8 digit words
+per line, # comments allowed). Binaries are copied straight into an array of words through a memoryview, without
+converting each word on its own:
+
+    words = load_image('program.bin')
+    interface = PipelineInterface(words, 0, registers, memory, integer_datapath=True)
+
+Every engine (PipelineInterface, PipelinedInterface, FunctionalSimulator, ...) accepts machine words wherever it takes
+a list of Instruction objects.
+
+Words with an opcode or funct the simulator doesn't implement (nops, data words and padding in the text section, ...)
+still decode, so a program containing them loads. The engines raise UnsupportedInstruction only if one is executed.
+"""
+import sys
+from array import array
+from collections import namedtuple
+
+from control import precomputed_control
+from Faults import UnsupportedInstruction
+from Instruction import intern_instruction, REGISTER_NAMES, WORD_MASK, WORD_TYPECODE
+
+# Integer fields of an instruction decoded once, when instruction memory is set up. immediate is already sign-extended
+# to a masked 32-bit word, and control is the (shared, read-only) Control for the opcode. instruction is the
+# Instruction object it was built from, or None for an instruction decoded from a machine word.
+PredecodedInstruction = namedtuple('PredecodedInstruction',
+                                   ['instruction', 'opcode', 'rs', 'rt', 'rd', 'funct', 'immediate', 'address',
+                                    'control'])
+
+# opcode -> (mnemonic, format) for every supported I and J format instruction. Format is 'I' (rt, rs, immediate),
+# 'M' (load/store, same operands), 'B' (branch: rs, rt, offset) or 'J' (address field).
+OPCODE_TABLE = {8: ('addi', 'I'), 12: ('andi', 'I'), 35: ('lw', 'M'), 43: ('sw', 'M'), 4: ('beq', 'B'),
+                5: ('bne', 'B'), 2: ('j', 'J')}
+
+# funct -> mnemonic for the supported R format (opcode 0) instructions
+FUNCT_TABLE = {32: 'add', 34: 'sub', 36: 'and', 37: 'or', 38: 'xor', 42: 'slt', 24: 'mult', 26: 'div'}
+
+_decoded_words = {}  # machine word -> PredecodedInstruction
+
+
+def predecode_instruction(instruction):
+    """
+    Builds the PredecodedInstruction for an Instruction object
+    :param instruction: Instruction object
+    :return: PredecodedInstruction
+    """
+    return PredecodedInstruction(instruction, instruction.opcode_num, instruction.rs_num, instruction.rt_num,
+                                 instruction.rd_num, instruction.function_num, instruction.immediate_num & WORD_MASK,
+                                 instruction.address_num, precomputed_control(instruction.opcode_num))
+
+
+def is_supported(entry):
+    """
+    :param entry: PredecodedInstruction
+    :return: True if the simulator implements the entry's opcode (and funct)
+    """
+    if entry.opcode == 0:
+        return entry.funct in FUNCT_TABLE
+    return entry.opcode in OPCODE_TABLE
+
+
+def unsupported_instruction(entry):
+    """
+    :param entry: PredecodedInstruction that is_supported rejects
+    :return: UnsupportedInstruction to raise for it
+    """
+    if entry.opcode == 0:
+        return UnsupportedInstruction("(Decoder): Error! Unsupported funct %d" % entry.funct)
+    return UnsupportedInstruction("(Decoder): Error! Unsupported opcode %d" % entry.opcode)
+
+
+def decode_word(word):
+    """
+    Decodes a machine word. A word with an opcode or funct the simulator doesn't support decodes to an entry that
+    is_supported rejects (R format fields for opcode 0, only the opcode otherwise); it only faults if executed.
+    :param word: 32-bit machine word (int)
+    :return: PredecodedInstruction (with instruction set to None)
+    """
+    entry = _decoded_words.get(word)
+    if entry is not None:
+        return entry
+    if not 0 <= word <= WORD_MASK:
+        raise Exception("(Decoder): Error! %r is not a 32-bit word" % (word,))
+
+    # Fields that don't belong to the format are left at 0, as in an Instruction object
+    opcode = word >> 26
+    rs = rt = rd = funct = immediate = address = 0
+    if opcode == 0:
+        funct = word & 0x3F
+        rs, rt, rd = (word >> 21) & 0x1F, (word >> 16) & 0x1F, (word >> 11) & 0x1F
+    elif opcode in OPCODE_TABLE:
+        if OPCODE_TABLE[opcode][1] == 'J':
+            address = word & 0x3FFFFFF
+        else:
+            rs, rt = (word >> 21) & 0x1F, (word >> 16) & 0x1F
+            immediate = word & 0xFFFF
+            if immediate & 0x8000:
+                immediate |= 0xFFFF0000
+
+    entry = PredecodedInstruction(None, opcode, rs, rt, rd, funct, immediate, address, precomputed_control(opcode))
+    _decoded_words[word] = entry
+    return entry
+
+
+def decode_words(words):
+    """
+    :param words: iterable of machine words
+    :return: list of PredecodedInstruction, one per word
+    """
+    return [decode_word(word) for word in words]
+
+
+def disassemble(entry):
+    """
+    :param entry: PredecodedInstruction
+    :return: (mnemonic, operand tuple), with the operands in the order the Instruction constructor takes them. Raises
+    UnsupportedInstruction for an entry is_supported rejects.
+    """
+    if not is_supported(entry):
+        raise unsupported_instruction(entry)
+    if entry.opcode == 0:
+        return FUNCT_TABLE[entry.funct], (REGISTER_NAMES[entry.rd], REGISTER_NAMES[entry.rs], REGISTER_NAMES[entry.rt])
+    mnemonic, form = OPCODE_TABLE[entry.opcode]
+    if form == 'J':
+        return mnemonic, (str(entry.address),)
+    immediate = entry.immediate - (1 << 32) if entry.immediate & 0x80000000 else entry.immediate
+    if form == 'B':
+        return mnemonic, (REGISTER_NAMES[entry.rs], REGISTER_NAMES[entry.rt], str(immediate))
+    return mnemonic, (REGISTER_NAMES[entry.rt], REGISTER_NAMES[entry.rs], str(immediate))
+
+
+def to_instruction(entry):
+    """
+    :param entry: PredecodedInstruction
+    :return: the Instruction object the entry was built from, or the shared CompactInstruction for an entry decoded
+    from a machine word. Raises UnsupportedInstruction for an entry is_supported rejects.
+    """
+    if entry.instruction is not None:
+        return entry.instruction
+    if not is_supported(entry):
+        raise unsupported_instruction(entry)
+    name = FUNCT_TABLE[entry.funct] if entry.opcode == 0 else OPCODE_TABLE[entry.opcode][0]
+    immediate = entry.immediate - (1 << 32) if entry.immediate & 0x80000000 else entry.immediate
+    return intern_instruction(name, entry.opcode, entry.rs, entry.rt, entry.rd, entry.funct, immediate, entry.address)
+
+
+def decode_instruction(word):
+    """
+    :param word: 32-bit machine word
+    :return: CompactInstruction for the word
+    """
+    return to_instruction(decode_word(word))
+
+
+def is_machine_code(program):
+    """
+    :param program: list of Instruction objects, or machine words (array, memoryview or list of ints)
+    :return: True if program is made of machine words
+    """
+    if isinstance(program, (array, memoryview)):
+        return True
+    return len(program) > 0 and isinstance(program[0], int)
+
+
+def predecode_program(program):
+    """
+    :param program: list of Instruction objects, or machine words
+    :return: list of PredecodedInstruction, one per instruction
+    """
+    if is_machine_code(program):
+        return decode_words(program)
+    return [predecode_instruction(instruction) for instruction in program]
+
+
+def words_from_bytes(data, byteorder='big'):
+    """
+    Reinterprets a flat binary image as machine words
+    :param data: bytes-like object whose length is a multiple of 4
+    :param byteorder: 'big' or 'little', the byte order of the words in the image
+    :return: array of words
+    """
+    if byteorder not in ('big', 'little'):
+        raise Exception("(Decoder): Error! byteorder must be 'big' or 'little'")
+    view = memoryview(data).cast('B')
+    if len(view) % 4:
+        raise Exception("(Decoder): Error! Image length %d is not a multiple of 4 bytes" % len(view))
+    words = array(WORD_TYPECODE)
+    words.frombytes(view)
+    if byteorder != sys.byteorder:
+        words.byteswap()
+    return words
+
+
+def words_from_hex(text):
+    """
+    Parses a hex image: whitespace separated 8 digit words (an optional 0x prefix is allowed), # starts a comment
+    :param text: image text
+    :return: array of words
+    """
+    digits = []
+    for line in text.splitlines():
+        comment = line.find('#')
+        if comment >= 0:
+            line = line[:comment]
+        for token in line.split():
+            if token[:2] in ('0x', '0X'):
+                token = token[2:]
+            if len(token) != 8:
+                raise Exception("(Decoder): Error! '%s' is not an 8 digit hex word" % token)
+            digits.append(token)
+    try:
+        data = bytes.fromhex(''.join(digits))
+    except ValueError:
+        raise Exception("(Decoder): Error! Hex image contains a non hex digit")
+    return words_from_bytes(data, 'big')
+
+
+def load_image(path, byteorder='big'):
+    """
+    Loads a program image. Files ending in .hex or .txt are read as hex text, anything else as a flat binary.
+    :param path: path to the image
+    :param byteorder: byte order of a binary image
+    :return: array of words
+    """
+    if path.lower().endswith(('.hex', '.txt')):
+        with open(path) as image:
+            return words_from_hex(image.read())
+    with open(path, 'rb') as image:
+        return words_from_bytes(image.read(), byteorder)
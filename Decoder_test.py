@@ -0,0 +1,170 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from Decoder import decode_instruction, decode_word, disassemble, is_supported, load_image, predecode_program, \
+    words_from_bytes, words_from_hex
+from Faults import UnsupportedInstruction
+from FunctionalSimulator import FunctionalSimulator
+from Instruction import Instruction, decode_asm_register, decode_signed_binary_number
+from BlockTranslator import TranslatingSimulator
+from Interface_test import build_test_program, run_to_completion
+from PipelineInterface import PipelineInterface
+from PipelinedInterface import PipelinedInterface
+from Stages import Fetch, predecode_instruction
+
+
+def machine_code(instructions):
+    return [int(instruction.binary_version(), 2) for instruction in instructions]
+
+
+class DecoderTest(unittest.TestCase):
+    def test_matches_predecoded_instructions(self):
+        instructions, registers, memory = build_test_program()
+        for instruction, word in zip(instructions, machine_code(instructions)):
+            self.assertEqual(predecode_instruction(instruction)[1:], decode_word(word)[1:])
+            self.assertIsNone(decode_word(word).instruction)
+
+    def test_round_trips_through_instruction(self):
+        instructions, registers, memory = build_test_program()
+        for instruction, word in zip(instructions, machine_code(instructions)):
+            decoded = decode_instruction(word)
+            self.assertEqual(instruction.binary_version(), decoded.binary_version())
+            self.assertEqual(instruction.name, decoded.name)
+
+    def test_disassemble(self):
+        instructions, registers, memory = build_test_program()
+        words = machine_code(instructions)
+        self.assertEqual(('addi', ('$t7', '$zero', '4')), disassemble(decode_word(words[0])))
+        self.assertEqual(('beq', ('$t2', '$t1', '14')), disassemble(decode_word(words[7])))
+        self.assertEqual(('sub', ('$a1', '$a1', '$t1')), disassemble(decode_word(words[8])))
+        self.assertEqual(('lw', ('$t0', '$a0', '0')), disassemble(decode_word(words[9])))
+        self.assertEqual(('j', ('20',)), disassemble(decode_word(words[15])))
+        self.assertEqual(('addi', ('$t0', '$t0', '-1')), disassemble(decode_word(0x2108FFFF)))
+        self.assertEqual(0xFFFFFFFF, decode_word(0x2108FFFF).immediate)
+
+    def test_decoded_words_are_shared(self):
+        self.assertIs(decode_word(0x01094020), decode_word(0x01094020))
+
+    def test_unsupported_words(self):
+        for word in [0xFC000000, 0x00000008, 0x00000000]:  # opcode 63, funct 8 (jr), nop (sll)
+            entry = decode_word(word)
+            self.assertFalse(is_supported(entry))
+            with self.assertRaises(UnsupportedInstruction):
+                disassemble(entry)
+            with self.assertRaises(UnsupportedInstruction):
+                decode_instruction(word)
+        for word in [1 << 32, -1]:
+            with self.assertRaises(Exception):
+                decode_word(word)
+
+    def test_words_from_bytes(self):
+        self.assertEqual([0x01020304, 0xAABBCCDD], list(words_from_bytes(bytes.fromhex('01020304AABBCCDD'))))
+        self.assertEqual([0x04030201], list(words_from_bytes(bytes.fromhex('01020304'), 'little')))
+        self.assertEqual([0x01020304], list(words_from_bytes(bytearray.fromhex('01020304'))))
+        with self.assertRaises(Exception):
+            words_from_bytes(b'\x00\x01\x02')
+
+    def test_words_from_hex(self):
+        text = "# a comment\n20080001 0x2108FFFF  # two words\n\n01094020\n"
+        self.assertEqual([0x20080001, 0x2108FFFF, 0x01094020], list(words_from_hex(text)))
+        for bad in ["2008001", "2008000G"]:
+            with self.assertRaises(Exception):
+                words_from_hex(bad)
+
+    def test_load_image(self):
+        instructions, registers, memory = build_test_program()
+        words = machine_code(instructions)
+        handle, binary_path = tempfile.mkstemp(suffix='.bin')
+        with os.fdopen(handle, 'wb') as image:
+            image.write(struct.pack('>%dI' % len(words), *words))
+        handle, hex_path = tempfile.mkstemp(suffix='.hex')
+        with os.fdopen(handle, 'w') as image:
+            image.write('\n'.join('%08x' % word for word in words))
+        try:
+            self.assertEqual(words, list(load_image(binary_path)))
+            self.assertEqual(words, list(load_image(hex_path)))
+        finally:
+            os.remove(binary_path)
+            os.remove(hex_path)
+
+
+class MachineCodeProgramTest(unittest.TestCase):
+    def setUp(self):
+        self.instructions, self.registers, self.memory = build_test_program()
+        self.words = words_from_bytes(struct.pack('>%dI' % len(self.instructions), *machine_code(self.instructions)))
+
+    def test_predecode_program(self):
+        self.assertEqual([entry[1:] for entry in predecode_program(self.instructions)],
+                         [entry[1:] for entry in predecode_program(self.words)])
+
+    def test_fetch_builds_instructions_on_demand(self):
+        fetch = Fetch(self.words, 0)
+        self.assertEqual([None] * len(self.words), fetch._instruction_table)
+        fetch.update_program_counter(8)
+        self.assertEqual(self.instructions[2].binary_version(), fetch.fetch_instruction().binary_version())
+        self.assertIs(fetch.fetch_instruction(), fetch.fetch_instruction())
+
+    def run_pipeline(self, program, integer_datapath):
+        interface = PipelineInterface(program, 0, list(self.registers), dict(self.memory), integer_datapath)
+        run_to_completion(interface)
+        return list(interface.retrieve_register_list(as_binary=True))
+
+    def test_single_cycle_pipeline(self):
+        expected = self.run_pipeline(self.instructions, False)
+        self.assertEqual(expected, self.run_pipeline(self.words, False))
+        self.assertEqual(expected, self.run_pipeline(self.words, True))
+
+    def test_instruction_name_from_machine_code(self):
+        interface = PipelineInterface(self.words, 0, list(self.registers), dict(self.memory), True)
+        interface.trigger_clock_cycle()
+        self.assertEqual(self.instructions[0].asm_version(), interface.retrive_instruction_name())
+
+    def test_other_engines(self):
+        expected = FunctionalSimulator(self.instructions, 0, list(self.registers), dict(self.memory))
+        expected.run()
+        simulator = FunctionalSimulator(self.words, 0, list(self.registers), dict(self.memory))
+        simulator.run()
+        self.assertEqual(list(expected.retrieve_register_list()), list(simulator.retrieve_register_list()))
+
+        pipelined = PipelinedInterface(self.words, 0, list(self.registers), dict(self.memory))
+        pipelined.run()
+        self.assertEqual(list(expected.retrieve_register_list()), list(pipelined.retrieve_register_list()))
+
+    def test_nop_and_data_words(self):
+        # the program jumps over a nop and a data word in its text section
+        code = machine_code([Instruction('addi', '$t0', '$zero', '5'), Instruction('j', '4')])
+        code += [0x00000000, 0xDEADBEEF] + machine_code([Instruction('addi', '$t1', '$t0', '1')])
+        words = words_from_bytes(struct.pack('>%dI' % len(code), *code))
+        t1 = decode_asm_register('t1')
+        for engine in [FunctionalSimulator, TranslatingSimulator]:
+            simulator = engine(words, 0, [0] * 32, {})
+            simulator.run()
+            self.assertEqual(6, simulator.retrieve_register_list()[t1])
+        for integer_datapath in [True, False]:
+            interface = PipelineInterface(words, 0, [0] * 32 if integer_datapath else ['0' * 32] * 32, {},
+                                          integer_datapath)
+            interface.run()
+            self.assertEqual(6, decode_signed_binary_number(interface.retrieve_register_list(True)[t1], 32))
+        pipelined = PipelinedInterface(words, 0, [0] * 32, {})
+        pipelined.run()
+        self.assertEqual(6, pipelined.retrieve_register_list()[t1])
+
+        self.assertEqual([0, 4, 16], sorted(Fetch(words, 0).instruction_memory))
+
+        # running into them faults
+        for word in [0x00000000, 0xDEADBEEF]:
+            for engine in [FunctionalSimulator, TranslatingSimulator]:
+                with self.assertRaises(UnsupportedInstruction):
+                    engine([word], 0, [0] * 32, {}).run()
+            for integer_datapath in [True, False]:
+                registers = [0] * 32 if integer_datapath else ['0' * 32] * 32
+                with self.assertRaises(UnsupportedInstruction):
+                    PipelineInterface([word], 0, registers, {}, integer_datapath).run()
+            with self.assertRaises(UnsupportedInstruction):
+                PipelinedInterface([word], 0, [0] * 32, {}).run()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+Faults.py
+
+Exceptions for faults raised while a program runs. They all derive from SimulationFault (and from Exception, with the
+same messages as before, so code matching on the text keeps working). A program running off the end of instruction
+memory is how it halts, not a fault: the run() methods check for it before fetching and report it in their result.
+"""
+
+
+class SimulationFault(Exception):
+    """
+    Base class of the faults a running program can cause
+    """
+    pass
+
+
+class InvalidInstructionAddress(SimulationFault):
+    """
+    An instruction was fetched from outside of instruction memory
+    """
+    pass
+
+
+class MisalignedProgramCounter(SimulationFault):
+    """
+    The program counter was set to an address that isn't a multiple of 4
+    """
+    pass
+
+
+class MemoryFault(SimulationFault):
+    """
+    A load or store used a misaligned address, or one outside of data memory
+    """
+    pass
+
+
+class DivisionByZero(SimulationFault):
+    """
+    A div instruction's divisor was zero
+    """
+    pass
+
+
+class UnsupportedInstruction(SimulationFault):
+    """
+    An instruction's opcode or funct field isn't one the simulator implements
+    """
+    pass
@@ -58,5 +58,47 @@ class FetchStageTest(unittest.TestCase):
         fetch_object.increment_program_counter()
         self.assertEqual(4, fetch_object.program_counter)
 
+    def test_fetch_instruction_below_base_address_breaks(self):
+        fetch_object = Fetch(FetchStageTest.Instruction_list, '64')
+        fetch_object.update_program_counter(60)
+        with self.assertRaises(Exception) as cm:
+            fetch_object.fetch_instruction()
+        self.assertTrue("Invalid Instruction Address!" in str(cm.exception))
+
+    def test_fetch_instruction_with_base_address(self):
+        fetch_object = Fetch(FetchStageTest.Instruction_list, '64')
+        fetch_object.update_program_counter(68)
+        self.assertIs(FetchStageTest.Instruction_list[1], fetch_object.fetch_instruction())
+
+    def test_fetch_predecoded_instruction(self):
+        fetch_object = Fetch(FetchStageTest.Instruction_list, '0')
+        fetch_object.update_program_counter(4)  # addi $t8, $zero, 1
+        predecoded = fetch_object.fetch_predecoded_instruction()
+        self.assertIs(FetchStageTest.Instruction_list[1], predecoded.instruction)
+        self.assertEqual(8, predecoded.opcode)
+        self.assertEqual(0, predecoded.rs)
+        self.assertEqual(24, predecoded.rt)
+        self.assertEqual(1, predecoded.immediate)
+        self.assertEqual(True, predecoded.control.ALUSrc)
+
+    def test_predecoded_sign_extended_immediate(self):
+        fetch_object = Fetch([Instruction('addi', '$t8', '$zero', '-10')], '0')
+        self.assertEqual(0xFFFFFFF6, fetch_object.fetch_predecoded_instruction().immediate)
+
+    def test_predecoded_jump_address_field(self):
+        fetch_object = Fetch(FetchStageTest.Instruction_list, '0')
+        fetch_object.update_program_counter(44)  # j 320
+        self.assertEqual(320, fetch_object.fetch_predecoded_instruction().address)
+        self.assertEqual(True, fetch_object.fetch_predecoded_instruction().control.jump)
+
+    def test_instruction_memory(self):
+        fetch_object = Fetch(FetchStageTest.Instruction_list, '64')
+        self.assertIsNone(fetch_object.predecoded_instructions)  # only predecoded for the integer datapath
+        instruction_memory = fetch_object.instruction_memory
+        self.assertEqual(len(FetchStageTest.Instruction_list), len(instruction_memory))
+        self.assertIs(FetchStageTest.Instruction_list[0], instruction_memory[64])
+        self.assertIs(FetchStageTest.Instruction_list[-1], instruction_memory[116])
+
+
 if __name__ == '__main__':
     unittest.main()
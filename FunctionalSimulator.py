@@ -0,0 +1,226 @@
+"""
+FunctionalSimulator.py
+
+A functional (instruction set) simulator for fast-forwarding and regression runs. It runs the same Instruction
+programs, register file and data memory as the pipeline, but executes each instruction with a single call through a
+dispatch table on opcode/funct instead of handing it through the five stages. The architectural state it ends with
+is the same as PipelineInterface's with integer_datapath=True.
+"""
+from DataMemory import DataMemory
+from Decoder import predecode_program
+from Faults import DivisionByZero, UnsupportedInstruction
+from Instruction import to_signed_word, WORD_MASK
+from RegisterFile import RegisterFile
+
+
+def divide_word(dividend, divisor):
+    """
+    Signed 32-bit division, truncated toward zero like the ALU's. Raises DivisionByZero if divisor is 0.
+    :return: masked 32-bit quotient
+    """
+    if divisor == 0:
+        raise DivisionByZero("(FunctionalSimulator): Error! Division by zero")
+    dividend = to_signed_word(dividend)
+    divisor = to_signed_word(divisor)
+    quotient = abs(dividend) // abs(divisor)
+    if (dividend < 0) != (divisor < 0):
+        quotient = -quotient
+    return quotient & WORD_MASK
+
+
+class FunctionalSimulator(object):
+    def __init__(self, instruction_list, starting_pc_address, register_memory, data_mem):
+        """
+        Creates the simulator. Takes the same arguments as PipelineInterface.
+        :param instruction_list: list of Instruction objects in the order they should appear in instruction memory,
+        or the program's machine words (see Decoder.py)
+        :param starting_pc_address: integer starting address for the program counter, and base address of
+        instruction memory
+        :param register_memory: RegisterFile, or list of register values (binary strings or ints)
+        :param data_mem: memory model (DataMemory, PagedMemory, ...) or dictionary representing data memory
+        """
+        if len(instruction_list) == 0:
+            raise Exception("Instruction list must have at least one instruction present!")
+
+        self.base_address = int(starting_pc_address)
+        self.program_counter = self.base_address
+        self.predecoded_instructions = predecode_program(instruction_list)
+
+        if isinstance(register_memory, RegisterFile):
+            self.register_file = register_memory
+        else:
+            self.register_file = RegisterFile(register_memory)
+
+        if isinstance(data_mem, dict):
+            self.memory = DataMemory.from_dict(data_mem)
+        else:
+            self.memory = data_mem
+
+        self.instructions_executed = 0
+        self.halted = False  # set once the program counter leaves instruction memory
+        self.fault_pc = None  # address of the instruction that raised the last fault
+
+        self._opcode_handlers = None
+        self._build_dispatch_tables()
+
+    def _build_dispatch_tables(self):
+        """
+        Builds the 64-entry opcode table (and the funct table behind opcode 0). Each handler takes the predecoded
+        instruction and the incremented program counter, and returns the next program counter.
+        :return: None
+        """
+        regs = self.register_file.words
+        load_word = self.memory.load_word
+        store_word = self.memory.store_word
+
+        def add(entry, next_pc):
+            if entry.rd:
+                regs[entry.rd] = (regs[entry.rs] + regs[entry.rt]) & WORD_MASK
+            return next_pc
+
+        def sub(entry, next_pc):
+            if entry.rd:
+                regs[entry.rd] = (regs[entry.rs] - regs[entry.rt]) & WORD_MASK
+            return next_pc
+
+        def and_(entry, next_pc):
+            if entry.rd:
+                regs[entry.rd] = regs[entry.rs] & regs[entry.rt]
+            return next_pc
+
+        def or_(entry, next_pc):
+            if entry.rd:
+                regs[entry.rd] = regs[entry.rs] | regs[entry.rt]
+            return next_pc
+
+        def xor(entry, next_pc):
+            if entry.rd:
+                regs[entry.rd] = regs[entry.rs] ^ regs[entry.rt]
+            return next_pc
+
+        def slt(entry, next_pc):
+            if entry.rd:
+                regs[entry.rd] = 1 if to_signed_word(regs[entry.rs]) < to_signed_word(regs[entry.rt]) else 0
+            return next_pc
+
+        def mult(entry, next_pc):
+            if entry.rd:
+                regs[entry.rd] = (to_signed_word(regs[entry.rs]) * to_signed_word(regs[entry.rt])) & WORD_MASK
+            return next_pc
+
+        def div(entry, next_pc):
+            quotient = divide_word(regs[entry.rs], regs[entry.rt])  # even into $zero, so dividing by zero faults
+            if entry.rd:
+                regs[entry.rd] = quotient
+            return next_pc
+
+        funct_handlers = {32: add, 34: sub, 36: and_, 37: or_, 38: xor, 42: slt, 24: mult, 26: div}
+
+        def r_format(entry, next_pc):
+            handler = funct_handlers.get(entry.funct)
+            if handler is None:
+                raise UnsupportedInstruction("(FunctionalSimulator): Error! Unsupported funct field (%d)" % entry.funct)
+            return handler(entry, next_pc)
+
+        def addi(entry, next_pc):
+            if entry.rt:
+                regs[entry.rt] = (regs[entry.rs] + entry.immediate) & WORD_MASK
+            return next_pc
+
+        def andi(entry, next_pc):  # the ALU ands with the sign-extended immediate, so we do too
+            if entry.rt:
+                regs[entry.rt] = regs[entry.rs] & entry.immediate
+            return next_pc
+
+        def beq(entry, next_pc):
+            if regs[entry.rs] == regs[entry.rt]:
+                return (next_pc + (entry.immediate << 2)) & WORD_MASK
+            return next_pc
+
+        def bne(entry, next_pc):
+            if regs[entry.rs] != regs[entry.rt]:
+                return (next_pc + (entry.immediate << 2)) & WORD_MASK
+            return next_pc
+
+        def lw(entry, next_pc):
+            value = load_word((regs[entry.rs] + entry.immediate) & WORD_MASK)
+            if entry.rt:
+                regs[entry.rt] = value
+            return next_pc
+
+        def sw(entry, next_pc):
+            store_word((regs[entry.rs] + entry.immediate) & WORD_MASK, regs[entry.rt])
+            return next_pc
+
+        def jump(entry, next_pc):
+            return (next_pc & 0xF0000000) | (entry.address << 2)
+
+        def unsupported(entry, next_pc):
+            raise UnsupportedInstruction("(FunctionalSimulator): Error! Unsupported opcode (%d)" % entry.opcode)
+
+        self._opcode_handlers = [unsupported] * 64
+        for opcode, handler in [(0, r_format), (2, jump), (4, beq), (5, bne), (8, addi), (12, andi), (35, lw),
+                                (43, sw)]:
+            self._opcode_handlers[opcode] = handler
+
+    def step(self):
+        """
+        Executes a single instruction
+        :return: True if an instruction was executed, False if the program counter is outside instruction memory
+        """
+        return self.run(1) == 1
+
+    def run(self, max_instructions=None):
+        """
+        Executes instructions until the program counter leaves instruction memory or max_instructions have run.
+        If an instruction faults, the program counter is left at it (and recorded in fault_pc) and
+        instructions_executed counts the instructions before it, so the state can be inspected or the run resumed.
+        :param max_instructions: instruction budget for this call (None for no limit)
+        :return: number of instructions executed by this call
+        """
+        table = self.predecoded_instructions
+        table_length = len(table)
+        handlers = self._opcode_handlers
+        base_address = self.base_address
+        pc = self.program_counter
+        count = 0
+
+        try:
+            while True:
+                index = (pc - base_address) >> 2
+                if index < 0 or index >= table_length:
+                    self.halted = True
+                    break
+                if max_instructions is not None and count >= max_instructions:
+                    break
+                entry = table[index]
+                pc = handlers[entry.opcode](entry, pc + 4)
+                count += 1
+        except Exception:
+            self.fault_pc = pc
+            raise
+        finally:
+            self.program_counter = pc
+            self.instructions_executed += count
+        return count
+
+    def retrieve_register_list(self, as_binary=False):
+        """
+        :param as_binary: return a list of 32-bit binary strings instead of the RegisterFile
+        :return: RegisterFile (or list of binary strings)
+        """
+        if as_binary:
+            return self.register_file.binary_list()
+        return self.register_file
+
+    def retrieve_data_memory(self, as_binary=False):
+        """
+        :param as_binary: return the memory as a dictionary of 32-bit binary strings
+        :return: memory model (or dictionary)
+        """
+        if as_binary:
+            return self.memory.binary_dict()
+        return self.memory
+
+    def retrieve_current_pc_address(self):
+        return self.program_counter
@@ -0,0 +1,81 @@
+import unittest
+
+from BlockTranslator import TranslatingSimulator
+from Faults import DivisionByZero
+from FunctionalSimulator import FunctionalSimulator
+from PipelineInterface import PipelineInterface
+from Instruction import Instruction, decode_asm_register
+from Interface_test import build_test_program, run_to_completion
+from ThreadedSimulator import ThreadedSimulator
+
+
+class FunctionalSimulatorTest(unittest.TestCase):
+    def assert_same_state(self, instructions, registers, memory):
+        interface = PipelineInterface(instructions, 0, list(registers), dict(memory), True)
+        simulator = FunctionalSimulator(instructions, 0, list(registers), dict(memory))
+
+        self.assertEqual(run_to_completion(interface), simulator.run())
+        self.assertTrue(simulator.halted)
+        self.assertEqual(interface.retrieve_current_pc_address(), simulator.retrieve_current_pc_address())
+        self.assertEqual(list(interface.retrieve_register_list()), list(simulator.retrieve_register_list()))
+        self.assertEqual(bytes(interface.retrieve_data_memory().view()), bytes(simulator.retrieve_data_memory().view()))
+
+    def test_test_program_matches_pipeline(self):
+        self.assert_same_state(*build_test_program())
+
+    def test_branch_after_bne_matches_pipeline(self):
+        instructions = [Instruction('addi', '$t0', '$zero', '3'), Instruction('bne', '$t0', '$zero', '0'),
+                        Instruction('beq', '$t0', '$zero', '2'), Instruction('addi', '$t1', '$zero', '-7'),
+                        Instruction('div', '$t2', '$t1', '$t0'), Instruction('mult', '$t3', '$t1', '$t0'),
+                        Instruction('andi', '$t4', '$t1', '-4'), Instruction('slt', '$t5', '$t1', '$t0')]
+        self.assert_same_state(instructions, [0] * 32, {})
+
+    def test_run_with_budget(self):
+        instructions, registers, memory = build_test_program()
+        simulator = FunctionalSimulator(instructions, 0, registers, memory)
+        self.assertEqual(10, simulator.run(10))
+        self.assertFalse(simulator.halted)
+        self.assertEqual(10, simulator.instructions_executed)
+        simulator.run()
+        self.assertTrue(simulator.halted)
+        self.assertEqual(0, simulator.run())
+
+    def test_step(self):
+        simulator = FunctionalSimulator([Instruction('addi', '$t8', '$zero', '1')], 0, [0] * 32, {})
+        self.assertTrue(simulator.step())
+        self.assertEqual(1, simulator.retrieve_register_list()[decode_asm_register('t8')])
+        self.assertFalse(simulator.step())
+
+    def test_zero_register_is_hard_wired(self):
+        simulator = FunctionalSimulator([Instruction('addi', '$zero', '$zero', '1')], 0, [0] * 32, {})
+        simulator.run()
+        self.assertEqual(0, simulator.retrieve_register_list()[0])
+
+    def test_starting_address(self):
+        instructions = [Instruction('addi', '$t8', '$zero', '1'), Instruction('j', '64')]
+        simulator = FunctionalSimulator(instructions, 256, [0] * 32, {})
+        self.assertEqual(2, simulator.run(2))
+        self.assertEqual(256, simulator.retrieve_current_pc_address())
+
+    def test_division_by_zero(self):
+        instructions = [Instruction('addi', '$t1', '$zero', '7'), Instruction('div', '$t0', '$t1', '$t2')]
+        for engine in [FunctionalSimulator, ThreadedSimulator, TranslatingSimulator]:
+            simulator = engine(instructions, 0, [0] * 32, {})
+            with self.assertRaises(DivisionByZero):
+                simulator.run()
+            self.assertEqual(4, simulator.fault_pc)
+
+    def test_division_by_zero_into_zero_register(self):
+        instructions = [Instruction('addi', '$t1', '$zero', '7'), Instruction('div', '$zero', '$t1', '$t2')]
+        simulator = FunctionalSimulator(instructions, 0, [0] * 32, {})
+        with self.assertRaises(DivisionByZero):
+            simulator.run()
+        interface = PipelineInterface(instructions, 0, [0] * 32, {}, True)
+        with self.assertRaises(DivisionByZero):
+            interface.run()
+        self.assertEqual(interface.retrieve_current_pc_address(), simulator.retrieve_current_pc_address())
+        self.assertEqual(list(interface.retrieve_register_list()), list(simulator.retrieve_register_list()))
+
+
+if __name__ == '__main__':
+    unittest.main()
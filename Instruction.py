@@ -6,6 +6,24 @@ The Instruction class == an abstract representation of a 32-bit MIPS assembly in
 Created: 3/25/17
 Author: Trey Franklin
 """
+from array import array
+
+WORD_MASK = 0xFFFFFFFF  # masks a python int down to an unsigned 32-bit word
+
+
+def _word_typecode():
+    """
+    The C standard only promises that 'I' is at least 2 bytes and 'L' at least 4 ('L' is 8 bytes on LP64 platforms),
+    so the sizes are checked rather than assumed
+    :return: array typecode of a 4-byte unsigned int
+    """
+    for typecode in ('I', 'L', 'H'):
+        if array(typecode).itemsize == 4:
+            return typecode
+    raise Exception("(Instruction): Error! No array typecode holds exactly 4 bytes on this platform")
+
+
+WORD_TYPECODE = _word_typecode()  # typecode for arrays of 32-bit words
 
 
 def create_sized_binary_num(decimal_num, desired_len):
@@ -44,44 +62,55 @@ def decode_signed_binary_number(binary_num, bit_count, force_unsigned=False):
         return int(binary_num, 2)
 
 
-def decode_asm_register(register):  # TODO: This isn't best practice, remove the method from the class too.
+def to_word(value):
+    """
+    Converts a 32-bit value into the masked, unsigned integer form used by the integer datapath.
+    :param value: either a 32 character binary string or a (possibly negative) integer
+    :return: integer between 0 and 2^32 - 1
+    """
+    if isinstance(value, str):
+        return int(value, 2)
+    return int(value) & WORD_MASK
+
+
+def to_signed_word(word):
+    """
+    Interprets a masked 32-bit word as a two's complement signed integer
+    :param word: integer between 0 and 2^32 - 1
+    :return: signed integer
+    """
+    if word & 0x80000000:
+        return word - (1 << 32)
+    return word
+
+
+REGISTER_NAMES = ('$zero', '$at', '$v0', '$v1', '$a0', '$a1', '$a2', '$a3',
+                  '$t0', '$t1', '$t2', '$t3', '$t4', '$t5', '$t6', '$t7',
+                  '$s0', '$s1', '$s2', '$s3', '$s4', '$s5', '$s6', '$s7',
+                  '$t8', '$t9', '$k0', '$k1', '$gp', '$sp', '$fp', '$ra')
+
+# register name -> number. Every register is listed by name and by number ($8, 8), with and without the $, and $fp
+# also goes by $s8.
+REGISTER_NUMBERS = {'$s8': 30, 's8': 30}
+for _number, _name in enumerate(REGISTER_NAMES):
+    for _key in (_name, _name[1:], '$%d' % _number, '%d' % _number):
+        REGISTER_NUMBERS[_key] = _number
+
+
+def decode_asm_register(register):
     """
     Takes a MIPS assembly representation of a register and converts it to the corresponding register number
-    :param register:
-    :return:
+    :param register: register name ('t0', '$t0'), or number ('8', '$8')
+    :return: register number
     """
-    if register == "zero":
-        return 0
-    elif register in ['v0', 'v1']:
-        return int(register[1]) + 2
-    elif register in ['a0', 'a1', 'a2', 'a3']:
-        return int(register[1]) + 4
-    elif register in ['t0', 't1', 't2', 't3', 't4', 't5', 't6', 't7']:
-        return int(register[1]) + 8
-    elif register in ['s0', 's1', 's2', 's3', 's4', 's5', 's6', 's7']:
-        return int(register[1]) + 16
-    elif register in ['t8', 't9']:
-        return int(register[1]) + 16
-    elif register == 'gp':
-        return 28
-    elif register == 'sp':
-        return 29
-    elif register == 'fp':
-        return 30
-    elif register == 'ra':
-        return 31
-    else:
+    number = REGISTER_NUMBERS.get(register)
+    if number is None:
         raise Exception("Error processing a register decode")
+    return number
 
 
 def decode_int_reg_val(reg_num):
-    return ['$zero', '$at',
-            '$v0', '$v1',
-            '$a0', '$a1', '$a2', '$a3',
-            '$t0', '$t1', '$t2', '$t3', '$t4', '$t5', '$t6', '$t7',
-            '$s0', '$s1','$s2', '$s3', '$s4', '$s5', '$s6', '$s7',
-            '$t8', '$t9', '$k0', '$k1',
-            '$gp', '$sp', '$fp', '$ra'][reg_num]
+    return REGISTER_NAMES[reg_num]
 
 
 class Instruction:
@@ -112,6 +141,15 @@ class Instruction:
         self.address = '00000000000000000000000000'
         self.full_binary_rep = None
 
+        # integer versions of the fields, used by the integer datapath so it never has to re-parse the strings
+        self.opcode_num = 0
+        self.rs_num = 0
+        self.rt_num = 0
+        self.rd_num = 0
+        self.function_num = 0
+        self.immediate_num = 0  # sign-extended value of the immediate field
+        self.address_num = 0
+
         self.determine_format()
         self.populate_opcode()
         self.populate_rs()
@@ -121,6 +159,7 @@ class Instruction:
         self.populate_immediate()
         self.populate_address()
         self.create_binary()
+        self.populate_integer_fields()
 
     def create_binary(self):
         if self.format == "R":
@@ -134,6 +173,19 @@ class Instruction:
         else:
             raise Exception("Something broke and idk what happened in Instruction class.")
 
+    def populate_integer_fields(self):
+        """
+        Decode each of the binary fields once so that the integer datapath can use them directly
+        :return: None
+        """
+        self.opcode_num = int(self.opcode, 2)
+        self.rs_num = int(self.rs, 2)
+        self.rt_num = int(self.rt, 2)
+        self.rd_num = int(self.rd, 2)
+        self.function_num = int(self.function_field, 2)
+        self.immediate_num = decode_signed_binary_number(self.immediate, 16)
+        self.address_num = int(self.address, 2)
+
     @staticmethod
     def decode_asm_register(register):
         """
@@ -141,28 +193,7 @@ class Instruction:
         :param register:
         :return:
         """
-        if register == "zero":
-            return 0
-        elif register in ['v0', 'v1']:
-            return int(register[1]) + 2
-        elif register in ['a0', 'a1', 'a2', 'a3']:
-            return int(register[1]) + 4
-        elif register in ['t0', 't1', 't2', 't3', 't4', 't5', 't6', 't7']:
-            return int(register[1]) + 8
-        elif register in ['s0', 's1', 's2', 's3', 's4', 's5', 's6', 's7']:
-            return int(register[1]) + 16
-        elif register in ['t8', 't9']:
-            return int(register[1]) + 16
-        elif register == 'gp':
-            return 28
-        elif register == 'sp':
-            return 29
-        elif register == 'fp':
-            return 30
-        elif register == 'ra':
-            return 31
-        else:
-            raise Exception("Error processing a register decode")
+        return decode_asm_register(register)
 
     def determine_format(self):
         """
@@ -277,3 +308,175 @@ class Instruction:
     def asm_version(self):
 
         return self.name + " " + str(self._arg1) + " "+ str(self._arg2) + " " + str(self._arg3)
+
+
+# name -> (format, opcode, funct) of every instruction the simulator supports
+INSTRUCTION_ENCODINGS = {'add': ('R', 0, 32), 'sub': ('R', 0, 34), 'and': ('R', 0, 36), 'or': ('R', 0, 37),
+                         'xor': ('R', 0, 38), 'slt': ('R', 0, 42), 'mult': ('R', 0, 24), 'div': ('R', 0, 26),
+                         'addi': ('I', 8, 0), 'andi': ('I', 12, 0), 'beq': ('I', 4, 0), 'bne': ('I', 5, 0),
+                         'lw': ('I', 35, 0), 'sw': ('I', 43, 0), 'j': ('J', 2, 0)}
+
+
+class CompactInstruction(object):
+    """
+    Compact, read-only counterpart of Instruction for large programs. It only stores the integer fields (in
+    __slots__, so there is no per-instance __dict__); the binary strings and the assembly text are derived when
+    something asks for them. Instances are shared between identical instructions (see compact_instruction), so they
+    must never be modified.
+
+    It has the same interface as Instruction (the *_num fields, the binary field strings, binary_version() and
+    asm_version()), so either can be handed to the pipeline and the other engines.
+    """
+    __slots__ = ('name', 'format', 'opcode_num', 'rs_num', 'rt_num', 'rd_num', 'function_num', 'immediate_num',
+                 'address_num')
+
+    def __init__(self, name, opcode_num, rs_num=0, rt_num=0, rd_num=0, function_num=0, immediate_num=0,
+                 address_num=0):
+        """
+        :param name: lower case instruction name (a key of INSTRUCTION_ENCODINGS)
+        :param immediate_num: sign-extended value of the immediate field
+        """
+        self.name = name
+        self.format = INSTRUCTION_ENCODINGS[name][0]
+        self.opcode_num = opcode_num
+        self.rs_num = rs_num
+        self.rt_num = rt_num
+        self.rd_num = rd_num
+        self.function_num = function_num
+        self.immediate_num = immediate_num
+        self.address_num = address_num
+
+    @property
+    def branching(self):
+        return self.name == 'beq' or self.name == 'bne'
+
+    @property
+    def memory_op(self):
+        return self.name == 'lw' or self.name == 'sw'
+
+    @property
+    def opcode(self):
+        return '{:06b}'.format(self.opcode_num)
+
+    @property
+    def rs(self):
+        return '{:05b}'.format(self.rs_num)
+
+    @property
+    def rt(self):
+        return '{:05b}'.format(self.rt_num)
+
+    @property
+    def rd(self):
+        return '{:05b}'.format(self.rd_num)
+
+    @property
+    def shift_amount(self):
+        return '00000'
+
+    @property
+    def function_field(self):
+        return '{:06b}'.format(self.function_num)
+
+    @property
+    def immediate(self):
+        return '{:016b}'.format(self.immediate_num & 0xFFFF)
+
+    @property
+    def address(self):
+        return '{:026b}'.format(self.address_num)
+
+    def machine_word(self):
+        """
+        :return: the 32-bit encoding of the instruction as an int
+        """
+        if self.format == 'R':
+            return (self.rs_num << 21) | (self.rt_num << 16) | (self.rd_num << 11) | self.function_num
+        if self.format == 'I':
+            return (self.opcode_num << 26) | (self.rs_num << 21) | (self.rt_num << 16) | (self.immediate_num & 0xFFFF)
+        return (self.opcode_num << 26) | self.address_num
+
+    def binary_version(self):
+        return '{:032b}'.format(self.machine_word())
+
+    def asm_version(self):
+        """
+        :return: the same text as Instruction.asm_version (registers are named, without the $)
+        """
+        if self.format == 'R':
+            arguments = (REGISTER_NAMES[self.rd_num][1:], REGISTER_NAMES[self.rs_num][1:],
+                         REGISTER_NAMES[self.rt_num][1:])
+        elif self.format == 'J':
+            arguments = (self.address_num, None, None)
+        elif self.branching:
+            arguments = (REGISTER_NAMES[self.rs_num][1:], REGISTER_NAMES[self.rt_num][1:], self.immediate_num)
+        else:
+            arguments = (REGISTER_NAMES[self.rt_num][1:], REGISTER_NAMES[self.rs_num][1:], self.immediate_num)
+        return "%s %s %s %s" % ((self.name,) + arguments)
+
+    def __repr__(self):
+        return "CompactInstruction(%r)" % self.asm_version()
+
+
+_interned_by_arguments = {}  # (name, arg1, arg2, arg3) as given -> CompactInstruction
+_interned_by_word = {}  # machine word -> CompactInstruction
+
+
+def intern_instruction(name, opcode_num, rs_num=0, rt_num=0, rd_num=0, function_num=0, immediate_num=0,
+                       address_num=0):
+    """
+    Returns the shared CompactInstruction with the given fields, creating it the first time it is asked for
+    :return: CompactInstruction
+    """
+    instruction = CompactInstruction(name, opcode_num, rs_num, rt_num, rd_num, function_num, immediate_num,
+                                     address_num)
+    return _interned_by_word.setdefault(instruction.machine_word(), instruction)
+
+
+def _field_number(text, low, high):
+    try:
+        value = int(text)
+    except (TypeError, ValueError):
+        raise Exception("(Instruction): Error! '%s' is not a number" % (text,))
+    if not low <= value <= high:
+        raise Exception("(Instruction): Error! %d doesn't fit in the field" % value)
+    return value
+
+
+def compact_instruction(inst_name, inst_arg1, inst_arg2=None, inst_arg3=None):
+    """
+    Same arguments as Instruction, but returns the shared CompactInstruction for them. Registers are looked up in
+    REGISTER_NUMBERS, so '$t0', 't0', '$8' and '8' all name the same register.
+    :return: CompactInstruction
+    """
+    key = (inst_name, inst_arg1, inst_arg2, inst_arg3)
+    instruction = _interned_by_arguments.get(key)
+    if instruction is not None:
+        return instruction
+
+    name = inst_name.lower()
+    encoding = INSTRUCTION_ENCODINGS.get(name)
+    if encoding is None:
+        raise Exception("Unrecognized Instruction (Format)")
+    form, opcode, funct = encoding
+    try:
+        if form == 'R':
+            instruction = intern_instruction(name, opcode, REGISTER_NUMBERS[inst_arg2.lower()],
+                                             REGISTER_NUMBERS[inst_arg3.lower()], REGISTER_NUMBERS[inst_arg1.lower()],
+                                             funct)
+        elif form == 'J':
+            instruction = intern_instruction(name, opcode, address_num=_field_number(inst_arg1, 0, (1 << 26) - 1))
+        else:
+            immediate = _field_number(inst_arg3, -0x8000, 0xFFFF)
+            if immediate & 0x8000:
+                immediate = (immediate & 0xFFFF) - 0x10000  # sign-extend, as Instruction does
+            first, second = REGISTER_NUMBERS[inst_arg1.lower()], REGISTER_NUMBERS[inst_arg2.lower()]
+            if name == 'beq' or name == 'bne':
+                instruction = intern_instruction(name, opcode, first, second, immediate_num=immediate)
+            else:
+                instruction = intern_instruction(name, opcode, second, first, immediate_num=immediate)
+    except (KeyError, AttributeError):
+        raise Exception("Error processing a register decode")
+
+    _interned_by_arguments[key] = instruction
+    return instruction
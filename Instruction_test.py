@@ -1,5 +1,8 @@
+import sys
 import unittest
-from Instruction import Instruction, create_sized_binary_num, decode_signed_binary_number
+from array import array
+from Instruction import Instruction, CompactInstruction, compact_instruction, create_sized_binary_num, \
+    decode_asm_register, decode_signed_binary_number, WORD_TYPECODE
 
 
 class InstructionStageTest(unittest.TestCase):
@@ -71,5 +74,71 @@ class InstructionStageTest(unittest.TestCase):
         self.assertEqual(-2, decode_signed_binary_number(num5, 8))
         self.assertEqual(4, decode_signed_binary_number(num6, 8))
 
+
+COMPACT_TEST_INSTRUCTIONS = [('add', '$t1', '$t2', 't3'), ('addi', '$t8', '$zero', '-10'),
+                             ('beq', '$a1', '$zero', '-3'),
+                             ('sub', '$a1', '$a1', '$t8'), ('lw', '$t0', '$a0', '0'), ('slt', '$t1', '$t0', '$t4'),
+                             ('bne', '$t0', '$zero', '256'), ('div', '$v0', '$v0', '$t7'), ('or', '$s1', '$s1', '$v0'),
+                             ('sw', '$t6', '$a0', '-8'), ('j', '320'), ('mult', '$s2', '$s1', '$t3'),
+                             ('xor', '$s3', '$s3', '$s2'), ('andi', '$t1', '$t1', '255'), ('AND', 'T1', 'T2', 'T3')]
+
+
+class CompactInstructionTest(unittest.TestCase):
+    def test_matches_instruction(self):
+        for arguments in COMPACT_TEST_INSTRUCTIONS:
+            instruction, compact = Instruction(*arguments), compact_instruction(*arguments)
+            self.assertEqual(instruction.binary_version(), compact.binary_version(), arguments)
+            self.assertEqual(instruction.asm_version(), compact.asm_version(), arguments)
+            for field in ['name', 'format', 'branching', 'memory_op', 'opcode', 'rs', 'rt', 'rd', 'shift_amount',
+                          'function_field', 'immediate', 'address', 'opcode_num', 'rs_num', 'rt_num', 'rd_num',
+                          'function_num', 'immediate_num', 'address_num']:
+                self.assertEqual(getattr(instruction, field), getattr(compact, field), (arguments, field))
+
+        # the text is derived from the fields, so an immediate written unsigned comes back sign-extended
+        self.assertEqual(Instruction('addi', '$t4', '$zero', '65535').binary_version(),
+                         compact_instruction('addi', '$t4', '$zero', '65535').binary_version())
+        self.assertEqual('addi t4 zero -1', compact_instruction('addi', '$t4', '$zero', '65535').asm_version())
+
+    def test_identical_instructions_are_shared(self):
+        first = compact_instruction('add', '$t1', '$t2', '$t3')
+        self.assertIs(first, compact_instruction('add', '$t1', '$t2', '$t3'))
+        self.assertIs(first, compact_instruction('ADD', 't1', '$10', '11'))
+        self.assertIsNot(first, compact_instruction('add', '$t1', '$t3', '$t2'))
+
+    def test_no_instance_dictionary(self):
+        compact = compact_instruction('addi', '$t0', '$t0', '1')
+        self.assertFalse(hasattr(compact, '__dict__'))
+        self.assertTrue(sys.getsizeof(compact) < sys.getsizeof(Instruction('addi', '$t0', '$t0', '1').__dict__))
+
+    def test_errors(self):
+        for arguments in [('nop', '$t0'), ('add', '$t0', '$t1', '$t32'), ('addi', '$t0', '$t0', '65536'),
+                          ('addi', '$t0', '$t0', 'x'), ('j', '-1'), ('add', '$t0', '$t1')]:
+            with self.assertRaises(Exception):
+                compact_instruction(*arguments)
+
+    def test_register_names(self):
+        for number in range(32):
+            self.assertEqual(number, decode_asm_register('$%d' % number))
+            self.assertEqual(number, decode_asm_register('%d' % number))
+        self.assertEqual(1, decode_asm_register('at'))
+        self.assertEqual(26, decode_asm_register('k0'))
+        self.assertEqual(27, decode_asm_register('$k1'))
+        self.assertEqual(30, decode_asm_register('s8'))
+        self.assertEqual(8, decode_asm_register('t0'))
+        with self.assertRaises(Exception):
+            decode_asm_register('t10')
+        self.assertEqual(Instruction('add', '$8', '$9', '$10').binary_version(),
+                         Instruction('add', '$t0', '$t1', '$t2').binary_version())
+
+    def test_large_program(self):
+        program = [compact_instruction('addi', '$t%d' % (index % 8), '$t%d' % ((index + 1) % 8), str(index % 1000))
+                   for index in range(200000)]
+        self.assertEqual(1000, len(set(map(id, program))))  # index % 1000 decides the instruction
+        self.assertIsInstance(program[0], CompactInstruction)
+
+    def test_word_typecode(self):
+        self.assertEqual(4, array(WORD_TYPECODE).itemsize)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,15 @@
+import os
+import shutil
+import tempfile
+import tracemalloc
 import unittest
-from PipelineInterface import PipelineInterface
+
+from Cache import Cache
+from DataMemory import PagedMemory, MappedMemory, PAGE_SIZE
+from Faults import DivisionByZero, InvalidInstructionAddress, MemoryFault, SimulationFault
 from Instruction import Instruction, decode_signed_binary_number, create_sized_binary_num, decode_asm_register
+from PipelineInterface import PipelineInterface, CYCLE_LIMIT, HALTED, INSTRUCTION_LIMIT, REACHED_PC
+from Stages import LazyDecode
 
 
 class PipelineInterfaceTest(unittest.TestCase):
@@ -288,5 +297,317 @@ class PipelineInterfaceTest(unittest.TestCase):
         self.assertEqual(create_sized_binary_num(24 ^ 18, 32),
                          interface.retrieve_register_list()[decode_asm_register('s3')])
 
+
+def build_test_program():
+    """
+    The demonstration program from TestProgram.py, along with its starting registers and data memory
+    :return: instruction list, register file, data memory dictionary
+    """
+    instructions = [Instruction('addi', '$t7', '$zero', '4'), Instruction('addi', '$t6', '$zero', '32512'),
+                    Instruction('addi', '$t5', '$zero', '8'), Instruction('addi', '$t3', '$zero', '256'),
+                    Instruction('addi', '$t1', '$zero', '1'), Instruction('addi', '$t8', '$zero', '255'),
+                    Instruction('slt', '$t2', '$a1', '$t1'), Instruction('beq', '$t2', '$t1', '14'),
+                    Instruction('sub', '$a1', '$a1', '$t1'), Instruction('lw', '$t0', '$a0', '0'),
+                    Instruction('slt', '$t4', '$t3', '$t0'), Instruction('beq', '$t4', '$zero', '4'),
+                    Instruction('div', '$v0', '$v0', '$t5'), Instruction('or', '$v1', '$v1', '$v0'),
+                    Instruction('sw', '$t6', '$a0', '0'), Instruction('j', '20'),
+                    Instruction('mult', '$s2', '$s2', '$t7'), Instruction('xor', '$s3', '$s3', '$s2'),
+                    Instruction('sw', '$t8', '$a0', '0'), Instruction('j', '20'),
+                    Instruction('addi', '$a0', '$a0', '4'), Instruction('j', '6'),
+                    Instruction('addi', '$t8', '$zero', '0')]
+
+    registers = [create_sized_binary_num(0, 32) for i in range(0, 32)]
+    for name, value in [('v0', 0x0040), ('v1', 0x1010), ('s2', 0x000F), ('s3', 0x00F0), ('a0', 0x0010),
+                        ('a1', 0x0005)]:
+        registers[decode_asm_register(name)] = create_sized_binary_num(value, 32)
+
+    memory = {create_sized_binary_num(i, 32): create_sized_binary_num(0, 32) for i in range(0, 512, 4)}
+    for address, value in [(16, 0x0101), (20, 0x0110), (24, 0x0011), (28, 0x00F0), (32, 0x00FF)]:
+        memory[create_sized_binary_num(address, 32)] = create_sized_binary_num(value, 32)
+
+    return instructions, registers, memory
+
+
+def run_to_completion(interface):
+    """
+    Clocks the pipeline until the program counter leaves instruction memory
+    :return: number of clock cycles executed
+    """
+    return interface.run().cycles
+
+
+class IntegerDatapathTest(unittest.TestCase):
+    def test_registers_are_converted_to_ints(self):
+        register_file = [create_sized_binary_num(7, 32) for i in range(0, 32)]
+        interface = PipelineInterface([Instruction('addi', '$t8', '$zero', '1')], 0, register_file, {}, True)
+        self.assertEqual(0, interface.retrieve_register_list()[0])
+        self.assertEqual(7, interface.retrieve_register_list()[1])
+
+    def test_addi_negative_immediate(self):
+        register_file = [0] * 32
+        interface = PipelineInterface([Instruction('addi', '$t8', '$zero', '-10')], 0, register_file, {}, True)
+        interface.trigger_clock_cycle()
+        self.assertEqual(0xFFFFFFF6, interface.retrieve_register_list()[decode_asm_register('t8')])
+        self.assertEqual(create_sized_binary_num(-10, 32),
+                         interface.retrieve_register_list(as_binary=True)[decode_asm_register('t8')])
+
+    def test_zero_register_is_hard_wired(self):
+        register_file = [0] * 32
+        interface = PipelineInterface([Instruction('addi', '$zero', '$zero', '5')], 0, register_file, {}, True)
+        interface.trigger_clock_cycle()
+        self.assertEqual(0, interface.retrieve_register_list()[0])
+
+    def test_div_negative_truncates_toward_zero(self):
+        register_file = [0] * 32
+        register_file[decode_asm_register('v0')] = -7
+        register_file[decode_asm_register('t7')] = 2
+        interface = PipelineInterface([Instruction('div', '$v0', '$v0', '$t7')], 0, register_file, {}, True)
+        interface.trigger_clock_cycle()
+        self.assertEqual(-3 & 0xFFFFFFFF, interface.retrieve_register_list()[decode_asm_register('v0')])
+
+    def test_branch_backwards(self):
+        instructions = [Instruction('addi', '$t8', '$zero', '1'), Instruction('beq', '$zero', '$zero', '-2')]
+        interface = PipelineInterface(instructions, 0, [0] * 32, {}, True)
+        interface.trigger_clock_cycle()
+        interface.trigger_clock_cycle()
+        self.assertEqual(0, interface.retrieve_current_pc_address())
+
+    def test_sw_and_lw(self):
+        instructions = [Instruction('sw', '$t6', '$a0', '4'), Instruction('lw', '$t0', '$a0', '4')]
+        register_file = [0] * 32
+        register_file[decode_asm_register('a0')] = 8
+        register_file[decode_asm_register('t6')] = 1995
+        interface = PipelineInterface(instructions, 0, register_file, {}, True)
+        interface.trigger_clock_cycle()
+        interface.trigger_clock_cycle()
+        self.assertEqual(1995, interface.retrieve_data_memory()[12])
+        self.assertEqual(1995, interface.retrieve_register_list()[decode_asm_register('t0')])
+
+    def test_sw_and_lw_near_top_of_stack(self):
+        instructions = [Instruction('sw', '$t6', '$sp', '0'), Instruction('lw', '$t0', '$sp', '0')]
+        register_file = [0] * 32
+        register_file[decode_asm_register('sp')] = 0x7FFFFFFC
+        register_file[decode_asm_register('t6')] = 1995
+        interface = PipelineInterface(instructions, 0, register_file, PagedMemory(), True)
+        interface.trigger_clock_cycle()
+        interface.trigger_clock_cycle()
+        self.assertEqual(1995, interface.retrieve_register_list()[decode_asm_register('t0')])
+        self.assertEqual(1, interface.retrieve_data_memory().resident_pages)
+
+    def test_sw_to_mapped_memory_image(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'data.img')
+            register_file = [0] * 32
+            register_file[decode_asm_register('a0')] = 8
+            register_file[decode_asm_register('t6')] = 1995
+            memory = MappedMemory(path, 64)
+            interface = PipelineInterface([Instruction('sw', '$t6', '$a0', '0')], 0, register_file, memory, True)
+            interface.trigger_clock_cycle()
+            memory.close()
+            with open(path, 'rb') as image:
+                self.assertEqual((1995).to_bytes(4, 'big'), image.read()[8:12])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_program_matches_binary_string_datapath(self):
+        instructions, registers, memory = build_test_program()
+        string_interface = PipelineInterface(instructions, 0, list(registers), dict(memory))
+        integer_interface = PipelineInterface(instructions, 0, list(registers), dict(memory), True)
+
+        self.assertEqual(run_to_completion(string_interface), run_to_completion(integer_interface))
+        self.assertEqual(string_interface.retrieve_register_list(),
+                         integer_interface.retrieve_register_list(as_binary=True))
+        self.assertEqual(string_interface.retrieve_data_memory(),
+                         integer_interface.retrieve_data_memory(as_binary=True))
+
+
+class RunTest(unittest.TestCase):
+    def setUp(self):
+        instructions, registers, memory = build_test_program()
+        self.interface = PipelineInterface(instructions, 0, registers, memory, True)
+
+    def test_runs_to_halt(self):
+        result = self.interface.run()
+        self.assertEqual((HALTED, result.cycles, 92), (result.reason, result.instructions, result.pc))
+        self.assertTrue(self.interface.halted)
+        self.assertEqual(result.cycles, self.interface.cycles)
+        self.assertEqual((HALTED, 0, 0), self.interface.run()[:3])
+
+    def test_cycle_budget(self):
+        instructions, registers, memory = build_test_program()
+        total = PipelineInterface(instructions, 0, registers, memory, True).run().cycles
+        result = self.interface.run(max_cycles=10)
+        self.assertEqual((CYCLE_LIMIT, 10, 10), result[:3])
+        self.assertFalse(self.interface.halted)
+        self.assertEqual(total - 10, self.interface.run().cycles)
+        self.assertEqual(total, self.interface.cycles)
+
+    def test_instruction_budget(self):
+        self.assertEqual((INSTRUCTION_LIMIT, 5, 5, 20), self.interface.run(max_instructions=5))
+        self.assertEqual(CYCLE_LIMIT, self.interface.run(max_cycles=3, max_instructions=4).reason)
+
+    def test_until_pc(self):
+        self.assertEqual((REACHED_PC, 6, 6, 24), self.interface.run(until_pc=24))
+        visits = 1
+        while self.interface.run(until_pc=24).reason == REACHED_PC:
+            visits += 1
+        self.assertEqual(6, visits)  # $a1 starts at 5, and the loop test runs once more on the way out
+        self.assertTrue(self.interface.halted)
+
+    def test_faults_are_typed(self):
+        self.interface.run()
+        with self.assertRaises(InvalidInstructionAddress) as cm:
+            self.interface.trigger_clock_cycle()
+        self.assertIsInstance(cm.exception, SimulationFault)
+        self.assertIn("Invalid Instruction Address", str(cm.exception))
+
+        register_file = [0] * 32
+        register_file[decode_asm_register('a0')] = 2
+        interface = PipelineInterface([Instruction('lw', '$t0', '$a0', '0')], 0, register_file, {}, True)
+        with self.assertRaises(MemoryFault):
+            interface.run()
+        self.assertEqual(0, interface.cycles)
+
+        for integer_datapath in [True, False]:
+            registers = [0] * 32 if integer_datapath else [create_sized_binary_num(0, 32)] * 32
+            interface = PipelineInterface([Instruction('div', '$t0', '$t1', '$t2')], 0, registers, {}, integer_datapath)
+            with self.assertRaises(DivisionByZero):
+                interface.run()
+
+
+class LazySignalsTest(unittest.TestCase):
+    def run_program(self, integer_datapath, lazy_signals):
+        instructions, registers, memory = build_test_program()
+        interface = PipelineInterface(instructions, 0, registers, memory, integer_datapath, lazy_signals=lazy_signals)
+        result = interface.run()
+        return interface, result, list(interface.retrieve_register_list(as_binary=True)), \
+            dict(interface.retrieve_data_memory(as_binary=True))
+
+    def test_same_results(self):
+        for integer_datapath in [False, True]:
+            eager = self.run_program(integer_datapath, False)
+            lazy = self.run_program(integer_datapath, True)
+            self.assertEqual(eager[1:], lazy[1:])
+            self.assertEqual({'sign_extended_immediate': 0, 'jump_address': 0, 'branch_address': 0},
+                             eager[0].skipped_evaluations())
+
+    def test_skipped_evaluations(self):
+        instructions, registers, memory = build_test_program()
+        interface = PipelineInterface(instructions, 0, registers, memory, lazy_signals=True)
+        executed = {}
+        while not interface.halted:
+            name = instructions[interface.retrieve_current_pc_address() // 4].name
+            executed[name] = executed.get(name, 0) + 1
+            interface.trigger_clock_cycle()
+        total = sum(executed.values())
+        r_format = sum(executed.get(name, 0) for name in ['slt', 'sub', 'div', 'or', 'mult', 'xor'])
+        # only branches need their branch address, only jumps their jump address, and jumps and R-format
+        # instructions have no immediate to sign-extend
+        self.assertEqual({'sign_extended_immediate': r_format + executed['j'],
+                          'jump_address': total - executed['j'],
+                          'branch_address': total - executed['beq']}, interface.skipped_evaluations())
+
+    def test_signals_evaluated_on_demand(self):
+        decode = LazyDecode([create_sized_binary_num(0, 32)] * 32, None, False)
+        decode.receive_instruction(Instruction('j', '320'), 8)
+        self.assertEqual({'sign_extended_immediate': 1, 'jump_address': 1}, decode.skipped_evaluations())
+        self.assertEqual("00000000000000000000010100000000", decode.jump_address)
+        self.assertEqual({'sign_extended_immediate': 1, 'jump_address': 0}, decode.skipped_evaluations())
+        decode.receive_instruction(Instruction('addi', '$t8', '$zero', '-10'), 8)
+        self.assertEqual("11111111111111111111111111110110", decode.sign_extended_immediate)
+        self.assertEqual({'sign_extended_immediate': 1, 'jump_address': 1}, decode.skipped_evaluations())
+
+
+class SnapshotTest(unittest.TestCase):
+    def final_state(self, interface):
+        return (interface.cycles, interface.retrieve_current_pc_address(),
+                list(interface.retrieve_register_list(as_binary=True)),
+                dict(interface.retrieve_data_memory(as_binary=True)), interface.memory_cycles())
+
+    def test_restore_replays_the_same_run(self):
+        for integer_datapath in [False, True]:
+            instructions, registers, memory = build_test_program()
+            interface = PipelineInterface(instructions, 0, registers, memory, integer_datapath,
+                                          instruction_cache=Cache(256, 16), data_cache=Cache(256, 16))
+            interface.run(until_pc=36)
+            snapshot = interface.snapshot()
+            interface.run()
+            expected = self.final_state(interface)
+            for _ in range(3):
+                interface.restore(snapshot)
+                self.assertEqual(36, interface.retrieve_current_pc_address())
+                interface.run()
+                self.assertEqual(expected, self.final_state(interface))
+
+    def test_forked_continuations(self):
+        instructions, registers, memory = build_test_program()
+        interface = PipelineInterface(instructions, 0, registers, memory, True)
+        interface.run(until_pc=24)  # the loop test, with $a1 words left to process
+        snapshot = interface.snapshot()
+        stores = []
+        for words in range(1, 6):
+            interface.restore(snapshot)
+            interface.retrieve_register_list()[decode_asm_register('a1')] = words
+            interface.run()
+            stores.append(interface.retrieve_register_list()[decode_asm_register('a0')])
+        self.assertEqual([0x14, 0x18, 0x1C, 0x20, 0x24], stores)
+
+    def test_restore_into_another_machine(self):
+        instructions, registers, memory = build_test_program()
+        snapshot = PipelineInterface(instructions, 0, list(registers), dict(memory), True).snapshot()
+        with self.assertRaises(Exception):
+            PipelineInterface(instructions, 0, registers, memory, True).restore(snapshot)
+
+    def test_thousands_of_forks(self):
+        instructions = [Instruction('addi', '$t0', '$t0', '1'), Instruction('sw', '$t0', '$a0', '0'),
+                        Instruction('addi', '$a0', '$a0', '4')]
+        memory = PagedMemory()
+        for address in range(0, 4 << 20, PAGE_SIZE):  # 4 MiB of resident pages
+            memory.store_word(address, address)
+        register_file = [0] * 32
+        register_file[decode_asm_register('a0')] = 0x1000
+        interface = PipelineInterface(instructions, 0, register_file, memory, True)
+        interface.run(max_cycles=1)
+
+        resident = memory.page_numbers()
+        written = 0x1000 // PAGE_SIZE
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            snapshots = []
+            for fork in range(2000):
+                snapshots.append(interface.snapshot())
+                interface.run()
+                # only the page the fork stored to has been copied; every other page is still the snapshot's
+                self.assertFalse(snapshots[-1].memory[written] is memory._pages[written])
+                self.assertTrue(all(snapshots[-1].memory[page] is memory._pages[page]
+                                    for page in resident if page != written))
+                interface.restore(snapshots[-1])
+            after, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(0x1000, memory.load_word(0x1000))
+        self.assertEqual(1, interface.retrieve_current_pc_address() // 4)
+        # every snapshot shares the same 1024 resident pages instead of copying 4 MiB
+        self.assertTrue(all(snapshots[0].memory[page] is snapshots[-1].memory[page] is memory._pages[page]
+                            for page in resident))
+        self.assertLess((after - before) / len(snapshots), 100 * 1024)
+
+    def test_restore_removes_new_attributes(self):
+        instructions, registers, memory = build_test_program()
+        interface = PipelineInterface(instructions, 0, registers, memory, True)
+        register_file = interface.retrieve_register_list()
+        snapshot = interface.snapshot()
+        interface.fetch.scratch = []
+        interface.scratch = {}
+        interface.restore(snapshot)
+        self.assertFalse(hasattr(interface.fetch, 'scratch'))
+        self.assertFalse(hasattr(interface, 'scratch'))
+        self.assertIs(register_file, interface.retrieve_register_list())
+        interface.run()
+        self.assertTrue(interface.halted)
+
+
 if __name__ == '__main__':
     unittest.main()
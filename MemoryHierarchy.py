@@ -0,0 +1,164 @@
+"""
+MemoryHierarchy.py
+
+Multi-level memory hierarchy: split L1 instruction and data caches, an optional unified L2 (or last level) cache and
+a DRAM timing model with banks and row buffers. The whole hierarchy is described by a HierarchyConfig, and the L1
+caches it builds are passed to PipelineInterface/PipelinedInterface as their instruction_cache and data_cache, so the
+latency of every fetch, lw and sw reflects every level it reaches:
+
+    hierarchy = MemoryHierarchy(HierarchyConfig())
+    interface = PipelinedInterface(instructions, 0, registers, memory, instruction_cache=hierarchy.l1i,
+                                   data_cache=hierarchy.l1d)
+    interface.run()
+    print(hierarchy.report())
+
+DRAM timing is refresh-free, with an open page policy: an access to the row already open in its bank (a row buffer
+hit) costs the CAS latency, an access to an idle bank also pays RAS to CAS, and an access to a bank with another row
+open pays the precharge as well.
+"""
+from array import array
+from collections import namedtuple
+
+from Cache import Cache
+
+# Arguments for Cache (see Cache.__init__); the miss latency is only used by a cache with nothing behind it
+CacheConfig = namedtuple('CacheConfig', ['size', 'line_size', 'associativity', 'replacement', 'write_policy',
+                                         'write_allocate', 'hit_latency'])
+CacheConfig.__new__.__defaults__ = (16 * 1024, 32, 4, 'lru', 'write-back', True, 1)
+
+# Latencies are in processor cycles
+DRAMConfig = namedtuple('DRAMConfig', ['banks', 'row_size', 'cas_latency', 'ras_to_cas_latency',
+                                       'precharge_latency', 'controller_latency'])
+DRAMConfig.__new__.__defaults__ = (8, 2048, 30, 30, 30, 20)
+
+# l1i and l2 may be None to leave that level out
+HierarchyConfig = namedtuple('HierarchyConfig', ['l1i', 'l1d', 'l2', 'dram'])
+HierarchyConfig.__new__.__defaults__ = (CacheConfig(), CacheConfig(),
+                                        CacheConfig(256 * 1024, 64, 8, hit_latency=12), DRAMConfig())
+
+
+class DRAM(object):
+    def __init__(self, config=DRAMConfig()):
+        """
+        DRAM timing model. Consecutive rows are spread across the banks, and each bank keeps one row open.
+        :param config: DRAMConfig
+        """
+        if config.banks < 1 or config.row_size < 1:
+            raise Exception("(DRAM): Error! banks and row_size must be at least 1")
+        self.name = 'dram'
+        self.config = config
+        self.open_rows = array('q', [-1]) * config.banks  # -1 for an idle bank
+        self.row_hit_latency = config.controller_latency + config.cas_latency
+        self.row_empty_latency = self.row_hit_latency + config.ras_to_cas_latency
+        self.row_conflict_latency = self.row_empty_latency + config.precharge_latency
+        self.reset_statistics()
+
+    def reset_statistics(self):
+        self.reads = 0
+        self.writes = 0
+        self.row_hits = 0
+        self.row_empties = 0
+        self.row_conflicts = 0
+        self.cycles = 0
+
+    def access(self, address, write=False):
+        """
+        :param address: byte address
+        :param write: True for a write
+        :return: latency of the access in cycles
+        """
+        if write:
+            self.writes += 1
+        else:
+            self.reads += 1
+        row = address // self.config.row_size
+        bank = row % self.config.banks
+        open_row = self.open_rows[bank]
+        if open_row == row:
+            self.row_hits += 1
+            latency = self.row_hit_latency
+        elif open_row < 0:
+            self.row_empties += 1
+            latency = self.row_empty_latency
+        else:
+            self.row_conflicts += 1
+            latency = self.row_conflict_latency
+        self.open_rows[bank] = row
+        self.cycles += latency
+        return latency
+
+    def row_buffer_hit_rate(self):
+        """
+        :return: fraction of accesses that hit the open row (None before the first access)
+        """
+        accesses = self.reads + self.writes
+        if accesses == 0:
+            return None
+        return self.row_hits / accesses
+
+    def statistics(self):
+        """
+        :return: dictionary of the DRAM counters
+        """
+        return {'name': self.name, 'reads': self.reads, 'writes': self.writes, 'row_hits': self.row_hits,
+                'row_empties': self.row_empties, 'row_conflicts': self.row_conflicts,
+                'row_buffer_hit_rate': self.row_buffer_hit_rate(), 'cycles': self.cycles}
+
+
+def _build_cache(config, name, next_level):
+    return Cache(config.size, config.line_size, config.associativity, config.replacement, config.write_policy,
+                 config.write_allocate, config.hit_latency, name=name, next_level=next_level)
+
+
+class MemoryHierarchy(object):
+    def __init__(self, config=HierarchyConfig()):
+        """
+        Builds the caches and the DRAM described by config, each level connected to the one behind it
+        :param config: HierarchyConfig
+        """
+        if config.l1d is None or config.dram is None:
+            raise Exception("(MemoryHierarchy): Error! A hierarchy needs at least an L1 data cache and DRAM")
+        self.config = config
+        self.dram = DRAM(config.dram)
+        self.l2 = None
+        if config.l2 is not None:
+            self.l2 = _build_cache(config.l2, 'l2', self.dram)
+        behind_l1 = self.dram if self.l2 is None else self.l2
+        self.l1d = _build_cache(config.l1d, 'l1d', behind_l1)
+        self.l1i = None
+        if config.l1i is not None:
+            self.l1i = _build_cache(config.l1i, 'l1i', behind_l1)
+
+    def levels(self):
+        """
+        :return: list of every level, from the L1 caches out to DRAM
+        """
+        return [level for level in (self.l1i, self.l1d, self.l2, self.dram) if level is not None]
+
+    @staticmethod
+    def average_memory_access_time(l1):
+        """
+        Average latency of an access made to the given L1 cache, counting every level it reached
+        :return: AMAT in cycles (None before the first access)
+        """
+        if l1 is None or l1.reads + l1.writes == 0:
+            return None
+        return l1.cycles / (l1.reads + l1.writes)
+
+    def report(self):
+        """
+        :return: dictionary with the instruction and data AMAT and a per level breakdown. For the caches, the local
+        miss rate is misses over accesses to that level, and the global miss rate is misses over accesses to the L1
+        caches.
+        """
+        l1_accesses = sum(cache.reads + cache.writes for cache in (self.l1i, self.l1d) if cache is not None)
+        breakdown = []
+        for level in self.levels():
+            statistics = level.statistics()
+            if isinstance(level, Cache):
+                accesses = level.hits + level.misses
+                statistics['local_miss_rate'] = level.misses / accesses if accesses else None
+                statistics['global_miss_rate'] = level.misses / l1_accesses if l1_accesses else None
+            breakdown.append(statistics)
+        return {'instruction_amat': self.average_memory_access_time(self.l1i),
+                'data_amat': self.average_memory_access_time(self.l1d), 'levels': breakdown}
@@ -0,0 +1,100 @@
+import unittest
+
+from Cache import Cache
+from FunctionalSimulator import FunctionalSimulator
+from Interface_test import build_test_program
+from MemoryHierarchy import CacheConfig, DRAM, DRAMConfig, HierarchyConfig, MemoryHierarchy
+from PipelinedInterface import PipelinedInterface
+
+
+class DRAMTest(unittest.TestCase):
+    def test_row_buffer(self):
+        dram = DRAM(DRAMConfig(banks=2, row_size=1024, cas_latency=10, ras_to_cas_latency=20, precharge_latency=30,
+                               controller_latency=5))
+        self.assertEqual(35, dram.access(0))  # idle bank
+        self.assertEqual(15, dram.access(512))  # same row
+        self.assertEqual(35, dram.access(1024))  # the other bank
+        self.assertEqual(65, dram.access(2048, True))  # bank 0, another row
+        self.assertEqual((1, 2, 1), (dram.row_hits, dram.row_empties, dram.row_conflicts))
+        self.assertEqual(0.25, dram.row_buffer_hit_rate())
+        self.assertEqual(150, dram.statistics()['cycles'])
+
+    def test_bad_configuration(self):
+        self.assertRaises(Exception, DRAM, DRAMConfig(banks=0))
+
+
+class MemoryHierarchyTest(unittest.TestCase):
+    def setUp(self):
+        self.config = HierarchyConfig(CacheConfig(256, 16, 1), CacheConfig(256, 16, 1, hit_latency=2),
+                                      CacheConfig(1024, 32, 2, hit_latency=10), DRAMConfig())
+        self.hierarchy = MemoryHierarchy(self.config)
+
+    def test_levels_are_chained(self):
+        hierarchy = self.hierarchy
+        self.assertIs(hierarchy.l2, hierarchy.l1d.next_level)
+        self.assertIs(hierarchy.l2, hierarchy.l1i.next_level)
+        self.assertIs(hierarchy.dram, hierarchy.l2.next_level)
+        self.assertEqual(['l1i', 'l1d', 'l2', 'dram'], [level.name for level in hierarchy.levels()])
+
+    def test_latency_reflects_every_level(self):
+        hierarchy = self.hierarchy
+        dram_latency = hierarchy.dram.row_empty_latency
+        self.assertEqual(2 + 10 + dram_latency, hierarchy.l1d.access(0))
+        self.assertEqual(2, hierarchy.l1d.access(4))
+        self.assertEqual(2 + 10, hierarchy.l1d.access(16))  # second half of the 32 byte L2 line
+        self.assertEqual(1 + 10, hierarchy.l1i.access(0))  # unified L2 already holds the line
+
+        report = hierarchy.report()
+        self.assertEqual((2 + 10 + dram_latency + 2 + 12) / 3, report['data_amat'])
+        self.assertEqual(11, report['instruction_amat'])
+        levels = {level['name']: level for level in report['levels']}
+        self.assertEqual(2, levels['l1d']['misses'])
+        self.assertEqual(1, levels['l2']['misses'])
+        self.assertEqual(1 / 3, levels['l2']['local_miss_rate'])
+        self.assertEqual(1 / 4, levels['l2']['global_miss_rate'])
+        self.assertEqual(1, levels['dram']['reads'])
+
+    def test_dirty_lines_are_written_back(self):
+        hierarchy = self.hierarchy
+        hierarchy.l1d.access(0, True)
+        hierarchy.l1d.access(256)  # same L1 set, evicts the dirty line into the L2
+        self.assertEqual(1, hierarchy.l1d.writebacks)
+        self.assertEqual(1, hierarchy.l2.writes)
+
+    def test_without_l2(self):
+        hierarchy = MemoryHierarchy(HierarchyConfig(None, CacheConfig(256, 16, 1), None, DRAMConfig()))
+        self.assertIs(hierarchy.dram, hierarchy.l1d.next_level)
+        self.assertIsNone(hierarchy.report()['instruction_amat'])
+        self.assertRaises(Exception, MemoryHierarchy, HierarchyConfig(None, None, None, DRAMConfig()))
+
+    def test_pipeline_latency(self):
+        instructions, registers, memory = build_test_program()
+        functional = FunctionalSimulator(instructions, 0, list(registers), dict(memory))
+        functional.run()
+
+        hierarchy = self.hierarchy
+        pipelined = PipelinedInterface(instructions, 0, list(registers), dict(memory),
+                                       instruction_cache=hierarchy.l1i, data_cache=hierarchy.l1d)
+        pipelined.run()
+        self.assertEqual(list(functional.retrieve_register_list()), list(pipelined.retrieve_register_list()))
+        self.assertTrue(pipelined.memory_stall_cycles > 0)
+        report = hierarchy.report()
+        self.assertTrue(report['data_amat'] > self.config.l1d.hit_latency)
+        self.assertTrue(hierarchy.dram.reads > 0)
+
+        # a bigger L1 never costs more cycles
+        bigger = MemoryHierarchy(HierarchyConfig(CacheConfig(4096, 16, 4), CacheConfig(4096, 16, 4, hit_latency=2),
+                                                 self.config.l2, self.config.dram))
+        faster = PipelinedInterface(instructions, 0, list(registers), dict(memory), instruction_cache=bigger.l1i,
+                                    data_cache=bigger.l1d)
+        faster.run()
+        self.assertTrue(faster.cycles <= pipelined.cycles)
+
+    def test_default_configuration(self):
+        hierarchy = MemoryHierarchy()
+        self.assertIsInstance(hierarchy.l2, Cache)
+        self.assertEqual(256 * 1024, hierarchy.l2.size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,26 +7,82 @@ Creates a datapath from the pipeline components and interfaces with it.
 Very much not working currently.
 """
 
-from Stages import Fetch, Decode, Execute, Memory, WriteBack
+from collections import namedtuple
+
+from Checkpoint import restore_snapshot, take_snapshot, timing_components
+from Stages import Fetch, Decode, Execute, LazyDecode, LazyExecute, Memory, WriteBack
+from Decoder import to_instruction
+from DataMemory import DataMemory
+
+# Reasons run() stopped
+HALTED = 'halted'  # the program counter left instruction memory: the program is finished
+CYCLE_LIMIT = 'cycle_limit'  # max_cycles were executed
+INSTRUCTION_LIMIT = 'instruction_limit'  # max_instructions were executed
+REACHED_PC = 'reached_pc'  # the program counter reached until_pc
+
+# reason: one of the constants above; cycles and instructions: executed by that call to run(); pc: program counter
+# when it stopped (the address of the next instruction to run)
+RunResult = namedtuple('RunResult', ['reason', 'cycles', 'instructions', 'pc'])
 
 
 class PipelineInterface(object):
-    def __init__(self, instruction_list, starting_pc_address, register_memory, data_mem):
+    def __init__(self, instruction_list, starting_pc_address, register_memory, data_mem, integer_datapath=False,
+                 instruction_cache=None, data_cache=None, data_prefetcher=None, lazy_signals=False):
         """
         Creates the interface to the pipeline.
-        :param instruction_list: list of Instruction objects in the order they should appear in instruction memory
+        :param instruction_list: list of Instruction objects in the order they should appear in instruction memory,
+        or the program's machine words (see Decoder.py)
         :param starting_pc_address: integer starting address for the program counter. This will also be the base
         address of instruction memory
         :param register_memory: list representing register memory, since the registers are just reg0,reg1, etc
-        :param data_mem: dictionary representing data memory
+        (or a RegisterFile when using the integer datapath)
+        :param data_mem: dictionary representing data memory (or a memory model such as DataMemory, PagedMemory or
+        MappedMemory when using the integer datapath)
+        :param integer_datapath: if True, every value moving through the pipeline is kept as a masked 32-bit int.
+        Binary strings in register_memory and data_mem are converted once, up front.
+        :param instruction_cache: Cache in front of instruction memory (None for no cache)
+        :param data_cache: Cache in front of data memory (None for no cache)
+        :param data_prefetcher: Prefetcher for the data cache (None for no prefetching). Given without data_cache, its
+        own cache is used as the data cache.
+        :param lazy_signals: if True, derived signals (the sign-extended immediate, jump address and branch address)
+        are only worked out for the instructions that use them. See skipped_evaluations().
         """
-        self.fetch = Fetch(instruction_list, starting_pc_address)
+        self.integer_datapath = integer_datapath
+        if integer_datapath and isinstance(data_mem, dict):
+            data_mem = DataMemory.from_dict(data_mem)
+
+        self.fetch = Fetch(instruction_list, starting_pc_address, integer_datapath)
 
         self.write_back = WriteBack(fetch_stage=self.fetch)
-        self.memory = Memory(data_mem, self.write_back)
-        self.execute = Execute(self.memory)
-        self.decode = Decode(register_memory, self.execute)
+        self.memory = Memory(data_mem, self.write_back, integer_datapath)
+        self.execute = (LazyExecute if lazy_signals else Execute)(self.memory, integer_datapath)
+        self.decode = (LazyDecode if lazy_signals else Decode)(register_memory, self.execute, integer_datapath)
         self.write_back.decode_stage = self.decode
+        self.fetch.cache = instruction_cache
+        self.memory.attach_cache(data_cache, data_prefetcher)
+        self.cycles = 0
+
+    @property
+    def halted(self):
+        """
+        True once the program counter has left instruction memory
+        """
+        return not self.fetch.has_instruction()
+
+    def memory_cycles(self):
+        """
+        :return: cycles charged by the instruction and data caches so far
+        """
+        return self.fetch.cache_cycles + self.memory.cache_cycles
+
+    def skipped_evaluations(self):
+        """
+        :return: dictionary of signal name -> number of instructions the signal was never evaluated for (always 0
+        without lazy_signals)
+        """
+        skipped = self.decode.skipped_evaluations()
+        skipped.update(self.execute.skipped_evaluations())
+        return skipped
 
     def trigger_clock_cycle(self):
         """
@@ -41,21 +97,83 @@ class PipelineInterface(object):
         self.execute.on_rising_clock()
         self.memory.on_rising_clock()
         self.write_back.on_rising_clock()
+        self.cycles += 1
+
+    def run(self, max_cycles=None, until_pc=None, max_instructions=None):
+        """
+        Clocks the pipeline until the program halts or one of the limits is reached. The end of the program is found
+        by checking the program counter before every cycle, so nothing is raised for it; exceptions (see Faults.py)
+        only come from real faults, such as a misaligned load.
+        :param max_cycles: cycle budget for this call (None for no limit)
+        :param until_pc: stop when the program counter reaches this address. The instruction the program counter is
+        at when run() is called always executes, so run(until_pc=...) can be called again to run to the next visit.
+        :param max_instructions: instruction budget for this call (None for no limit). The single-cycle datapath
+        runs one instruction per cycle.
+        :return: RunResult
+        """
+        budget = max_cycles
+        if max_instructions is not None and (budget is None or max_instructions < budget):
+            budget = max_instructions
+        fetch = self.fetch
+        count = 0
+        while True:
+            if not fetch.has_instruction():
+                reason = HALTED
+                break
+            if budget is not None and count >= budget:
+                reason = CYCLE_LIMIT if budget == max_cycles else INSTRUCTION_LIMIT
+                break
+            if count and fetch.program_counter == until_pc:
+                reason = REACHED_PC
+                break
+            self.trigger_clock_cycle()
+            count += 1
+        return RunResult(reason, count, count, fetch.program_counter)
+
+    def _stages(self):
+        return self.fetch, self.decode, self.execute, self.memory, self.write_back
+
+    def snapshot(self):
+        """
+        Saves the whole state of the machine: program counter, registers, data memory, every stage, the caches and
+        the cycle count. Only a PagedMemory is saved copy-on-write; any other data memory (including the default
+        DataMemory and the dictionary of binary strings) is copied in full, so pass a PagedMemory as data_mem when
+        taking many snapshots of a large memory.
+        :return: Snapshot, for restore()
+        """
+        return take_snapshot(self, self._stages(), self.decode.register_file, self.memory.memory,
+                             timing_components(self.fetch.cache, self.memory.cache, self.memory.prefetcher))
+
+    def restore(self, snapshot):
+        """
+        Puts the machine back in the state saved by snapshot(). A snapshot can be restored any number of times, to
+        run different continuations from the same point.
+        :param snapshot: Snapshot taken from this interface
+        :return: None
+        """
+        restore_snapshot(self, snapshot, self._stages(), self.decode.register_file, self.memory.memory)
 
-    def retrieve_register_list(self):
+    def retrieve_register_list(self, as_binary=False):
         """
         Helper method to return the current register file for comparing that the instruction was written back
         successfully
-        :return: list representing register file
+        :param as_binary: return a list of 32-bit binary strings even when using the integer datapath
+        :return: list representing register file (a RegisterFile when using the integer datapath)
         """
+        if as_binary and self.integer_datapath:
+            return self.decode.register_file.binary_list()
         return self.decode.register_file
 
-    def retrieve_data_memory(self):
+    def retrieve_data_memory(self, as_binary=False):
         """
         Helper method to return the current data memory dictionary to help ensure that the data was written to the
         correct place
-        :return: memory dictionary
+        :param as_binary: return a dictionary keyed (and filled) with 32-bit binary strings even when using the
+        integer datapath
+        :return: memory dictionary (the memory model when using the integer datapath)
         """
+        if as_binary and self.integer_datapath:
+            return self.memory.memory.binary_dict()
         return self.memory.memory
 
     def retrieve_current_pc_address(self):
@@ -66,4 +184,6 @@ class PipelineInterface(object):
         return self.fetch.program_counter
 
     def retrive_instruction_name(self):
+        if self.decode.instruction is None:  # integer datapath running machine code
+            return to_instruction(self.decode.predecoded).asm_version()
         return self.decode.instruction.asm_version()
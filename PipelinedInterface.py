@@ -0,0 +1,402 @@
+"""
+PipelinedInterface.py
+
+A real five-stage pipelined mode. The stage objects from Stages.py are used as the combinational logic of each stage,
+and the IF/ID, ID/EX, EX/MEM and MEM/WB pipeline registers (latches) between them are written on the rising edge,
+so up to five instructions are in flight at once and the cycle count reflects a pipelined core.
+
+Timing follows the datapath: jump addresses are known in decode, so a jump squashes the instruction fetched behind
+it, and branches are resolved in the memory stage, so a mispredicted branch squashes the three instructions behind
+it. Without a branch predictor every branch is predicted not taken. With one (see BranchPredictor.py), a branch
+predicted taken is redirected in fetch if the branch target buffer knows its target, or in decode otherwise.
+
+The register file is written in the first half of the cycle and read in the second. The forwarding unit feeds the
+ALU from the EX/MEM and MEM/WB pipeline registers, and the hazard detection unit stalls decode on anything
+forwarding can't cover (a load followed by a use, or any hazard once a forwarding path is turned off). Every stall
+and flush is counted against the pc of the instruction that caused it.
+
+Each pipeline register is a pair of preallocated __slots__ latches (see Stages.py): the stages read the current one
+and overwrite the next one in place, and the pair is swapped on the clock edge, so once the program is running a
+cycle allocates no new objects.
+"""
+from Checkpoint import restore_snapshot, take_snapshot, timing_components
+from DataMemory import DataMemory
+from Instruction import to_signed_word
+from Stages import Fetch, Decode, Execute, Memory, ForwardingUnit, HazardDetectionUnit, IFIDLatch, IDEXLatch, \
+    EXMEMLatch, MEMWBLatch
+
+MISPREDICT_PENALTY = 3  # cycles lost when a branch resolved in MEM went the other way
+DECODE_REDIRECT_PENALTY = 1  # cycles lost when the target of a branch predicted taken is only known in decode
+
+STALL = object()  # returned by _decode when the instruction in decode has to wait
+
+LATCHES = ('if_id', 'id_ex', 'ex_mem', 'mem_wb')
+_ALL_LATCHES = LATCHES + ('_next_if_id', '_next_id_ex', '_next_ex_mem', '_next_mem_wb')
+
+
+def reads_rt(predecoded):
+    """
+    :return: True if the instruction reads its rt register (R-format, branches and sw); for addi, andi and lw, rt
+    is the destination instead
+    """
+    control = predecoded.control
+    return (not control.ALUSrc and not control.jump) or control.MemWrite
+
+
+def reads_rs(predecoded):
+    """
+    :return: True if the instruction reads its rs register (everything but jumps)
+    """
+    return not predecoded.control.jump
+
+
+class PipelinedInterface(object):
+    def __init__(self, instruction_list, starting_pc_address, register_memory, data_mem, ex_mem_forwarding=True,
+                 mem_wb_forwarding=True, hazard_detection=True, branch_predictor=None, branch_target_buffer=None,
+                 instruction_cache=None, data_cache=None, data_prefetcher=None):
+        """
+        Creates the pipelined processor. Takes the same arguments as PipelineInterface, and always uses the integer
+        datapath.
+        :param instruction_list: list of Instruction objects in the order they should appear in instruction memory,
+        or the program's machine words (see Decoder.py)
+        :param starting_pc_address: integer starting address for the program counter, and base address of
+        instruction memory
+        :param register_memory: RegisterFile, or list of register values (binary strings or ints)
+        :param data_mem: memory model (DataMemory, PagedMemory, ...) or dictionary representing data memory
+        :param ex_mem_forwarding: enable the EX/MEM -> EX forwarding path
+        :param mem_wb_forwarding: enable the MEM/WB -> EX forwarding path
+        :param hazard_detection: enable the hazard detection unit. Without it nothing stalls and the instructions
+        behind a taken branch or jump are not squashed, so results may differ from the single-cycle model.
+        :param branch_predictor: BranchPredictor consulted in fetch (None to predict every branch not taken)
+        :param branch_target_buffer: BranchTargetBuffer consulted in fetch for the targets of branches predicted
+        taken (None to find them in decode instead)
+        :param instruction_cache: Cache in front of instruction memory (None for no cache)
+        :param data_cache: Cache in front of data memory (None for no cache)
+        :param data_prefetcher: Prefetcher for the data cache (None for no prefetching). Given without data_cache, its
+        own cache is used as the data cache.
+        """
+        if (branch_predictor is not None or branch_target_buffer is not None) and not hazard_detection:
+            raise Exception("(PipelinedInterface): Error! Branch prediction needs the hazard detection unit")
+        if isinstance(data_mem, dict):
+            data_mem = DataMemory.from_dict(data_mem)
+
+        self.fetch = Fetch(instruction_list, starting_pc_address, True)
+        self.decode = Decode(register_memory, None, True)
+        self.execute = Execute(None, True)
+        self.memory = Memory(data_mem, None, True)
+        self.register_file = self.decode.register_file
+        self.fetch.cache = instruction_cache
+        self.memory.attach_cache(data_cache, data_prefetcher)
+        self.forwarding_unit = ForwardingUnit(ex_mem_forwarding, mem_wb_forwarding)
+        self.hazard_unit = HazardDetectionUnit(hazard_detection)
+        self.branch_predictor = branch_predictor
+        self.branch_target_buffer = branch_target_buffer
+
+        self.if_id, self._next_if_id = IFIDLatch(), IFIDLatch()
+        self.id_ex, self._next_id_ex = IDEXLatch(), IDEXLatch()
+        self.ex_mem, self._next_ex_mem = EXMEMLatch(), EXMEMLatch()
+        self.mem_wb, self._next_mem_wb = MEMWBLatch(), MEMWBLatch()
+
+        self.cycles = 0
+        self.instructions_retired = 0
+        self.stall_cycles = 0
+        self.flushed_instructions = 0
+        self.memory_stall_cycles = 0  # cycles the whole pipeline was frozen waiting on a cache
+        self.stall_cycles_by_pc = {}  # pc of the instruction being waited on -> stall cycles
+        self.flushes_by_pc = {}  # pc of the taken branch or jump -> instructions squashed
+
+    @property
+    def halted(self):
+        """
+        True once the program counter has left instruction memory and every instruction in flight has retired
+        """
+        return not (self.fetch.has_instruction() or self.if_id.valid or self.id_ex.valid or self.ex_mem.valid or
+                    self.mem_wb.valid)
+
+    def cpi(self):
+        """
+        :return: cycles per retired instruction (None before anything has retired)
+        """
+        if self.instructions_retired == 0:
+            return None
+        return self.cycles / self.instructions_retired
+
+    def _count_flushes(self, pc, count):
+        if count:
+            self.flushed_instructions += count
+            self.flushes_by_pc[pc] = self.flushes_by_pc.get(pc, 0) + count
+
+    def _write_back(self):
+        """
+        WB: write the MEM/WB result to the register file (first half of the cycle)
+        """
+        latch = self.mem_wb
+        if not latch.valid:
+            return
+        control = latch.predecoded.control
+        if control.RegWrite:
+            self.register_file.write(latch.write_register, latch.read_data if control.MemtoReg else latch.alu_output)
+        self.instructions_retired += 1
+
+    def _memory_access(self, out):
+        """
+        MEM: access data memory and resolve branches
+        :param out: MEM/WB latch to overwrite
+        :return: address to redirect the program counter to if the branch was mispredicted, or None
+        """
+        latch = self.ex_mem
+        if not latch.valid:
+            out.clear()
+            return None
+        taken = self.memory.access_into(latch, out)
+        if not latch.predecoded.control.Branch:
+            return None
+        redirect = None
+        if taken != latch.predicted_taken:
+            redirect = latch.branch_address if taken else (latch.pc + 4) & 0xFFFFFFFF
+        self._train_predictor(latch.pc, latch.branch_address, taken, redirect is not None, latch.prediction_history)
+        return redirect
+
+    def _train_predictor(self, pc, target, taken, mispredicted, history):
+        """
+        Updates the branch predictor and target buffer with a resolved branch, and records it in the statistics
+        (the penalty of a misprediction is charged once the squashed instructions are known)
+        :param history: branch history the branch was predicted with, carried down the pipeline from fetch
+        """
+        if self.branch_predictor is not None:
+            self.branch_predictor.update(pc, target, taken, history)
+            self.branch_predictor.record(pc, mispredicted)
+        if taken and self.branch_target_buffer is not None:
+            self.branch_target_buffer.update(pc, target)
+
+    def _execute(self, out):
+        """
+        EX: run the ALU and work out the branch target
+        :param out: EX/MEM latch to overwrite
+        :return: None
+        """
+        latch = self.id_ex
+        if not latch.valid:
+            out.clear()
+            return
+        predecoded = latch.predecoded
+
+        ex_mem_write = None
+        if self.ex_mem.valid and self.ex_mem.predecoded.control.RegWrite and \
+                not self.ex_mem.predecoded.control.MemRead:
+            ex_mem_write = (self.ex_mem.write_register, self.ex_mem.alu_output)
+        mem_wb_write = None
+        if self.mem_wb.valid and self.mem_wb.predecoded.control.RegWrite:
+            mem_wb_control = self.mem_wb.predecoded.control
+            mem_wb_write = (self.mem_wb.write_register,
+                            self.mem_wb.read_data if mem_wb_control.MemtoReg else self.mem_wb.alu_output)
+        forwarding_unit = self.forwarding_unit
+        read_data1 = forwarding_unit.select(predecoded.rs, latch.read_data1, ex_mem_write, mem_wb_write)
+        read_data2 = forwarding_unit.select(predecoded.rt, latch.read_data2, ex_mem_write, mem_wb_write)
+        self.execute.execute_into(latch, read_data1, read_data2, out)
+
+    @staticmethod
+    def _pending_write(latch):
+        """
+        :return: (write_register, is_load, pc) for the hazard detection unit, or None if the latch writes nothing
+        """
+        if not latch.valid or not latch.predecoded.control.RegWrite:
+            return None
+        return latch.write_register, latch.predecoded.control.MemRead, latch.pc
+
+    def _stall_cause(self, predecoded):
+        """
+        Asks the hazard detection unit whether the instruction in decode has to wait on one in EX or MEM
+        :return: pc of the instruction being waited on, or None
+        """
+        sources = []
+        if reads_rs(predecoded):
+            sources.append(predecoded.rs)
+        if reads_rt(predecoded):
+            sources.append(predecoded.rt)
+        return self.hazard_unit.stall_cause(sources, self._pending_write(self.id_ex), self._pending_write(self.ex_mem),
+                                            self.forwarding_unit)
+
+    def _decode(self, out):
+        """
+        ID: read the register file, resolve jumps and find the targets of branches predicted taken
+        :param out: ID/EX latch to overwrite
+        :return: address to redirect to, None, or STALL if decode has to stall (out is left alone)
+        """
+        latch = self.if_id
+        if not latch.valid:
+            out.clear()
+            return None
+        predecoded = latch.predecoded
+        cause = self._stall_cause(predecoded)
+        if cause is not None:
+            self.stall_cycles_by_pc[cause] = self.stall_cycles_by_pc.get(cause, 0) + 1
+            return STALL
+        self.decode.decode_into(predecoded, latch.pc, out)
+        out.predicted_taken = latch.predicted_taken
+        out.prediction_history = latch.prediction_history
+        if predecoded.control.jump:
+            return out.jump_address
+        if latch.predicted_taken and not latch.redirected:
+            return (latch.pc + 4 + (to_signed_word(predecoded.immediate) << 2)) & 0xFFFFFFFF
+        return None
+
+    def _instruction_fetch(self, out):
+        """
+        IF: fetch the instruction at the program counter (a bubble once it has left instruction memory), and predict
+        branches
+        :param out: IF/ID latch to overwrite
+        :return: None
+        """
+        fetch = self.fetch
+        if not fetch.has_instruction():
+            out.clear()
+            return
+        pc = fetch.program_counter
+        predecoded = fetch.fetch_predecoded_instruction()
+        fetch.increment_program_counter()
+        if self.branch_predictor is None or not predecoded.control.Branch:
+            out.load(pc, predecoded)
+            return
+
+        target = (pc + 4 + (to_signed_word(predecoded.immediate) << 2)) & 0xFFFFFFFF
+        history = self.branch_predictor.prediction_history()
+        if not self.branch_predictor.predict(pc, target):
+            out.load(pc, predecoded, False, False, history)
+            return
+        predicted_target = None
+        if self.branch_target_buffer is not None:
+            predicted_target = self.branch_target_buffer.lookup(pc)
+        if predicted_target is None:
+            out.load(pc, predecoded, True, False, history)
+            return
+        fetch.update_program_counter(predicted_target)
+        out.load(pc, predecoded, True, True, history)
+
+    def trigger_clock_cycle(self):
+        """
+        Rising clock edge. Every stage reads its input latch from the last cycle and produces its output latch; the
+        stages are evaluated from WB back to IF so that each one still sees last cycle's values.
+        :return: None
+        """
+        fetch, memory = self.fetch, self.memory
+        if memory.prefetcher is not None:
+            memory.prefetcher.clock = self.cycles
+        fetch_before = fetch.cache_cycles - fetch.cache_accesses
+        memory_before = memory.cache_cycles - memory.cache_accesses
+
+        self._write_back()
+        new_mem_wb, new_ex_mem, new_id_ex, new_if_id = (self._next_mem_wb, self._next_ex_mem, self._next_id_ex,
+                                                        self._next_if_id)
+        branch_redirect = self._memory_access(new_mem_wb)
+
+        if branch_redirect is not None and self.hazard_unit.squashes():  # mispredicted: squash everything behind it
+            squashed = self.id_ex.valid + self.if_id.valid + self.fetch.has_instruction()
+            self._count_flushes(self.ex_mem.pc, squashed)
+            if self.branch_predictor is not None:
+                self.branch_predictor.add_penalty(self.ex_mem.pc, MISPREDICT_PENALTY)
+            new_ex_mem.clear()
+            new_id_ex.clear()
+            new_if_id.clear()
+            self.fetch.update_program_counter(branch_redirect)
+        else:
+            self._execute(new_ex_mem)
+            jump_redirect = self._decode(new_id_ex)
+            if jump_redirect is STALL:  # stall: hold IF/ID and the program counter, send a bubble down
+                new_id_ex.clear()
+                new_if_id.copy_from(self.if_id)
+                self.stall_cycles += 1
+            elif jump_redirect is not None and self.hazard_unit.squashes():  # jump: squash the fetch behind it
+                squashed = self.fetch.has_instruction()
+                self._count_flushes(self.if_id.pc, squashed)
+                if self.branch_predictor is not None and self.if_id.predecoded.control.Branch:
+                    self.branch_predictor.add_penalty(self.if_id.pc, DECODE_REDIRECT_PENALTY)
+                new_if_id.clear()
+                self.fetch.update_program_counter(jump_redirect)
+            else:
+                self._instruction_fetch(new_if_id)
+                if jump_redirect is not None:  # no squashing: the instruction behind the jump is a delay slot
+                    self.fetch.update_program_counter(jump_redirect)
+            if branch_redirect is not None:  # no squashing: the three instructions behind the branch are delay slots
+                self.fetch.update_program_counter(branch_redirect)
+
+        # clock edge: the latches just written become current, and last cycle's are overwritten next cycle
+        self._next_mem_wb, self._next_ex_mem, self._next_id_ex, self._next_if_id = (self.mem_wb, self.ex_mem,
+                                                                                    self.id_ex, self.if_id)
+        self.mem_wb, self.ex_mem, self.id_ex, self.if_id = new_mem_wb, new_ex_mem, new_id_ex, new_if_id
+        self.cycles += 1
+
+        # the caches are blocking: every cycle of latency past the first freezes the whole pipeline (an instruction
+        # and a data miss in the same cycle overlap)
+        stall = max(fetch.cache_cycles - fetch.cache_accesses - fetch_before,
+                    memory.cache_cycles - memory.cache_accesses - memory_before)
+        if stall > 0:
+            self.memory_stall_cycles += stall
+            self.cycles += stall
+
+    def run(self, max_cycles=None):
+        """
+        Clocks the pipeline until it has drained after the program counter leaves instruction memory
+        :param max_cycles: cycle budget for this call (None for no limit)
+        :return: number of cycles executed by this call
+        """
+        count = 0
+        while not self.halted and (max_cycles is None or count < max_cycles):
+            self.trigger_clock_cycle()
+            count += 1
+        return count
+
+    def _stages(self):
+        return self.fetch, self.decode, self.execute, self.memory
+
+    def snapshot(self):
+        """
+        Saves the whole state of the machine: program counter, registers, data memory, every stage and pipeline
+        register, the caches, branch predictor and forwarding unit, and every counter. Only a PagedMemory is saved
+        copy-on-write; any other data memory (including the default DataMemory) is copied in full, so pass a
+        PagedMemory as data_mem when taking many snapshots of a large memory.
+        :return: Snapshot, for restore()
+        """
+        latches = []
+        for name in LATCHES:
+            latch = getattr(self, name)
+            saved = type(latch)()
+            saved.copy_from(latch)
+            latches.append(saved)
+        components = timing_components(self.fetch.cache, self.memory.cache, self.memory.prefetcher,
+                                       self.branch_predictor, self.branch_target_buffer, self.forwarding_unit,
+                                       self.hazard_unit)
+        return take_snapshot(self, self._stages(), self.register_file, self.memory.memory, components, _ALL_LATCHES,
+                             tuple(latches))
+
+    def restore(self, snapshot):
+        """
+        Puts the machine back in the state saved by snapshot(). A snapshot can be restored any number of times, to
+        run different continuations from the same point.
+        :param snapshot: Snapshot taken from this interface
+        :return: None
+        """
+        restore_snapshot(self, snapshot, self._stages(), self.register_file, self.memory.memory, _ALL_LATCHES)
+        for name, saved in zip(LATCHES, snapshot.latches):
+            getattr(self, name).copy_from(saved)
+
+    def retrieve_register_list(self, as_binary=False):
+        """
+        :param as_binary: return a list of 32-bit binary strings instead of the RegisterFile
+        :return: RegisterFile (or list of binary strings)
+        """
+        if as_binary:
+            return self.register_file.binary_list()
+        return self.register_file
+
+    def retrieve_data_memory(self, as_binary=False):
+        """
+        :param as_binary: return the memory as a dictionary of 32-bit binary strings
+        :return: memory model (or dictionary)
+        """
+        if as_binary:
+            return self.memory.memory.binary_dict()
+        return self.memory.memory
+
+    def retrieve_current_pc_address(self):
+        return self.fetch.program_counter
@@ -0,0 +1,245 @@
+import tracemalloc
+import unittest
+
+from BranchPredictor import BranchTargetBuffer, TournamentPredictor
+from Cache import Cache
+from PipelinedInterface import PipelinedInterface
+from FunctionalSimulator import FunctionalSimulator
+from Instruction import Instruction, decode_asm_register
+from Interface_test import build_test_program
+from Stages import IFIDLatch, IDEXLatch, EXMEMLatch, MEMWBLatch
+
+
+class PipelinedInterfaceTest(unittest.TestCase):
+    def assert_same_state(self, instructions, registers, memory, **options):
+        functional = FunctionalSimulator(instructions, 0, list(registers), dict(memory))
+        pipelined = PipelinedInterface(instructions, 0, list(registers), dict(memory), **options)
+
+        functional.run()
+        pipelined.run()
+        self.assertTrue(pipelined.halted)
+        self.assertEqual(functional.instructions_executed, pipelined.instructions_retired)
+        self.assertEqual(functional.retrieve_current_pc_address(), pipelined.retrieve_current_pc_address())
+        self.assertEqual(list(functional.retrieve_register_list()), list(pipelined.retrieve_register_list()))
+        self.assertEqual(bytes(functional.retrieve_data_memory().view()),
+                         bytes(pipelined.retrieve_data_memory().view()))
+        return pipelined
+
+    def test_test_program_matches_functional_simulator(self):
+        pipelined = self.assert_same_state(*build_test_program())
+        self.assertTrue(pipelined.cpi() > 1)
+        self.assertTrue(pipelined.stall_cycles > 0)
+        self.assertTrue(pipelined.flushed_instructions > 0)
+
+    def test_independent_instructions_fill_the_pipeline(self):
+        instructions = [Instruction('addi', '$t%d' % register, '$zero', str(register)) for register in range(8)]
+        pipelined = self.assert_same_state(instructions, [0] * 32, {})
+        self.assertEqual(8 + 4, pipelined.cycles)  # four cycles to fill the pipeline, then one instruction a cycle
+        self.assertEqual(0, pipelined.stall_cycles)
+
+    def test_five_instructions_in_flight(self):
+        instructions = [Instruction('addi', '$t%d' % register, '$zero', str(register)) for register in range(8)]
+        pipelined = PipelinedInterface(instructions, 0, [0] * 32, {})
+        pipelined.run(4)
+        self.assertEqual(0, pipelined.instructions_retired)
+        self.assertEqual([0, 4, 8, 12], [pipelined.mem_wb.pc, pipelined.ex_mem.pc, pipelined.id_ex.pc,
+                                         pipelined.if_id.pc])
+        pipelined.trigger_clock_cycle()
+        self.assertEqual(1, pipelined.instructions_retired)
+
+    def test_dependent_instruction_stalls(self):
+        instructions = [Instruction('addi', '$t0', '$zero', '5'), Instruction('add', '$t1', '$t0', '$t0')]
+        pipelined = self.assert_same_state(instructions, [0] * 32, {}, ex_mem_forwarding=False,
+                                           mem_wb_forwarding=False)
+        self.assertEqual(2, pipelined.stall_cycles)
+        self.assertEqual({0: 2}, pipelined.stall_cycles_by_pc)
+        self.assertEqual(10, pipelined.retrieve_register_list()[decode_asm_register('t1')])
+
+    def test_taken_branch_flushes(self):
+        instructions = [Instruction('beq', '$zero', '$zero', '3'), Instruction('addi', '$t0', '$zero', '1'),
+                        Instruction('addi', '$t1', '$zero', '1'), Instruction('addi', '$t2', '$zero', '1'),
+                        Instruction('addi', '$t3', '$zero', '1')]
+        pipelined = self.assert_same_state(instructions, [0] * 32, {})
+        self.assertEqual(3, pipelined.flushed_instructions)
+        self.assertEqual({0: 3}, pipelined.flushes_by_pc)
+        self.assertEqual(0, pipelined.retrieve_register_list()[decode_asm_register('t0')])
+        self.assertEqual(1, pipelined.retrieve_register_list()[decode_asm_register('t3')])
+
+    def test_jump_flushes_one_instruction(self):
+        instructions = [Instruction('j', '2'), Instruction('addi', '$t0', '$zero', '1'),
+                        Instruction('addi', '$t1', '$zero', '1')]
+        pipelined = self.assert_same_state(instructions, [0] * 32, {})
+        self.assertEqual(1, pipelined.flushed_instructions)
+        self.assertEqual(0, pipelined.retrieve_register_list()[decode_asm_register('t0')])
+
+    def test_lw_then_use(self):
+        instructions = [Instruction('sw', '$t6', '$a0', '0'), Instruction('lw', '$t0', '$a0', '0'),
+                        Instruction('add', '$t1', '$t0', '$t0')]
+        registers = [0] * 32
+        registers[decode_asm_register('a0')] = 8
+        registers[decode_asm_register('t6')] = 21
+        pipelined = self.assert_same_state(instructions, registers, {})
+        self.assertEqual(42, pipelined.retrieve_register_list()[decode_asm_register('t1')])
+
+
+class HazardAndForwardingTest(unittest.TestCase):
+    def setUp(self):
+        self.registers = [0] * 32
+        self.registers[decode_asm_register('a0')] = 8
+        self.registers[decode_asm_register('t6')] = 21
+
+    def run_pipelined(self, instructions, **options):
+        functional = FunctionalSimulator(instructions, 0, list(self.registers), {})
+        functional.run()
+        pipelined = PipelinedInterface(instructions, 0, list(self.registers), {}, **options)
+        pipelined.run()
+        self.assertEqual(list(functional.retrieve_register_list()), list(pipelined.retrieve_register_list()))
+        self.assertEqual(functional.instructions_executed, pipelined.instructions_retired)
+        return pipelined
+
+    def test_every_configuration_matches_functional_simulator(self):
+        instructions, registers, memory = build_test_program()
+        functional = FunctionalSimulator(instructions, 0, list(registers), dict(memory))
+        functional.run()
+        stalls = []
+        for ex_mem_forwarding, mem_wb_forwarding in [(False, False), (False, True), (True, False), (True, True)]:
+            pipelined = PipelinedInterface(instructions, 0, list(registers), dict(memory), ex_mem_forwarding,
+                                           mem_wb_forwarding)
+            pipelined.run()
+            self.assertEqual(list(functional.retrieve_register_list()), list(pipelined.retrieve_register_list()))
+            self.assertEqual(bytes(functional.retrieve_data_memory().view()),
+                             bytes(pipelined.retrieve_data_memory().view()))
+            self.assertEqual(pipelined.stall_cycles, sum(pipelined.stall_cycles_by_pc.values()))
+            self.assertEqual(pipelined.flushed_instructions, sum(pipelined.flushes_by_pc.values()))
+            stalls.append(pipelined.stall_cycles)
+        self.assertTrue(stalls[-1] < stalls[0])
+
+    def test_forwarding_removes_alu_stalls(self):
+        instructions = [Instruction('addi', '$t0', '$zero', '5'), Instruction('add', '$t1', '$t0', '$t0'),
+                        Instruction('add', '$t2', '$t1', '$t0')]
+        pipelined = self.run_pipelined(instructions)
+        self.assertEqual(0, pipelined.stall_cycles)
+        self.assertEqual(3, pipelined.forwarding_unit.ex_mem_forwards)
+        self.assertEqual(1, pipelined.forwarding_unit.mem_wb_forwards)
+        self.assertEqual(15, pipelined.retrieve_register_list()[decode_asm_register('t2')])
+
+    def test_single_forwarding_path(self):
+        instructions = [Instruction('addi', '$t0', '$zero', '5'), Instruction('add', '$t1', '$t0', '$t0')]
+        self.assertEqual(0, self.run_pipelined(instructions, mem_wb_forwarding=False).stall_cycles)
+        self.assertEqual(1, self.run_pipelined(instructions, ex_mem_forwarding=False).stall_cycles)
+
+        instructions = [Instruction('addi', '$t0', '$zero', '5'), Instruction('addi', '$t2', '$zero', '1'),
+                        Instruction('add', '$t1', '$t0', '$t0')]
+        self.assertEqual(1, self.run_pipelined(instructions, mem_wb_forwarding=False).stall_cycles)
+        self.assertEqual(0, self.run_pipelined(instructions, ex_mem_forwarding=False).stall_cycles)
+
+    def test_load_use_stall(self):
+        instructions = [Instruction('sw', '$t6', '$a0', '0'), Instruction('lw', '$t0', '$a0', '0'),
+                        Instruction('add', '$t1', '$t0', '$t0')]
+        pipelined = self.run_pipelined(instructions)
+        self.assertEqual(1, pipelined.stall_cycles)
+        self.assertEqual({4: 1}, pipelined.stall_cycles_by_pc)
+
+        # an independent instruction between the load and its use hides the load delay
+        instructions.insert(2, Instruction('addi', '$t2', '$zero', '1'))
+        self.assertEqual(0, self.run_pipelined(instructions).stall_cycles)
+
+    def test_store_data_is_forwarded(self):
+        instructions = [Instruction('addi', '$t0', '$zero', '7'), Instruction('sw', '$t0', '$a0', '0'),
+                        Instruction('lw', '$t1', '$a0', '0')]
+        pipelined = self.run_pipelined(instructions)
+        self.assertEqual(0, pipelined.stall_cycles)
+        self.assertEqual(7, pipelined.retrieve_data_memory().load_word(8))
+
+    def test_without_hazard_detection(self):
+        instructions = [Instruction('addi', '$t0', '$zero', '5'), Instruction('add', '$t1', '$t0', '$t0'),
+                        Instruction('j', '4'), Instruction('addi', '$t2', '$zero', '1'),
+                        Instruction('addi', '$t3', '$zero', '1')]
+        pipelined = PipelinedInterface(instructions, 0, list(self.registers), {}, False, False, False)
+        pipelined.run()
+        registers = pipelined.retrieve_register_list()
+        self.assertEqual(0, pipelined.stall_cycles)
+        self.assertEqual(0, pipelined.flushed_instructions)
+        self.assertEqual(0, registers[decode_asm_register('t1')])  # read $t0 before it was written
+        self.assertEqual(1, registers[decode_asm_register('t2')])  # delay slot behind the jump
+        self.assertEqual(1, registers[decode_asm_register('t3')])
+
+
+class LatchTest(unittest.TestCase):
+    # loads, stores, a load-use stall, forwarding and a taken branch every iteration, forever
+    LOOP = [Instruction('addi', '$t0', '$t0', '1'), Instruction('lw', '$t1', '$zero', '0'),
+            Instruction('add', '$t2', '$t1', '$t0'), Instruction('sw', '$t2', '$zero', '4'),
+            Instruction('beq', '$zero', '$zero', '-5')]
+
+    def test_latches_have_no_dict(self):
+        for latch in [IFIDLatch(), IDEXLatch(), EXMEMLatch(), MEMWBLatch()]:
+            self.assertFalse(hasattr(latch, '__dict__'))
+            self.assertFalse(latch.valid)
+
+    def test_copy_from_and_clear(self):
+        latch, held = IFIDLatch(8, 'predecoded', True, True), IFIDLatch()
+        held.copy_from(latch)
+        self.assertEqual((True, 8, 'predecoded', True, True),
+                         (held.valid, held.pc, held.predecoded, held.predicted_taken, held.redirected))
+        held.clear()
+        self.assertEqual((False, None), (held.valid, held.pc))
+
+    def test_latches_are_reused(self):
+        pipelined = PipelinedInterface(self.LOOP, 0, [0] * 32, {})
+        pipelined.run(2)
+        latches = {id(latch) for latch in [pipelined.if_id, pipelined.id_ex, pipelined.ex_mem, pipelined.mem_wb,
+                                           pipelined._next_if_id, pipelined._next_id_ex, pipelined._next_ex_mem,
+                                           pipelined._next_mem_wb]}
+        pipelined.run(100)
+        self.assertEqual(latches, {id(latch) for latch in [pipelined.if_id, pipelined.id_ex, pipelined.ex_mem,
+                                                           pipelined.mem_wb, pipelined._next_if_id,
+                                                           pipelined._next_id_ex, pipelined._next_ex_mem,
+                                                           pipelined._next_mem_wb]})
+
+    def test_steady_state_does_not_allocate(self):
+        cycles = 100000  # the same holds over a million cycles, which takes a while under tracemalloc
+        pipelined = PipelinedInterface(self.LOOP, 0, [0] * 32, {})
+        pipelined.run(1000)  # warm up: fill the pipeline, the caches of decoded instructions, the stall counters...
+        tracemalloc.start()
+        try:
+            pipelined.run(1000)
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            pipelined.run(cycles)
+            after, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertFalse(pipelined.halted)
+        # a handful of ints change size as the counters grow, but nothing is kept per cycle
+        self.assertLess(after - before, 1024)
+        self.assertLess(peak - before, 4096)
+
+
+class SnapshotTest(unittest.TestCase):
+    def final_state(self, pipelined):
+        return (pipelined.cycles, pipelined.instructions_retired, pipelined.stall_cycles,
+                pipelined.flushed_instructions,
+                dict(pipelined.stall_cycles_by_pc), dict(pipelined.flushes_by_pc),
+                list(pipelined.retrieve_register_list()), bytes(pipelined.retrieve_data_memory().view()),
+                dict(pipelined.branch_predictor.branch_statistics), pipelined.memory_stall_cycles)
+
+    def test_restore_replays_the_same_run(self):
+        instructions, registers, memory = build_test_program()
+        pipelined = PipelinedInterface(instructions, 0, registers, memory, branch_predictor=TournamentPredictor(),
+                                       branch_target_buffer=BranchTargetBuffer(), instruction_cache=Cache(256, 16),
+                                       data_cache=Cache(256, 16))
+        pipelined.run(40)  # several instructions in flight
+        snapshot = pipelined.snapshot()
+        in_flight = [latch.pc for latch in [pipelined.if_id, pipelined.id_ex, pipelined.ex_mem, pipelined.mem_wb]]
+        pipelined.run()
+        expected = self.final_state(pipelined)
+        for _ in range(3):
+            pipelined.restore(snapshot)
+            self.assertEqual(in_flight, [latch.pc for latch in [pipelined.if_id, pipelined.id_ex, pipelined.ex_mem,
+                                                                pipelined.mem_wb]])
+            pipelined.run()
+            self.assertEqual(expected, self.final_state(pipelined))
+
+
+if __name__ == '__main__':
+    unittest.main()
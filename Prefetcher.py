@@ -0,0 +1,238 @@
+"""
+Prefetcher.py
+
+Hardware prefetcher models for the data cache. A prefetcher sits between the Memory stage and the data cache: it
+sees every load and store (with the pc of the instruction making it), makes the demand access, and then fills the
+lines it predicts will be needed soon into the cache.
+
+Every prefetch is classified once its fate is known:
+    useful      the line was demanded after the prefetch had completed
+    late        the line was demanded while the prefetch was still in flight (only part of the latency was hidden)
+    useless     the line was evicted without ever being demanded
+Prefetches for lines that are already in the cache are never issued.
+
+Prefetchers:
+    NextLinePrefetcher      prefetches the lines following every access
+    StridePrefetcher        per-pc reference prediction table that learns a constant stride for each load or store
+    StreamPrefetcher        tracks ascending and descending streams of lines and runs ahead of them
+"""
+from array import array
+
+
+class Prefetcher(object):
+    def __init__(self, cache, degree=1):
+        """
+        Base class of the prefetchers. Subclasses override _candidates().
+        :param cache: data Cache to prefetch into
+        :param degree: maximum number of prefetches issued per access
+        """
+        if degree < 1:
+            raise Exception("(Prefetcher): Error! degree must be at least 1")
+        self.cache = cache
+        self.degree = degree
+        self.offset_bits = cache.offset_bits
+        self.clock = 0  # cycles; advanced by every demand access, or set by the pipeline
+        self.pending = {}  # line -> cycle its prefetch completes, for prefetched lines not demanded yet
+        self.issued = 0
+        self.useful = 0
+        self.late = 0
+        self.useless = 0
+
+    def _candidates(self, pc, address, hit):
+        """
+        :param pc: address of the load or store
+        :param address: byte address it accessed
+        :param hit: True if the demand access hit in the cache
+        :return: iterable of byte addresses to prefetch
+        """
+        raise NotImplementedError
+
+    def _prefetch(self, address):
+        """
+        Fills the line holding address into the cache, unless it is already there
+        :return: None
+        """
+        cache = self.cache
+        if cache.contains(address):
+            return
+        if cache.next_level is None:
+            latency = cache.miss_latency
+        else:
+            latency = cache.next_level.access(address, False)
+        cache.fill(address)
+        self.pending[address >> self.offset_bits] = self.clock + latency
+        self.issued += 1
+        if len(self.pending) > cache.sets * cache.associativity:
+            self._retire_evicted()  # at least one pending line has been evicted
+
+    def _retire_evicted(self):
+        """
+        Counts every pending prefetch whose line has left the cache as useless
+        :return: None
+        """
+        cache = self.cache
+        for line in [line for line in self.pending if not cache.contains(line << self.offset_bits)]:
+            del self.pending[line]
+            self.useless += 1
+
+    def access(self, pc, address, write=False):
+        """
+        Makes a demand access through the prefetcher, then issues prefetches
+        :param pc: address of the load or store
+        :param address: byte address
+        :param write: True for a store
+        :return: latency of the demand access in cycles
+        """
+        cache = self.cache
+        line = address >> self.offset_bits
+        ready = None
+        if line in self.pending:
+            ready = self.pending.pop(line)
+            if not cache.contains(address):
+                self.useless += 1
+                ready = None
+
+        misses = cache.misses
+        latency = cache.access(address, write)
+        if ready is not None:
+            if ready > self.clock:
+                self.late += 1
+                latency = max(latency, ready - self.clock)
+            else:
+                self.useful += 1
+
+        for candidate in self._candidates(pc, address, cache.misses == misses):
+            self._prefetch(candidate & 0xFFFFFFFF)
+        self.clock += latency
+        return latency
+
+    def statistics(self):
+        """
+        :return: dictionary of the prefetch counters. accuracy is the fraction of resolved prefetches that were
+        demanded (useful or late); prefetches still pending aren't counted either way.
+        """
+        self._retire_evicted()
+        resolved = self.useful + self.late + self.useless
+        return {'issued': self.issued, 'useful': self.useful, 'late': self.late, 'useless': self.useless,
+                'pending': len(self.pending),
+                'accuracy': (self.useful + self.late) / resolved if resolved else None}
+
+
+class NextLinePrefetcher(Prefetcher):
+    def _candidates(self, pc, address, hit):
+        line_size = self.cache.line_size
+        base = (address >> self.offset_bits) << self.offset_bits
+        return [base + line_size * distance for distance in range(1, self.degree + 1)]
+
+
+# reference prediction table states
+INITIAL, TRANSIENT, STEADY, NO_PREDICTION = range(4)
+
+
+class StridePrefetcher(Prefetcher):
+    def __init__(self, cache, degree=1, table_entries=64):
+        """
+        Reference prediction table prefetcher: a direct mapped table indexed by the pc of the load or store, holding
+        the last address it accessed, the stride between its last two addresses and a confidence state
+        :param table_entries: number of entries in the table (a power of two)
+        """
+        super(StridePrefetcher, self).__init__(cache, degree)
+        if table_entries < 1 or table_entries & (table_entries - 1):
+            raise Exception("(StridePrefetcher): Error! table_entries must be a power of two")
+        self.mask = table_entries - 1
+        self.tags = array('I', bytes(4 * table_entries))
+        self.valid = array('B', bytes(table_entries))
+        self.last_addresses = array('q', bytes(8 * table_entries))
+        self.strides = array('q', bytes(8 * table_entries))
+        self.states = array('B', bytes(table_entries))
+
+    def _candidates(self, pc, address, hit):
+        index = (pc >> 2) & self.mask
+        if not self.valid[index] or self.tags[index] != pc:
+            self.valid[index] = 1
+            self.tags[index] = pc
+            self.last_addresses[index] = address
+            self.strides[index] = 0
+            self.states[index] = INITIAL
+            return []
+
+        stride = address - self.last_addresses[index]
+        correct = stride == self.strides[index]
+        state = self.states[index]
+        if correct:
+            state = TRANSIENT if state == NO_PREDICTION else STEADY
+        else:
+            if state != STEADY:
+                self.strides[index] = stride
+            state = {INITIAL: TRANSIENT, TRANSIENT: NO_PREDICTION, STEADY: INITIAL,
+                     NO_PREDICTION: NO_PREDICTION}[state]
+        self.states[index] = state
+        self.last_addresses[index] = address
+
+        stride = self.strides[index]
+        if state != STEADY or stride == 0:
+            return []
+        return [address + stride * distance for distance in range(1, self.degree + 1)]
+
+
+class StreamPrefetcher(Prefetcher):
+    def __init__(self, cache, degree=1, streams=8, distance=4):
+        """
+        Stream prefetcher. A miss that doesn't belong to a stream starts tracking a new one (replacing the least
+        recently used tracker); once a neighbouring line is accessed the stream has a direction, and the prefetcher
+        keeps up to distance lines ahead of it.
+        :param streams: number of streams tracked at once
+        :param distance: how many lines ahead of the stream to prefetch
+        """
+        super(StreamPrefetcher, self).__init__(cache, degree)
+        if streams < 1 or distance < 1:
+            raise Exception("(StreamPrefetcher): Error! streams and distance must be at least 1")
+        self.distance = distance
+        self.last_lines = array('q', [-1]) * streams
+        self.directions = array('b', bytes(streams))  # 0 until the direction is known
+        self.frontiers = array('q', [-1]) * streams  # furthest line prefetched
+        self.stamps = array('Q', bytes(8 * streams))
+        self._time = 0
+
+    def _candidates(self, pc, address, hit):
+        self._time += 1
+        line = address >> self.offset_bits
+        for stream in range(len(self.last_lines)):
+            last = self.last_lines[stream]
+            if last < 0:
+                continue
+            direction = self.directions[stream]
+            if direction == 0:
+                if abs(line - last) != 1:
+                    continue
+                direction = self.directions[stream] = line - last
+                self.frontiers[stream] = line
+            elif not 0 < (line - last) * direction <= self.distance:
+                continue
+            self.last_lines[stream] = line
+            self.stamps[stream] = self._time
+            return self._advance(stream, line, direction)
+
+        if not hit:
+            stream = min(range(len(self.stamps)), key=self.stamps.__getitem__)
+            self.last_lines[stream] = line
+            self.directions[stream] = 0
+            self.frontiers[stream] = line
+            self.stamps[stream] = self._time
+        return []
+
+    def _advance(self, stream, line, direction):
+        """
+        :return: addresses of the next lines of the stream, up to distance lines ahead of line
+        """
+        frontier = self.frontiers[stream]
+        if (frontier - line) * direction < 0:
+            frontier = line
+        candidates = []
+        while len(candidates) < self.degree and (frontier - line) * direction < self.distance:
+            frontier += direction
+            if frontier < 0:
+                break
+            candidates.append(frontier << self.offset_bits)
+        self.frontiers[stream] = frontier
+        return candidates
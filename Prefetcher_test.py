@@ -0,0 +1,154 @@
+import unittest
+
+from Cache import Cache
+from FunctionalSimulator import FunctionalSimulator
+from Instruction import Instruction, decode_asm_register
+from PipelineInterface import PipelineInterface
+from PipelinedInterface import PipelinedInterface
+from Prefetcher import NextLinePrefetcher, StreamPrefetcher, StridePrefetcher
+
+
+def build_array_walk(words):
+    """
+    :return: (instruction list, registers) summing words consecutive words starting at address 0 into $t2, stepping
+    through the array with addi $a0, $a0, 4 like TestProgram.py
+    """
+    instructions = [Instruction('lw', '$t1', '$a0', '0'),        # 0 LOOP
+                    Instruction('add', '$t2', '$t2', '$t1'),     # 4
+                    Instruction('addi', '$a0', '$a0', '4'),      # 8
+                    Instruction('addi', '$t0', '$t0', '-1'),     # 12
+                    Instruction('bne', '$t0', '$zero', '-5')]    # 16 bne LOOP
+    registers = [0] * 32
+    registers[decode_asm_register('t0')] = words
+    return instructions, registers
+
+
+class PrefetcherTest(unittest.TestCase):
+    def test_next_line(self):
+        cache = Cache(1024, 16, 2, miss_latency=20)
+        prefetcher = NextLinePrefetcher(cache, 2)
+        self.assertEqual(21, prefetcher.access(0, 0))
+        self.assertTrue(cache.contains(16) and cache.contains(32))
+        self.assertEqual(1, prefetcher.access(0, 16))
+        self.assertEqual(1, cache.misses)
+        statistics = prefetcher.statistics()
+        self.assertEqual((3, 1, 0), (statistics['issued'], statistics['useful'], statistics['late']))
+        self.assertEqual(2, statistics['pending'])
+
+    def test_late_prefetch(self):
+        cache = Cache(1024, 16, 2, miss_latency=20)
+        prefetcher = NextLinePrefetcher(cache)
+        prefetcher.access(0, 0)
+        prefetcher.clock = 5  # the line was demanded 5 cycles after the prefetch went out
+        self.assertEqual(15, prefetcher.access(0, 16))
+        self.assertEqual(1, prefetcher.late)
+
+    def test_useless_prefetch(self):
+        cache = Cache(32, 16, 1)  # two lines
+        prefetcher = NextLinePrefetcher(cache)
+        prefetcher.access(0, 0)  # prefetches line 1
+        cache.access(48)  # evicts it
+        self.assertEqual(1, prefetcher.statistics()['useless'])
+        self.assertEqual(0.0, prefetcher.statistics()['accuracy'])
+
+    def test_prefetches_are_filtered(self):
+        cache = Cache(1024, 16, 2)
+        prefetcher = NextLinePrefetcher(cache)
+        cache.access(16)
+        prefetcher.access(0, 0)
+        self.assertEqual(0, prefetcher.issued)
+
+    def test_stride_table(self):
+        cache = Cache(4096, 16, 4)
+        prefetcher = StridePrefetcher(cache, 2)
+        for address in (0, 64, 128):
+            prefetcher.access(0x40, address)
+        self.assertEqual(2, prefetcher.issued)
+        self.assertTrue(cache.contains(192) and cache.contains(256))
+        self.assertEqual(1, prefetcher.access(0x40, 192))
+        self.assertEqual(3, prefetcher.issued)  # 256 is already there, so only 320 goes out
+
+        prefetcher.access(0x44, 1000)  # another pc has its own entry
+        self.assertEqual(3, prefetcher.issued)
+
+    def test_stride_needs_confirmation(self):
+        cache = Cache(4096, 16, 4)
+        prefetcher = StridePrefetcher(cache)
+        for address in (0, 64, 96, 400, 8):
+            prefetcher.access(0x40, address)
+        self.assertEqual(0, prefetcher.issued)
+
+    def test_stream(self):
+        cache = Cache(4096, 16, 4)
+        prefetcher = StreamPrefetcher(cache, degree=2, distance=4)
+        prefetcher.access(0, 160)
+        self.assertEqual(0, prefetcher.issued)
+        prefetcher.access(0, 144)  # descending
+        self.assertTrue(cache.contains(128) and cache.contains(112))
+        for address in range(128, 0, -16):
+            prefetcher.access(0, address)
+        self.assertEqual(2, cache.misses)
+        self.assertTrue(prefetcher.useful > 0)
+
+    def test_bad_configuration(self):
+        cache = Cache()
+        self.assertRaises(Exception, NextLinePrefetcher, cache, 0)
+        self.assertRaises(Exception, StridePrefetcher, cache, 1, 3)
+        self.assertRaises(Exception, StreamPrefetcher, cache, 1, 0)
+
+
+class PipelinePrefetchTest(unittest.TestCase):
+    def test_array_walk(self):
+        instructions, registers = build_array_walk(100)
+        functional = FunctionalSimulator(instructions, 0, list(registers), {})
+        functional.run()
+
+        baseline_cache = Cache(1024, 16, 2, miss_latency=30)
+        baseline = PipelinedInterface(instructions, 0, list(registers), {}, data_cache=baseline_cache)
+        baseline.run()
+
+        for prefetcher_type in (NextLinePrefetcher, StridePrefetcher, StreamPrefetcher):
+            cache = Cache(1024, 16, 2, miss_latency=30)
+            prefetcher = prefetcher_type(cache, 2)
+            pipelined = PipelinedInterface(instructions, 0, list(registers), {}, data_cache=cache,
+                                           data_prefetcher=prefetcher)
+            pipelined.run()
+            self.assertEqual(list(functional.retrieve_register_list()), list(pipelined.retrieve_register_list()))
+            self.assertTrue(cache.misses < baseline_cache.misses)
+            self.assertTrue(pipelined.cycles < baseline.cycles)
+            statistics = prefetcher.statistics()
+            self.assertTrue(statistics['useful'] + statistics['late'] > 0)
+
+    def test_single_cycle_pipeline(self):
+        instructions, registers = build_array_walk(20)
+        cache = Cache(1024, 16, 2)
+        prefetcher = StridePrefetcher(cache)
+        interface = PipelineInterface(instructions, 0, list(registers), {}, True, data_cache=cache,
+                                      data_prefetcher=prefetcher)
+        while interface.fetch.has_instruction():
+            interface.trigger_clock_cycle()
+        self.assertEqual(20, interface.memory.cache_accesses)
+        self.assertTrue(prefetcher.issued > 0)
+
+    def test_prefetcher_without_data_cache(self):
+        instructions, registers = build_array_walk(20)
+        for engine in (PipelinedInterface, PipelineInterface):
+            cache = Cache(1024, 16, 2)
+            prefetcher = StridePrefetcher(cache)
+            options = {} if engine is PipelinedInterface else {'integer_datapath': True}
+            interface = engine(instructions, 0, list(registers), {}, data_prefetcher=prefetcher, **options)
+            interface.run()
+            self.assertIs(cache, interface.memory.cache)
+            self.assertEqual(20, cache.reads)
+            self.assertTrue(prefetcher.issued > 0)
+
+    def test_prefetcher_for_another_cache(self):
+        instructions, registers = build_array_walk(20)
+        prefetcher = StridePrefetcher(Cache(1024, 16, 2))
+        for engine in (PipelinedInterface, PipelineInterface):
+            with self.assertRaises(Exception):
+                engine(instructions, 0, list(registers), {}, data_cache=Cache(1024, 16, 2), data_prefetcher=prefetcher)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+RegisterFile.py
+
+Compact register file for the integer datapath. The registers live in a single array of unsigned 32-bit ints, so
+they can be handed to analysis code as a memoryview (or NumPy array) without building any strings.
+"""
+from array import array
+
+from Instruction import create_sized_binary_num, to_word, WORD_MASK, WORD_TYPECODE
+
+
+class RegisterFile(object):
+    def __init__(self, initial_values=None, register_count=32):
+        """
+        Creates a register file with every register set to zero, then loads any initial values.
+        :param initial_values: optional list of register values, either 32-bit binary strings or ints
+        :param register_count: number of registers in the file
+        """
+        self._registers = array(WORD_TYPECODE, [0]) * register_count
+        if initial_values is not None:
+            if len(initial_values) > register_count:
+                raise Exception("(RegisterFile): Error! Too many initial values for the register file!")
+            for register, value in enumerate(initial_values):
+                self.write(register, to_word(value))
+
+    def __len__(self):
+        return len(self._registers)
+
+    def __getitem__(self, register):
+        return self._registers[register]
+
+    def __setitem__(self, register, value):
+        """
+        Writes a register, accepting either an int or a binary string. Writes to $zero are ignored.
+        """
+        self.write(register, to_word(value))
+
+    def __iter__(self):
+        return iter(self._registers)
+
+    def __eq__(self, other):
+        try:
+            return list(self._registers) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def read(self, register):
+        """
+        Reads a register as an unsigned 32-bit int
+        :param register: register number
+        :return: int
+        """
+        return self._registers[register]
+
+    def write(self, register, value):
+        """
+        Writes an int to a register, masking it to 32 bits. $zero is hard-wired, so writes to it are dropped.
+        :param register: register number
+        :param value: int to write
+        :return: None
+        """
+        if register:
+            self._registers[register] = value & WORD_MASK
+
+    @property
+    def words(self):
+        """
+        The underlying array itself, for execution engines that index it directly. Anything writing through it has
+        to keep $zero at zero and mask values to 32 bits.
+        """
+        return self._registers
+
+    def binary(self, register):
+        """
+        Compatibility accessor for the binary string API
+        :param register: register number
+        :return: 32 character binary string
+        """
+        return create_sized_binary_num(self._registers[register], 32)
+
+    def binary_list(self):
+        """
+        :return: list of 32 character binary strings, in the same form as the original list-based register file
+        """
+        return [create_sized_binary_num(value, 32) for value in self._registers]
+
+    def snapshot(self):
+        """
+        :return: copy of the register values, for restore()
+        """
+        return self._registers[:]
+
+    def restore(self, state):
+        """
+        Sets every register back to the values saved by snapshot()
+        :param state: value returned by snapshot()
+        :return: None
+        """
+        self._registers[:] = state
+
+    def view(self):
+        """
+        :return: zero-copy, writable memoryview of the registers (format 'I'). Writing $zero through it is on you.
+        """
+        return memoryview(self._registers)
+
+    def numpy_view(self):
+        """
+        :return: zero-copy numpy uint32 array sharing memory with the register file
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise Exception("(RegisterFile): Error! numpy is required for numpy_view()")
+        return numpy.frombuffer(self._registers, dtype=numpy.uint32)
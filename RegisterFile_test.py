@@ -0,0 +1,75 @@
+import unittest
+
+from RegisterFile import RegisterFile
+from Instruction import create_sized_binary_num
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class RegisterFileTest(unittest.TestCase):
+    def test_create_register_file(self):
+        registers = RegisterFile()
+        self.assertEqual(32, len(registers))
+        self.assertEqual([0] * 32, list(registers))
+
+    def test_load_binary_strings(self):
+        registers = RegisterFile([create_sized_binary_num(65535, 32) for i in range(0, 32)])
+        self.assertEqual(0, registers[0])
+        self.assertEqual(65535, registers[31])
+
+    def test_zero_is_hard_wired(self):
+        registers = RegisterFile()
+        registers.write(0, 12)
+        registers[0] = 12
+        self.assertEqual(0, registers.read(0))
+
+    def test_write_masks_to_32_bits(self):
+        registers = RegisterFile()
+        registers.write(8, -1)
+        self.assertEqual(0xFFFFFFFF, registers.read(8))
+        registers.write(9, 1 << 33)
+        self.assertEqual(0, registers.read(9))
+
+    def test_binary_accessors(self):
+        registers = RegisterFile()
+        registers[4] = create_sized_binary_num(-10, 32)
+        self.assertEqual(create_sized_binary_num(-10, 32), registers.binary(4))
+        self.assertEqual(create_sized_binary_num(-10, 32), registers.binary_list()[4])
+        self.assertEqual(create_sized_binary_num(0, 32), registers.binary_list()[5])
+
+    def test_view_is_zero_copy(self):
+        registers = RegisterFile()
+        view = registers.view()
+        registers.write(5, 1234)
+        self.assertEqual(1234, view[5])
+        self.assertEqual(4, view.itemsize)
+
+    def test_snapshot_and_restore(self):
+        registers = RegisterFile([0, 1, 2])
+        snapshot = registers.snapshot()
+        registers.write(1, 10)
+        registers.restore(snapshot)
+        self.assertEqual([0, 1, 2] + [0] * 29, list(registers))
+        registers.write(2, 20)
+        registers.restore(snapshot)
+        self.assertEqual(2, registers[2])
+
+    def test_too_many_initial_values(self):
+        with self.assertRaises(Exception) as cm:
+            RegisterFile([0] * 33)
+        self.assertTrue("Too many initial values" in str(cm.exception))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_view_is_zero_copy(self):
+        registers = RegisterFile()
+        array_view = registers.numpy_view()
+        registers.write(7, 0xFFFFFFFF)
+        self.assertEqual(numpy.uint32, array_view.dtype)
+        self.assertEqual(0xFFFFFFFF, int(array_view[7]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,33 +5,90 @@ Created: March 25, 2017
 
 Home to all the stages of the pipeline.. maybe
 """
-from control import Control
-from Instruction import create_sized_binary_num, decode_signed_binary_number
+from control import ALU_ADD, ALU_AND, ALU_CONTROL, ALU_CONTROL_BY_FIELD, ALU_DIV, ALU_MULT, ALU_OR, ALU_SLT, ALU_SUB, \
+    ALU_XOR, alu_control_word, CONTROL_ROM_BY_FIELD, precomputed_control, UNKNOWN_CONTROL
+from Decoder import PredecodedInstruction, is_machine_code, is_supported, predecode_instruction, predecode_program, \
+    to_instruction
+from Faults import DivisionByZero, InvalidInstructionAddress, MemoryFault, MisalignedProgramCounter, \
+    UnsupportedInstruction
+from Instruction import create_sized_binary_num, decode_signed_binary_number, to_signed_word, WORD_MASK
+from RegisterFile import RegisterFile
 
 
 class Fetch(object):
-    def __init__(self, instruction_list, starting_address):
+    def __init__(self, instruction_list, starting_address, integer_datapath=False):
         """
         Creates the Fetch stage of the pipeline with the PC set to starting address, and instruction list
         being the Instruction Objects (in order) that represent the program.
-        :param instruction_list: list of Instruction objects that will compose instruction memory
+        :param instruction_list: list of Instruction objects that will compose instruction memory, or the machine words
+        of the program (an array, memoryview or list of ints, e.g. from Decoder.load_image)
         :param starting_address: starting address of the program counter, should be noted that this will be the address
         that the first instruction is added to, and following ones will be starting_address + 4, +8, etc.
+        :param integer_datapath: if True, send predecoded instructions to the decode stage
         """
         if len(instruction_list) == 0:
             raise Exception("Instruction list must have at least one instruction present!")
 
+        self.integer_datapath = integer_datapath
         self.program_counter = int(starting_address)  # initialize the program counter to the starting address
-        self.instruction_memory = {}  # Use a dictionary as the representation for instruction memory
+        self.base_address = self.program_counter
+
+        # Both indexed by (pc - base_address) >> 2, so fetching is a bounds check and a list index. The table of
+        # Instruction objects is filled in on demand when loaded from machine code; the predecoded instructions are
+        # built on first use when given Instruction objects (only the integer datapath needs them).
+        self._instruction_table = []
+        self.predecoded_instructions = None
+
+        self.cache = None  # instruction cache (see Cache.py); every fetch is charged its latency
+        self.cache_cycles = 0
+        self.cache_accesses = 0
 
         self._setup_instruction_memory(instruction_list)
-        self._i_mem_keys = sorted(self.instruction_memory.keys())  # for checking if the address of the PC is valid
 
     def _setup_instruction_memory(self, instruction_list):
-        i = 0
-        for instruction in instruction_list:
-            self.instruction_memory[self.program_counter + i] = instruction
-            i += 4
+        if is_machine_code(instruction_list):
+            # Instruction objects are only built when something asks for them (see fetch_instruction)
+            self.predecoded_instructions = predecode_program(instruction_list)
+            self._instruction_table = [None] * len(self.predecoded_instructions)
+            return
+        self._instruction_table = list(instruction_list)
+        if self.integer_datapath:
+            self._predecode()
+
+    def _predecode(self):
+        self.predecoded_instructions = [predecode_instruction(instruction) for instruction in self._instruction_table]
+
+    @property
+    def instruction_memory(self):
+        """
+        Instruction memory as a dictionary of address -> Instruction object, built when asked for (fetching uses the
+        instruction tables). Words of a machine code program that the simulator can't execute are left out.
+        """
+        return {self.base_address + 4 * index: self._instruction_at(index)
+                for index in range(len(self._instruction_table))
+                if self._instruction_table[index] is not None or is_supported(self.predecoded_instructions[index])}
+
+    def _instruction_at(self, index):
+        instruction = self._instruction_table[index]
+        if instruction is None:  # loaded from machine code
+            instruction = self._instruction_table[index] = to_instruction(self.predecoded_instructions[index])
+        return instruction
+
+    def _instruction_index(self):
+        """
+        :return: index of the current PC in the instruction tables. Raises InvalidInstructionAddress if the PC is
+        outside of instruction memory.
+        """
+        index = (self.program_counter - self.base_address) >> 2
+        if index < 0 or index >= len(self._instruction_table):
+            raise InvalidInstructionAddress("Invalid Instruction Address!")
+        return index
+
+    def has_instruction(self):
+        """
+        :return: True if the program counter points inside instruction memory
+        """
+        return 0 <= self.program_counter - self.base_address < 4 * len(self._instruction_table)
 
     def fetch_instruction(self):
         """
@@ -39,10 +96,26 @@ class Fetch(object):
         and returns the instruction. If the PC is at an invalid address, an Exception is raised.
         :return: Instruction object
         """
-        if self.program_counter not in self._i_mem_keys:
-            raise Exception("Invalid Instruction Address!")
+        index = self._instruction_index()
+        if self.cache is not None:
+            self._access_cache()
+        return self._instruction_at(index)
+
+    def fetch_predecoded_instruction(self):
+        """
+        Same as fetch_instruction, but returns the PredecodedInstruction for the current PC
+        :return: PredecodedInstruction
+        """
+        index = self._instruction_index()
+        if self.cache is not None:
+            self._access_cache()
+        if self.predecoded_instructions is None:
+            self._predecode()
+        return self.predecoded_instructions[index]
 
-        return self.instruction_memory[self.program_counter]  # get the Instruction
+    def _access_cache(self):
+        self.cache_cycles += self.cache.access(self.program_counter)
+        self.cache_accesses += 1
 
     def update_program_counter(self, new_address):
         """
@@ -53,7 +126,7 @@ class Fetch(object):
         if isinstance(new_address, str):
             new_address = decode_signed_binary_number(new_address, 32)
         if new_address % 4 != 0:  # Have to use whole word addressing. Sorry
-            raise Exception("Invalid Program Counter Value!")
+            raise MisalignedProgramCounter("Invalid Program Counter Value!")
         else:
             self.program_counter = new_address
 
@@ -75,28 +148,52 @@ class Fetch(object):
         :param next_stage: stage to send the instruction to
         :return: None
         """
-        next_stage.receive_instruction(self.fetch_instruction(), self.program_counter + 4)
+        if self.integer_datapath:
+            next_stage.receive_predecoded_instruction(self.fetch_predecoded_instruction(), self.program_counter + 4)
+        else:
+            next_stage.receive_instruction(self.fetch_instruction(), self.program_counter + 4)
 
 
 class Decode(object):
-    def __init__(self, register_file, next_stage=None):
+    lazy_signals = False  # see LazyDecode
+
+    def __init__(self, register_file, next_stage=None, integer_datapath=False):
         """
         Initialized to none because this wouldn't be populated until the
         Fetch stage had fetched an instruction and sent it to the decode stage
         :param register_file: list representing the values in all of the registers. SHOULD BE 32 BIT VALUES
+        :param integer_datapath: if True, registers are kept in a RegisterFile of masked 32-bit ints instead of a list
+        of binary strings (a list passed in is copied into a new RegisterFile)
         """
+        self.integer_datapath = integer_datapath
         self.instruction = None
-        self.register_file = register_file
-        self.register_file[0] = create_sized_binary_num(0, 32)
+        self.predecoded = None  # last PredecodedInstruction received on the integer datapath
+        if integer_datapath:
+            if isinstance(register_file, RegisterFile):
+                self.register_file = register_file
+            else:
+                self.register_file = RegisterFile(register_file)
+        else:
+            self.register_file = register_file
+            self.register_file[0] = create_sized_binary_num(0, 32)
         self.read_reg_1 = None
         self.read_reg_2 = None
         self.write_register = None
         self.sign_extended_immediate = None
-        self._control = Control()
+        self._control = UNKNOWN_CONTROL  # ControlWord of the instruction being decoded
+        self._opcode_num = None
+        self._function_num = None
         self.next_stage = next_stage
         self._program_counter_value = None
         self.jump_address = None
 
+    def skipped_evaluations(self):
+        """
+        :return: dictionary of signal name -> number of instructions it was never evaluated for (always 0: every
+        signal is evaluated for every instruction unless using LazyDecode)
+        """
+        return {'sign_extended_immediate': 0, 'jump_address': 0}
+
     def receive_instruction(self, instruction, program_counter_value):
         """
         What happens when we receive an instruction?
@@ -105,44 +202,126 @@ class Decode(object):
         :return:
         """
         self.instruction = instruction
+        self.predecoded = None
         self._program_counter_value = program_counter_value
         self.update_control()
-        self.read_reg_1 = instruction.rs
-        self.read_reg_2 = instruction.rt
+        if self.integer_datapath:
+            self._opcode_num = instruction.opcode_num
+            self._function_num = instruction.function_num
+            self.read_reg_1 = instruction.rs_num
+            self.read_reg_2 = instruction.rt_num
+        else:
+            self.read_reg_1 = instruction.rs
+            self.read_reg_2 = instruction.rt
         self.update_write_register()
-        self.sign_extend_immediate_field()
-        self.calculate_jump_address()
+        if self.lazy_signals:
+            self._defer_signals()
+        else:
+            self.sign_extend_immediate_field()
+            self.calculate_jump_address()
 
         if self.next_stage:  # for testing...
             self.send_data_to_next_stage()
 
+    def receive_predecoded_instruction(self, predecoded, program_counter_value):
+        """
+        Integer datapath version of receive_instruction. Every field was decoded when instruction memory was set up,
+        so there is nothing left to slice or convert.
+        :param predecoded: PredecodedInstruction from the fetch stage
+        :param program_counter_value: Value of the program counter to pass to the execute stage
+        :return: None
+        """
+        self.instruction = predecoded.instruction  # None for a program loaded from machine code
+        self.predecoded = predecoded
+        self._program_counter_value = program_counter_value
+        self._control = predecoded.control
+        self._opcode_num = predecoded.opcode
+        self._function_num = predecoded.funct
+        self.read_reg_1 = predecoded.rs
+        self.read_reg_2 = predecoded.rt
+        self.write_register = predecoded.rd if self._control.RegDst else predecoded.rt
+        self.sign_extended_immediate = predecoded.immediate  # already sign-extended: nothing to defer
+        if self.lazy_signals:
+            self._defer_signals(False)
+        else:
+            self.calculate_jump_address()
+
+        if self.next_stage:  # for testing...
+            self.send_data_to_next_stage()
+
+    def decode_into(self, predecoded, pc, latch):
+        """
+        Integer datapath: decodes an instruction straight into the ID/EX latch, instead of passing its fields down the
+        receive_data/receive_control_information chain
+        :param predecoded: PredecodedInstruction
+        :param pc: address of the instruction
+        :param latch: IDEXLatch to overwrite
+        :return: None
+        """
+        self.instruction = predecoded.instruction
+        self.predecoded = predecoded
+        register_file = self.register_file
+        latch.valid = True
+        latch.pc = pc
+        latch.predecoded = predecoded
+        latch.predicted_taken = False
+        latch.prediction_history = None
+        latch.read_data1 = register_file[predecoded.rs]
+        latch.read_data2 = register_file[predecoded.rt]
+        latch.immediate = predecoded.immediate
+        latch.jump_address = ((pc + 4) & 0xF0000000) | (predecoded.address << 2)
+        latch.write_register = predecoded.rd if predecoded.control.RegDst else predecoded.rt
+
     def send_data_to_next_stage(self):
         """
         Sends the relevant data and control information to the next stage by calling two methods of the next stage
         :return:
         """
+        immediate, jump_address = self._signals_for_next_stage()
+        if self.integer_datapath:
+            self.next_stage.receive_data(self.register_file[self.read_reg_1], self.register_file[self.read_reg_2],
+                                         immediate, self._program_counter_value, jump_address)
+
+            self.next_stage.receive_control_information(self._control.ALUOp, self._function_num,
+                                                        self._opcode_num, self._control.ALUSrc,
+                                                        self._control.MemWrite, self._control.MemtoReg,
+                                                        self._control.MemRead, self._control.Branch,
+                                                        self._control.jump)
+            return
+
         self.next_stage.receive_data(self.register_file[int(self.read_reg_1, 2)],
-                                     self.register_file[int(self.read_reg_2, 2)], self.sign_extended_immediate,
-                                     self._program_counter_value, self.jump_address)  # because this line passes through the decode stage
+                                     self.register_file[int(self.read_reg_2, 2)], immediate,
+                                     self._program_counter_value, jump_address)  # because this line passes through the decode stage
 
         self.next_stage.receive_control_information(self._control.ALUOp, self.instruction.function_field,
                                                     self.instruction.opcode, self._control.ALUSrc,
                                                     self._control.MemWrite, self._control.MemtoReg,
                                                     self._control.MemRead, self._control.Branch, self._control.jump)
 
+    def _signals_for_next_stage(self):
+        """
+        :return: (sign-extended immediate, jump address) to send to the execute stage
+        """
+        return self.sign_extended_immediate, self.jump_address
+
     def update_control(self):
         """
         Populate all the values of the control class
         :return:
         """
-        self._control.update(self.instruction.opcode)
+        if self.integer_datapath:
+            self._control = precomputed_control(self.instruction.opcode_num)
+        else:
+            self._control = CONTROL_ROM_BY_FIELD.get(self.instruction.opcode, UNKNOWN_CONTROL)
 
     def update_write_register(self):
         """
         Set the value of what register to write to based on the value of the RegDst control line
         :return:
         """
-        if self._control.RegDst:
+        if self.integer_datapath:
+            self.write_register = self.instruction.rd_num if self._control.RegDst else self.instruction.rt_num
+        elif self._control.RegDst:
             self.write_register = self.instruction.rd
         else:
             self.write_register = self.instruction.rt
@@ -152,7 +331,9 @@ class Decode(object):
         Sign extend the immediate field from 16 bits to 32 bits
         :return:
         """
-        if self.instruction.immediate:
+        if self.integer_datapath:
+            self.sign_extended_immediate = self.instruction.immediate_num & WORD_MASK
+        elif self.instruction.immediate:
             self.sign_extended_immediate = create_sized_binary_num(
                 decode_signed_binary_number(self.instruction.immediate, 16), 32)
 
@@ -162,6 +343,11 @@ class Decode(object):
         and then concatenating the top four bits of the program counter to this to create a 32 bit address to go to
         :return: None
         """
+        if self.integer_datapath:
+            address = self.instruction.address_num if self.predecoded is None else self.predecoded.address
+            self.jump_address = (self._program_counter_value & 0xF0000000) | (address << 2)
+            return
+
         address = create_sized_binary_num(decode_signed_binary_number((self.instruction.binary_version()[6:]), 26) << 2, 28)  # shift bottom 26 bits left by two
         self.jump_address = create_sized_binary_num(self._program_counter_value, 32)[0:4] + address # May not be right maths
 
@@ -171,6 +357,13 @@ class Decode(object):
         :param data:
         :return:
         """
+        if self.integer_datapath:
+            if self.write_register is None:
+                raise Exception("Trying to write to a register before the write_register destination has been set!")
+            if self._control.RegWrite:
+                self.register_file.write(self.write_register, data)  # writes to $zero are dropped
+            return
+
         if self.write_register and self._control.RegWrite:
             self.register_file[int(self.write_register, 2)] = data
         elif not self.write_register:
@@ -181,11 +374,117 @@ class Decode(object):
         pass
 
 
+def integer_alu(operation, input_1, input_2):
+    """
+    The ALU of the integer datapath
+    :param operation: 4-bit ALU operation (see control.py)
+    :param input_1: signed value of the first input
+    :param input_2: signed value of the second input
+    :return: result as a masked 32-bit word
+    """
+    if operation == ALU_ADD:
+        return (input_1 + input_2) & WORD_MASK
+    if operation == ALU_SUB:
+        return (input_1 - input_2) & WORD_MASK
+    if operation == ALU_AND:
+        return (input_1 & input_2) & WORD_MASK
+    if operation == ALU_OR:
+        return (input_1 | input_2) & WORD_MASK
+    if operation == ALU_SLT:
+        return 1 if input_1 < input_2 else 0
+    if operation == ALU_XOR:
+        return (input_1 ^ input_2) & WORD_MASK
+    if operation == ALU_MULT:
+        return (input_1 * input_2) & WORD_MASK
+    if operation == ALU_DIV:  # truncate toward zero without going through a float
+        if input_2 == 0:
+            raise DivisionByZero("(Execute): Error! Division by zero")
+        quotient = abs(input_1) // abs(input_2)
+        return (-quotient if (input_1 < 0) != (input_2 < 0) else quotient) & WORD_MASK
+    raise UnsupportedInstruction("(Execute): Unsupported ALU operation!")
+
+
+class LazyDecode(Decode):
+    """
+    Decode stage that only works out the sign-extended immediate and the jump address when something reads them, and
+    only sends them to the execute stage when the control signals say it will use them. The signals are properties
+    here, so the eager Decode keeps them as plain attributes.
+    """
+    lazy_signals = True
+
+    def __init__(self, register_file, next_stage=None, integer_datapath=False):
+        self._immediate_pending = False  # sign_extended_immediate hasn't been worked out for this instruction yet
+        self._jump_address_pending = False  # same for jump_address
+        self.skipped_immediates = 0  # instructions whose immediate was never sign-extended
+        self.skipped_jump_addresses = 0  # instructions whose jump address was never calculated
+        super(LazyDecode, self).__init__(register_file, next_stage, integer_datapath)
+
+    @property
+    def sign_extended_immediate(self):
+        if self._immediate_pending:
+            self.sign_extend_immediate_field()
+        return self._sign_extended_immediate
+
+    @sign_extended_immediate.setter
+    def sign_extended_immediate(self, value):
+        self._immediate_pending = False
+        self._sign_extended_immediate = value
+
+    @property
+    def jump_address(self):
+        if self._jump_address_pending:
+            self.calculate_jump_address()
+        return self._jump_address
+
+    @jump_address.setter
+    def jump_address(self, value):
+        self._jump_address_pending = False
+        self._jump_address = value
+
+    def _defer_signals(self, immediate=True):
+        """
+        Marks the derived signals of a new instruction as not worked out yet. Signals of the previous instruction
+        that nothing ever read are counted as skipped.
+        :param immediate: defer the sign-extended immediate as well as the jump address
+        :return: None
+        """
+        self.skipped_immediates += self._immediate_pending
+        self.skipped_jump_addresses += self._jump_address_pending
+        self._immediate_pending = immediate
+        self._jump_address_pending = True
+
+    def skipped_evaluations(self):
+        """
+        :return: dictionary of signal name -> number of instructions it was never evaluated for
+        """
+        return {'sign_extended_immediate': self.skipped_immediates + self._immediate_pending,
+                'jump_address': self.skipped_jump_addresses + self._jump_address_pending}
+
+    def _signals_for_next_stage(self):
+        """
+        :return: (sign-extended immediate, jump address) to send to the execute stage. A signal is only read (and so
+        evaluated) if the instruction uses it: the immediate for ALU immediates, loads, stores and branches, the jump
+        address for jumps. The others are sent as None.
+        """
+        control = self._control
+        immediate = self.sign_extended_immediate if control.ALUSrc or control.Branch else None
+        return immediate, self.jump_address if control.jump else None
+
+    def sign_extend_immediate_field(self):
+        self._immediate_pending = False  # with no immediate field, keeps the last value, as it always has
+        super(LazyDecode, self).sign_extend_immediate_field()
+
+
 class Execute:
-    def __init__(self, next_stage=None):
+    lazy_signals = False  # see LazyExecute
+
+    def __init__(self, next_stage=None, integer_datapath=False):
         """
         Create all of the class attributes and initialize them to None.
+        :param integer_datapath: if True, data, opcode and funct values are received as ints instead of binary strings
         """
+        self.integer_datapath = integer_datapath
+
         # Control lines
         self._Branch = None
         self._MemRead = None
@@ -218,6 +517,13 @@ class Execute:
         self.branch_address = None
         self.next_stage = next_stage
 
+    def skipped_evaluations(self):
+        """
+        :return: dictionary of signal name -> number of instructions it was never evaluated for (always 0 unless
+        using LazyExecute)
+        """
+        return {'branch_address': 0}
+
     def receive_data(self, data1, data2, immediate, pc_value, jump_address):
         """
         Data information has been received, update the relevant class attributes
@@ -258,70 +564,51 @@ class Execute:
         self.process_alu_control()
         self.set_alu_inputs()
         self.execute_alu_operation()
-        self.calculate_branch_address()
+        if self.lazy_signals:  # only a branch uses its branch address
+            self._defer_branch_address()
+        if Branch or not self.lazy_signals:
+            self.calculate_branch_address()
         if self.next_stage:  # for testing...
             self.send_data_to_next_stage()
 
+    def execute_into(self, latch, read_data1, read_data2, out):
+        """
+        Integer datapath: runs the ALU for the instruction in the ID/EX latch and writes the EX/MEM latch, instead of
+        going through receive_data/receive_control_information
+        :param latch: IDEXLatch
+        :param read_data1: value of rs (after forwarding)
+        :param read_data2: value of rt (after forwarding)
+        :param out: EXMEMLatch to overwrite
+        :return: None
+        """
+        predecoded = latch.predecoded
+        control = predecoded.control
+        operation, branch_equal, branch_not_equal = alu_control_word(control.ALUOp, predecoded.opcode,
+                                                                     predecoded.funct)
+        immediate = latch.immediate
+        alu_output = integer_alu(operation, to_signed_word(read_data1),
+                                 to_signed_word(immediate if control.ALUSrc else read_data2))
+        out.valid = True
+        out.pc = latch.pc
+        out.predecoded = predecoded
+        out.predicted_taken = latch.predicted_taken
+        out.prediction_history = latch.prediction_history
+        out.alu_output = alu_output
+        out.alu_branch = (alu_output == 0) if branch_equal else (alu_output != 0) if branch_not_equal else None
+        out.branch_address = (latch.pc + 4 + (to_signed_word(immediate) << 2)) & WORD_MASK
+        out.write_data = read_data2
+        out.jump_address = latch.jump_address
+        out.write_register = latch.write_register
+
     def process_alu_control(self):
         """
         Method to process the ALU control information and set the corresponding operation for the ALU to perform.
+        The ALU control is looked up in the precomputed table (see control.py) rather than decoded field by field.
         :return: None
         """
-        if self.ALUOp == 0b00:  # LW/SW
-            self.operation = 0b0010  # add
-
-        elif self.ALUOp == 0b01:  # branch
-            self.operation = 0b0110  # subtract
-            if decode_signed_binary_number(self.opcode, 6) == 4:  # branch if equal
-                self.branch_equal = True
-            elif decode_signed_binary_number(self.opcode, 6) == 5:  # branch if not equal
-                self.branch_not_equal = True
-            elif decode_signed_binary_number(self.opcode, 6) == 2: # jump
-                self.branch_equal = False
-                self.branch_not_equal = False
-            else:
-                raise Exception("(Execute): "
-                                "Invalid ALUOp and opcode combination! (branching ALUOp, but opcode != beq or bne")
-
-        elif self.ALUOp == 0b10:  # r-type instruction
-            funct_int = decode_signed_binary_number(self.function_code, 6, True)
-            if funct_int == 32:  # addition
-                self.operation = 0b0010
-
-            elif funct_int == 36:  # logical AND
-                self.operation = 0b0000
-
-            elif funct_int == 26:  # division
-                self.operation = 0b0011
-
-            elif funct_int == 37:  # logical OR
-                self.operation = 0b0001
-
-            elif funct_int == 24:  # multiplication
-                self.operation = 0b0100
-
-            elif funct_int == 42:  # set on less than
-                self.operation = 0b0111
-
-            elif funct_int == 34:  # subtraction
-                self.operation = 0b0110
-
-            elif funct_int == 38:  # exclusive OR
-                self.operation = 0b1000
-            else:
-                raise Exception("(Execute): Invalid ALUOp and function field! "
-                                "(Couldn't decode correct ALU function from funct field!)")
-
-        elif self.ALUOp == 0b11:  # immediate function..
-            if decode_signed_binary_number(self.opcode, 6, True) == 8:  # ADD Immediate
-                self.operation = 0b0010
-            elif decode_signed_binary_number(self.opcode, 6, True) == 12:  # AND Immediate
-                self.operation = 0b0000
-            else:
-                raise Exception("(Execute): Error! Invalid immediate function and opcode combination!")
-
-        else:
-            raise Exception("(Execute): Invalid ALUOp!")
+        word = alu_control_word(self.ALUOp, self.opcode, self.function_code,
+                                ALU_CONTROL if self.integer_datapath else ALU_CONTROL_BY_FIELD)
+        self.operation, self.branch_equal, self.branch_not_equal = word
 
     def set_alu_inputs(self):
         """
@@ -330,6 +617,14 @@ class Execute:
         immediate, depending on the value of ALUSrc.
         :return: None
         """
+        if self.integer_datapath:
+            self.alu_input_1 = to_signed_word(self.read_data1)
+            if self.ALUSrc:
+                self.alu_input_2 = to_signed_word(self.immediate)
+            else:
+                self.alu_input_2 = to_signed_word(self.read_data2)
+            return
+
         if len(self.read_data1) != 32:
             raise Exception("(Execute): data from register 1 isn't 32 bits1")
 
@@ -346,6 +641,14 @@ class Execute:
         Perform the specified ALU Operation and set alu_output, alu_branch accordingly
         :return: None
         """
+        if self.integer_datapath:
+            self.alu_output = integer_alu(self.operation, self.alu_input_1, self.alu_input_2)
+            if self.branch_equal:
+                self.alu_branch = self.alu_output == 0
+            elif self.branch_not_equal:
+                self.alu_branch = self.alu_output != 0
+            return
+
         if self.operation == 0b0000:  # AND
             self.alu_output = self.alu_input_1 & self.alu_input_2
 
@@ -356,6 +659,8 @@ class Execute:
             self.alu_output = self.alu_input_1 + self.alu_input_2
 
         elif self.operation == 0b0011:  # DIV
+            if self.alu_input_2 == 0:
+                raise DivisionByZero("(Execute): Error! Division by zero")
             self.alu_output = self.alu_input_1 / self.alu_input_2
 
         elif self.operation == 0b0100:  # MULT
@@ -388,7 +693,7 @@ class Execute:
             self.alu_output = not (self.alu_input_1 | self.alu_input_2)  # This probably actually doesn't work
 
         else:
-            raise Exception("(Execute): Unsupported ALU operation!")
+            raise UnsupportedInstruction("(Execute): Unsupported ALU operation!")
 
         # convert output to 32-bit binary number
         self.alu_output = create_sized_binary_num(self.alu_output, 32)
@@ -398,7 +703,9 @@ class Execute:
         Calculate the address the branch would take if we do branch
         :return: None
         """
-        if self.immediate:
+        if self.integer_datapath and self.immediate is not None:
+            self.branch_address = (self._program_counter_value + (to_signed_word(self.immediate) << 2)) & WORD_MASK
+        elif self.immediate:
             self.branch_address = create_sized_binary_num(self._program_counter_value +
                                                           (decode_signed_binary_number(self.immediate, 32) << 2), 32)
             if len(self.branch_address) > 32:
@@ -414,18 +721,62 @@ class Execute:
         self.next_stage.receive_control_information(self._Branch, self.alu_branch, self._MemWrite, self._MemRead,
                                              self._MemtoReg, self._jump)
         self.next_stage.receive_data(self._program_counter_value, self._jump_address, self.alu_output,
-                                     self.branch_address, self.read_data2)
+                                     self.branch_address if self._Branch or not self.lazy_signals else None,
+                                     self.read_data2)
 
     def on_rising_clock(self):
         pass
 
 
+class LazyExecute(Execute):
+    """
+    Execute stage that only calculates the branch address for branches (or when something reads it). branch_address
+    is a property here, so the eager Execute keeps it as a plain attribute.
+    """
+    lazy_signals = True
+
+    def __init__(self, next_stage=None, integer_datapath=False):
+        self._branch_address_pending = False  # branch_address hasn't been calculated for this instruction yet
+        self.skipped_branch_addresses = 0  # instructions whose branch address was never calculated
+        super(LazyExecute, self).__init__(next_stage, integer_datapath)
+
+    @property
+    def branch_address(self):
+        if self._branch_address_pending:
+            self.calculate_branch_address()
+        return self._branch_address
+
+    @branch_address.setter
+    def branch_address(self, value):
+        self._branch_address_pending = False
+        self._branch_address = value
+
+    def _defer_branch_address(self):
+        self.skipped_branch_addresses += self._branch_address_pending
+        self._branch_address_pending = True
+
+    def skipped_evaluations(self):
+        """
+        :return: dictionary of signal name -> number of instructions it was never evaluated for
+        """
+        return {'branch_address': self.skipped_branch_addresses + self._branch_address_pending}
+
+    def calculate_branch_address(self):
+        if self.immediate is None and self._branch_address_pending:
+            self.branch_address = None  # the decode stage didn't send an immediate, so there's nothing to branch to
+        else:
+            super(LazyExecute, self).calculate_branch_address()
+
+
 class Memory:
-    def __init__(self, memory_file, next_stage=None):
+    def __init__(self, memory_file, next_stage=None, integer_datapath=False):
         """
         Creates the Memory stage of the pipeline
-        :param memory_file: dictionary representing data memory
+        :param memory_file: dictionary representing data memory (for the integer datapath, any memory model with
+        load_word/store_word, such as DataMemory)
+        :param integer_datapath: if True, addresses and words are ints and go through memory_file.load_word/store_word
         """
+        self.integer_datapath = integer_datapath
         self.Branch = None
         self.alu_branch = None
         self.MemWrite = None
@@ -445,6 +796,11 @@ class Memory:
         self.pc_source = None  # for the mux to choose which address for the program counter to use
         self.pc_address = None  # new address of the program counter after choosing between the branch and inc'd version
 
+        self.cache = None  # data cache (see Cache.py); every load and store is charged its latency
+        self.prefetcher = None  # prefetcher in front of the data cache (see Prefetcher.py)
+        self.cache_cycles = 0
+        self.cache_accesses = 0
+
     def receive_control_information(self, branch, alu_branch, MemWrite, MemRead, MemtoReg, jump):
         """
         Save all of the control signals into attributes
@@ -484,17 +840,85 @@ class Memory:
         if self.next_stage:  # for testing...
             self.send_data_to_next_stage()
 
+    def attach_cache(self, cache, prefetcher=None):
+        """
+        Puts a data cache, and optionally a prefetcher, in front of data memory. A prefetcher on its own brings its
+        cache along; a prefetcher has to prefetch into the cache it is attached with.
+        :param cache: Cache (None for no cache)
+        :param prefetcher: Prefetcher for that cache (None for no prefetching)
+        :return: None
+        """
+        if prefetcher is not None:
+            if cache is None:
+                cache = prefetcher.cache
+            elif prefetcher.cache is not cache:
+                raise Exception("(Memory): Error! The data prefetcher prefetches into a different cache than the data "
+                                "cache")
+        self.cache = cache
+        self.prefetcher = prefetcher
+
+    def _charge_cache(self, pc, address, write):
+        """
+        Charges a load or store the latency of the data cache (through the prefetcher, if there is one)
+        :param pc: address of the load or store
+        :param address: integer byte address it accesses
+        :param write: True for a store
+        :return: None
+        """
+        if self.prefetcher is not None:
+            self.cache_cycles += self.prefetcher.access(pc, address, write)
+        else:
+            self.cache_cycles += self.cache.access(address, write)
+        self.cache_accesses += 1
+
+    def access_into(self, latch, out):
+        """
+        Integer datapath: performs the memory access of the instruction in the EX/MEM latch and writes the MEM/WB
+        latch, instead of going through receive_control_information/receive_data
+        :param latch: EXMEMLatch
+        :param out: MEMWBLatch to overwrite
+        :return: True if the instruction is a taken branch
+        """
+        control = latch.predecoded.control
+        address = latch.alu_output
+        read_data = None
+        if control.MemRead:
+            if self.cache is not None:
+                self._charge_cache(latch.pc, address, False)
+            read_data = self.memory.load_word(address)
+        elif control.MemWrite:
+            if self.cache is not None:
+                self._charge_cache(latch.pc, address, True)
+            self.memory.store_word(address, latch.write_data)
+        out.valid = True
+        out.pc = latch.pc
+        out.predecoded = latch.predecoded
+        out.read_data = read_data
+        out.alu_output = address
+        out.write_register = latch.write_register
+        return bool(control.Branch and latch.alu_branch)
+
     def process_memory_request(self):
+        if self.cache is not None and (self.MemRead or self.MemWrite):
+            address = self.alu_result
+            if not self.integer_datapath:
+                address = decode_signed_binary_number(address, 32) & WORD_MASK
+            self._charge_cache((self.program_counter_value - 4) & WORD_MASK, address, not self.MemRead)
+
+        if self.integer_datapath:
+            self._process_integer_memory_request()
+            return
+
         if self.MemRead:
             if decode_signed_binary_number(self.alu_result, 32) > 511:
-                raise Exception("(Memory): Error! Trying to read data from memory with an invalid address! (%s)",
+                raise MemoryFault("(Memory): Error! Trying to read data from memory with an invalid address! (%s)",
                                 self.alu_result)
             else:
                 self.read_data = self.memory[self.alu_result]
 
         elif self.MemWrite:
             if decode_signed_binary_number(self.alu_result, 32) > 511:
-                raise Exception("(Memory): Error! Trying to write data from memory with an invalid address! (%s)",
+                raise MemoryFault("(Memory): Error! Trying to write data from memory with an invalid address! (%s)",
                                 self.alu_result)
             elif len(self.alu_result) != 32:
                 raise Exception("(Memory): Error! attemping to write non-32 bit value to memory!")
@@ -503,6 +927,21 @@ class Memory:
         elif self.MemtoReg:
             raise Exception("(Memory): Error! MemtoReg is high, but memory isn't being read")
 
+    def _process_integer_memory_request(self):
+        """
+        Same as process_memory_request, but alu_result is an integer address and the memory model does the bounds
+        checking
+        :return: None
+        """
+        if self.MemRead:
+            self.read_data = self.memory.load_word(self.alu_result)
+
+        elif self.MemWrite:
+            self.memory.store_word(self.alu_result, self.write_data)
+
+        elif self.MemtoReg:
+            raise Exception("(Memory): Error! MemtoReg is high, but memory isn't being read")
+
     def process_branch_decision(self):
         """
         sets pc_source high if alu_branch and branch are both true.
@@ -609,3 +1048,186 @@ class WriteBack:
 
     def on_rising_clock(self):
         pass
+
+
+class ForwardingUnit(object):
+    def __init__(self, ex_mem_forwarding=True, mem_wb_forwarding=True):
+        """
+        Forwarding unit for a pipelined datapath. Picks the value of an ALU input from the EX/MEM or MEM/WB pipeline
+        register when an instruction further down the pipeline is about to write the register it reads.
+        :param ex_mem_forwarding: enable the EX/MEM -> EX path
+        :param mem_wb_forwarding: enable the MEM/WB -> EX path
+        """
+        self.ex_mem_forwarding = ex_mem_forwarding
+        self.mem_wb_forwarding = mem_wb_forwarding
+        self.ex_mem_forwards = 0
+        self.mem_wb_forwards = 0
+
+    def select(self, register, value, ex_mem_write, mem_wb_write):
+        """
+        Forwarding mux in front of the ALU
+        :param register: register number the instruction in EX read
+        :param value: value read from the register file in decode
+        :param ex_mem_write: (write_register, value) of the instruction in EX/MEM, or None if it writes nothing
+        (or its value isn't known yet, as for a load)
+        :param mem_wb_write: (write_register, value) of the instruction in MEM/WB, or None if it writes nothing
+        :return: value the ALU should use
+        """
+        if register == 0:
+            return value
+        if self.ex_mem_forwarding and ex_mem_write is not None and ex_mem_write[0] == register:
+            self.ex_mem_forwards += 1
+            return ex_mem_write[1]
+        if self.mem_wb_forwarding and mem_wb_write is not None and mem_wb_write[0] == register:
+            self.mem_wb_forwards += 1
+            return mem_wb_write[1]
+        return value
+
+
+class HazardDetectionUnit(object):
+    def __init__(self, enabled=True):
+        """
+        Hazard detection unit for a pipelined datapath. Stalls decode on data hazards the forwarding unit can't
+        cover (such as load-use), and squashes the instructions behind a taken branch or jump. With it disabled,
+        nothing is stalled and the instructions behind a taken branch or jump run as delay slots.
+        :param enabled: enable hazard detection
+        """
+        self.enabled = enabled
+
+    def stall_cause(self, sources, in_execute, in_memory, forwarding_unit):
+        """
+        Decides whether the instruction in decode has to stall this cycle
+        :param sources: register numbers the instruction in decode reads
+        :param in_execute: (write_register, is_load, pc) of the instruction in EX, or None if it writes nothing
+        :param in_memory: (write_register, is_load, pc) of the instruction in MEM, or None if it writes nothing
+        :param forwarding_unit: ForwardingUnit of the datapath
+        :return: pc of the instruction the decode stage is waiting on, or None if it doesn't have to stall
+        """
+        if not self.enabled:
+            return None
+        if in_execute is not None and in_execute[0] and in_execute[0] in sources:
+            # next cycle the producer sits in EX/MEM, where only an ALU result can be forwarded
+            if in_execute[1] or not forwarding_unit.ex_mem_forwarding:
+                return in_execute[2]
+        if in_memory is not None and in_memory[0] and in_memory[0] in sources:
+            # next cycle the producer sits in MEM/WB
+            if not forwarding_unit.mem_wb_forwarding:
+                return in_memory[2]
+        return None
+
+    def squashes(self):
+        """
+        :return: True if the instructions behind a taken branch or jump are squashed
+        """
+        return self.enabled
+
+
+class Latch(object):
+    """
+    Base class of the pipeline registers. A latch is allocated once and overwritten in place every cycle, and keeps
+    its fields in __slots__, so moving an instruction from one stage to the next allocates nothing.
+    """
+    __slots__ = ('valid', 'pc', 'predecoded')
+
+    def clear(self):
+        """
+        Turns the latch into a bubble
+        :return: None
+        """
+        self.valid = False
+        self.pc = None
+        self.predecoded = None
+
+    def copy_from(self, other):
+        """
+        Copies every field of another latch of the same type (used to hold a latch while decode stalls)
+        :return: None
+        """
+        for name in self._fields:
+            setattr(self, name, getattr(other, name))
+
+
+class IFIDLatch(Latch):
+    __slots__ = ('predicted_taken', 'redirected', 'prediction_history')
+    _fields = Latch.__slots__ + __slots__
+
+    def __init__(self, pc=None, predecoded=None, predicted_taken=False, redirected=False, prediction_history=None):
+        """
+        IF/ID pipeline register
+        :param pc: address of the instruction (None for a bubble)
+        :param predecoded: PredecodedInstruction that was fetched
+        :param predicted_taken: True if the instruction is a branch predicted taken
+        :param redirected: True if fetch already went to the predicted target (branch target buffer hit)
+        :param prediction_history: branch history the branch was predicted with (see BranchPredictor.py)
+        """
+        self.load(pc, predecoded, predicted_taken, redirected, prediction_history)
+
+    def load(self, pc, predecoded, predicted_taken=False, redirected=False, prediction_history=None):
+        self.valid = pc is not None
+        self.pc = pc
+        self.predecoded = predecoded
+        self.predicted_taken = predicted_taken
+        self.redirected = redirected
+        self.prediction_history = prediction_history
+
+
+class IDEXLatch(Latch):
+    __slots__ = ('predicted_taken', 'prediction_history', 'read_data1', 'read_data2', 'immediate', 'jump_address',
+                 'write_register')
+    _fields = Latch.__slots__ + __slots__
+
+    def __init__(self, pc=None, predecoded=None, read_data1=None, read_data2=None, immediate=None, jump_address=None,
+                 write_register=None, predicted_taken=False, prediction_history=None):
+        """
+        ID/EX pipeline register (filled by Decode.decode_into)
+        """
+        self.valid = pc is not None
+        self.pc = pc
+        self.predecoded = predecoded
+        self.predicted_taken = predicted_taken
+        self.prediction_history = prediction_history
+        self.read_data1 = read_data1
+        self.read_data2 = read_data2
+        self.immediate = immediate
+        self.jump_address = jump_address
+        self.write_register = write_register
+
+
+class EXMEMLatch(Latch):
+    __slots__ = ('predicted_taken', 'prediction_history', 'alu_output', 'alu_branch', 'branch_address',
+                 'write_data', 'jump_address', 'write_register')
+    _fields = Latch.__slots__ + __slots__
+
+    def __init__(self, pc=None, predecoded=None, alu_output=None, alu_branch=None, branch_address=None,
+                 write_data=None, jump_address=None, write_register=None, predicted_taken=False,
+                 prediction_history=None):
+        """
+        EX/MEM pipeline register (filled by Execute.execute_into)
+        """
+        self.valid = pc is not None
+        self.pc = pc
+        self.predecoded = predecoded
+        self.predicted_taken = predicted_taken
+        self.prediction_history = prediction_history
+        self.alu_output = alu_output
+        self.alu_branch = alu_branch
+        self.branch_address = branch_address
+        self.write_data = write_data
+        self.jump_address = jump_address
+        self.write_register = write_register
+
+
+class MEMWBLatch(Latch):
+    __slots__ = ('read_data', 'alu_output', 'write_register')
+    _fields = Latch.__slots__ + __slots__
+
+    def __init__(self, pc=None, predecoded=None, read_data=None, alu_output=None, write_register=None):
+        """
+        MEM/WB pipeline register (filled by Memory.access_into)
+        """
+        self.valid = pc is not None
+        self.pc = pc
+        self.predecoded = predecoded
+        self.read_data = read_data
+        self.alu_output = alu_output
+        self.write_register = write_register
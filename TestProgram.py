@@ -83,20 +83,13 @@ print("Starting Program Execution... *crosses fingers*")
 print("-----------------------------------------------------------------------")
 
 clocks = 0
-while True:
-    try:
-        interface.trigger_clock_cycle()
-        print("Instruction: ", interface.retrive_instruction_name())
-        # print("PC: ", interface.retrieve_current_pc_address())
-        clocks += 1
-        print("Clock Cycle: ", clocks)
-        print("\n")
-
-    except Exception as e:
-        if "Invalid Instruction Address" in str(e):
-            break
-        else:
-            raise Exception(str(e))
+while not interface.halted:
+    interface.trigger_clock_cycle()
+    print("Instruction: ", interface.retrive_instruction_name())
+    # print("PC: ", interface.retrieve_current_pc_address())
+    clocks += 1
+    print("Clock Cycle: ", clocks)
+    print("\n")
 
 print("-----------------------------------------------------------------------")
 print("Execution completed in " + str(clocks) + " clock cycles.")
@@ -0,0 +1,199 @@
+"""
+ThreadedSimulator.py
+
+Threaded code version of the functional simulator. Each instruction in the program is turned into a specialized
+closure once, when the simulator is created, with its register numbers, sign-extended immediate and branch/jump
+target baked in. Running the program is then just calling the closure for the current program counter, with no
+control decoding or ALU selection left to do per instruction.
+"""
+from Decoder import FUNCT_TABLE
+from Faults import UnsupportedInstruction
+from FunctionalSimulator import FunctionalSimulator, divide_word
+from Instruction import to_signed_word, WORD_MASK
+
+
+def _unsupported(message):
+    """
+    :return: closure for an instruction the simulator doesn't implement, which faults when it runs (as in
+    FunctionalSimulator) rather than when the program is compiled
+    """
+    def unsupported():
+        raise UnsupportedInstruction(message)
+    return unsupported
+
+
+class ThreadedSimulator(FunctionalSimulator):
+    def __init__(self, instruction_list, starting_pc_address, register_memory, data_mem):
+        """
+        Creates the simulator and compiles the program. Takes the same arguments as FunctionalSimulator.
+        """
+        self.compiled_program = None
+        super(ThreadedSimulator, self).__init__(instruction_list, starting_pc_address, register_memory, data_mem)
+
+    def _build_dispatch_tables(self):
+        """
+        Instead of dispatch tables, compile every instruction into a closure that returns the next program counter
+        :return: None
+        """
+        self.compiled_program = [self._compile_instruction(entry, self.base_address + 4 * index)
+                                 for index, entry in enumerate(self.predecoded_instructions)]
+
+    def _compile_instruction(self, entry, pc):
+        """
+        Builds the closure for a single instruction
+        :param entry: PredecodedInstruction
+        :param pc: address of the instruction
+        :return: function taking no arguments and returning the next program counter
+        """
+        regs = self.register_file.words
+        load_word = self.memory.load_word
+        store_word = self.memory.store_word
+        next_pc = (pc + 4) & WORD_MASK
+        rs, rt, rd, immediate = entry.rs, entry.rt, entry.rd, entry.immediate
+
+        if entry.opcode == 0:
+            if entry.funct not in FUNCT_TABLE:
+                return _unsupported("(ThreadedSimulator): Error! Unsupported funct field (%d)" % entry.funct)
+            # nothing can be written to $zero, so the instruction does nothing (but a div can still divide by zero)
+            if rd == 0 and entry.funct != 26:
+                def nop():
+                    return next_pc
+                return nop
+
+            if entry.funct == 32:
+                def add():
+                    regs[rd] = (regs[rs] + regs[rt]) & WORD_MASK
+                    return next_pc
+                return add
+            elif entry.funct == 34:
+                def sub():
+                    regs[rd] = (regs[rs] - regs[rt]) & WORD_MASK
+                    return next_pc
+                return sub
+            elif entry.funct == 36:
+                def and_():
+                    regs[rd] = regs[rs] & regs[rt]
+                    return next_pc
+                return and_
+            elif entry.funct == 37:
+                def or_():
+                    regs[rd] = regs[rs] | regs[rt]
+                    return next_pc
+                return or_
+            elif entry.funct == 38:
+                def xor():
+                    regs[rd] = regs[rs] ^ regs[rt]
+                    return next_pc
+                return xor
+            elif entry.funct == 42:
+                def slt():
+                    regs[rd] = 1 if to_signed_word(regs[rs]) < to_signed_word(regs[rt]) else 0
+                    return next_pc
+                return slt
+            elif entry.funct == 24:
+                def mult():
+                    regs[rd] = (to_signed_word(regs[rs]) * to_signed_word(regs[rt])) & WORD_MASK
+                    return next_pc
+                return mult
+            elif rd == 0:
+                def discarded_div():
+                    divide_word(regs[rs], regs[rt])
+                    return next_pc
+                return discarded_div
+            else:
+                def div():
+                    regs[rd] = divide_word(regs[rs], regs[rt])
+                    return next_pc
+                return div
+
+        elif entry.opcode == 8:  # addi
+            if rt == 0:
+                def nop():
+                    return next_pc
+                return nop
+            if rs == 0:  # addi $x, $zero, imm is just a constant load
+                def load_constant():
+                    regs[rt] = immediate
+                    return next_pc
+                return load_constant
+
+            def addi():
+                regs[rt] = (regs[rs] + immediate) & WORD_MASK
+                return next_pc
+            return addi
+
+        elif entry.opcode == 12:  # andi, with the sign-extended immediate like the ALU
+            if rt == 0:
+                def nop():
+                    return next_pc
+                return nop
+
+            def andi():
+                regs[rt] = regs[rs] & immediate
+                return next_pc
+            return andi
+
+        elif entry.opcode == 4 or entry.opcode == 5:
+            branch_target = (next_pc + (immediate << 2)) & WORD_MASK
+            if entry.opcode == 4:
+                def beq():
+                    return branch_target if regs[rs] == regs[rt] else next_pc
+                return beq
+
+            def bne():
+                return branch_target if regs[rs] != regs[rt] else next_pc
+            return bne
+
+        elif entry.opcode == 35:
+            def lw():
+                value = load_word((regs[rs] + immediate) & WORD_MASK)
+                if rt:
+                    regs[rt] = value
+                return next_pc
+            return lw
+
+        elif entry.opcode == 43:
+            def sw():
+                store_word((regs[rs] + immediate) & WORD_MASK, regs[rt])
+                return next_pc
+            return sw
+
+        elif entry.opcode == 2:
+            jump_target = (next_pc & 0xF0000000) | (entry.address << 2)
+
+            def jump():
+                return jump_target
+            return jump
+
+        else:
+            return _unsupported("(ThreadedSimulator): Error! Unsupported opcode (%d)" % entry.opcode)
+
+    def run(self, max_instructions=None):
+        """
+        Executes instructions until the program counter leaves instruction memory or max_instructions have run.
+        :param max_instructions: instruction budget for this call (None for no limit)
+        :return: number of instructions executed by this call
+        """
+        program = self.compiled_program
+        program_length = len(program)
+        base_address = self.base_address
+        pc = self.program_counter
+        count = 0
+
+        try:
+            while True:
+                index = (pc - base_address) >> 2
+                if index < 0 or index >= program_length:
+                    self.halted = True
+                    break
+                if max_instructions is not None and count >= max_instructions:
+                    break
+                pc = program[index]()
+                count += 1
+        except Exception:
+            self.fault_pc = pc
+            raise
+        finally:
+            self.program_counter = pc
+            self.instructions_executed += count
+        return count
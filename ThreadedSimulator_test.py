@@ -0,0 +1,76 @@
+import unittest
+
+from Faults import DivisionByZero, UnsupportedInstruction
+from ThreadedSimulator import ThreadedSimulator
+from FunctionalSimulator import FunctionalSimulator
+from Instruction import Instruction, decode_asm_register
+from Interface_test import build_test_program
+
+
+class ThreadedSimulatorTest(unittest.TestCase):
+    def assert_same_state(self, instructions, registers, memory):
+        functional = FunctionalSimulator(instructions, 0, list(registers), dict(memory))
+        threaded = ThreadedSimulator(instructions, 0, list(registers), dict(memory))
+
+        self.assertEqual(functional.run(), threaded.run())
+        self.assertTrue(threaded.halted)
+        self.assertEqual(functional.retrieve_current_pc_address(), threaded.retrieve_current_pc_address())
+        self.assertEqual(list(functional.retrieve_register_list()), list(threaded.retrieve_register_list()))
+        self.assertEqual(bytes(functional.retrieve_data_memory().view()),
+                         bytes(threaded.retrieve_data_memory().view()))
+
+    def test_test_program_matches_functional_simulator(self):
+        self.assert_same_state(*build_test_program())
+
+    def test_alu_instructions_match_functional_simulator(self):
+        instructions = [Instruction('addi', '$t0', '$zero', '3'), Instruction('addi', '$t1', '$zero', '-7'),
+                        Instruction('addi', '$t1', '$t1', '1'), Instruction('add', '$t2', '$t1', '$t0'),
+                        Instruction('sub', '$t3', '$t1', '$t0'), Instruction('and', '$t4', '$t1', '$t0'),
+                        Instruction('or', '$t5', '$t1', '$t0'), Instruction('xor', '$t6', '$t1', '$t0'),
+                        Instruction('slt', '$t7', '$t1', '$t0'), Instruction('mult', '$s0', '$t1', '$t0'),
+                        Instruction('div', '$s1', '$t1', '$t0'), Instruction('andi', '$s2', '$t1', '-4'),
+                        Instruction('add', '$zero', '$t1', '$t0'), Instruction('bne', '$t0', '$zero', '0'),
+                        Instruction('beq', '$t0', '$zero', '-5')]
+        self.assert_same_state(instructions, [0] * 32, {})
+
+    def test_branch_targets_are_baked_in(self):
+        instructions = [Instruction('addi', '$t0', '$zero', '2'), Instruction('addi', '$t0', '$t0', '-1'),
+                        Instruction('bne', '$t0', '$zero', '-2'), Instruction('j', '0')]
+        simulator = ThreadedSimulator(instructions, 0, [0] * 32, {})
+        self.assertEqual(12, simulator.compiled_program[2]())  # not taken, $t0 is still 0
+        self.assertEqual(0, simulator.compiled_program[3]())
+        self.assertEqual(6, simulator.run(6))
+        self.assertEqual(0, simulator.retrieve_current_pc_address())
+
+    def test_lw_and_sw(self):
+        instructions = [Instruction('sw', '$t6', '$a0', '4'), Instruction('lw', '$t0', '$a0', '4')]
+        registers = [0] * 32
+        registers[decode_asm_register('a0')] = 8
+        registers[decode_asm_register('t6')] = 1995
+        simulator = ThreadedSimulator(instructions, 0, registers, {})
+        simulator.run()
+        self.assertEqual(1995, simulator.retrieve_data_memory().load_word(12))
+        self.assertEqual(1995, simulator.retrieve_register_list()[decode_asm_register('t0')])
+
+    def test_unsupported_instructions_fault_when_run(self):
+        # funct 8 (jr) with rd = 0, and opcode 63
+        for word in [0x00000008, 0xFC000000]:
+            words = [int(Instruction('addi', '$t0', '$zero', '3').binary_version(), 2), word]
+            functional = FunctionalSimulator(words, 0, [0] * 32, {})
+            threaded = ThreadedSimulator(words, 0, [0] * 32, {})
+            self.assertRaises(UnsupportedInstruction, functional.run)
+            self.assertRaises(UnsupportedInstruction, threaded.run)
+            self.assertEqual(4, threaded.fault_pc)
+            self.assertEqual(functional.instructions_executed, threaded.instructions_executed)
+            self.assertEqual(list(functional.retrieve_register_list()), list(threaded.retrieve_register_list()))
+
+    def test_division_by_zero_into_zero_register(self):
+        instructions = [Instruction('addi', '$t1', '$zero', '7'), Instruction('div', '$zero', '$t1', '$t2')]
+        simulator = ThreadedSimulator(instructions, 0, [0] * 32, {})
+        with self.assertRaises(DivisionByZero):
+            simulator.run()
+        self.assertEqual(4, simulator.fault_pc)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+assembler_benchmark.py
+
+Times the assembler on a large generated source file: a mix of labelled addi instructions with comments and
+branches to the next label, so every line goes through the tokenizer, the label pass and the encoder.
+
+    python assembler_benchmark.py [lines]
+"""
+import sys
+import time
+
+from Assembler import assemble
+
+
+def generate_source(lines):
+    """
+    :param lines: number of instructions in the program
+    :return: assembly source with one instruction per line
+    """
+    source = ['        .text', 'start:']
+    for index in range(lines):
+        if index % 3:
+            source.append('l%d: addi $t%d, $t%d, %d  # comment' % (index, index % 8, (index + 1) % 8, index % 1000))
+        else:
+            source.append('    beq $t0, $t1, l%d' % (index + 1))
+    source.append('l%d:' % lines)
+    return '\n'.join(source)
+
+
+def time_assemble(source):
+    """
+    :return: seconds to assemble source
+    """
+    started = time.perf_counter()
+    assemble(source)
+    return time.perf_counter() - started
+
+
+def main(lines=100000):
+    elapsed = time_assemble(generate_source(lines))
+    print("assembled %d lines: %.3fs (%.0f lines per second)" % (lines, elapsed, lines / elapsed))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
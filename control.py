@@ -1,6 +1,45 @@
 """
-Implements the main control functions for the pipeline (not ALU Control!)
+Implements the main control functions for the pipeline, and the ALU control lookup used by the Execute stage
+
+Both are read-only tables built once, when the module is imported: CONTROL_ROM maps every opcode to an immutable
+ControlWord, and ALU_CONTROL maps (ALUOp, funct or opcode) to an immutable AluControlWord. Decoding an instruction is
+then a dictionary lookup that hands out a shared reference, instead of an if/elif chain that re-parses the opcode
+string and sets every signal one by one.
 """
+from collections import namedtuple
+
+from Faults import UnsupportedInstruction
+
+# Main control signals of one opcode. Field names match the attributes of Control, so either can be used where the
+# pipeline reads control signals.
+ControlWord = namedtuple('ControlWord', ['RegDst', 'Branch', 'MemRead', 'MemtoReg', 'ALUOp', 'MemWrite', 'ALUSrc',
+                                         'RegWrite', 'jump'])
+
+# Control word of an opcode the simulator doesn't know (every signal unset)
+UNKNOWN_CONTROL = ControlWord(None, None, None, None, None, None, None, None, None)
+
+_R_FORMAT = ControlWord(RegDst=True, Branch=False, MemRead=False, MemtoReg=False, ALUOp=0b10, MemWrite=False,
+                        ALUSrc=False, RegWrite=True, jump=False)
+_BRANCH = ControlWord(RegDst=False, Branch=True, MemRead=False, MemtoReg=False, ALUOp=0b01, MemWrite=False,
+                      ALUSrc=False, RegWrite=False, jump=False)  # TODO: Distinguish these in the ALUControl
+_LOAD_WORD = ControlWord(RegDst=False, Branch=False, MemRead=True, MemtoReg=True, ALUOp=0b00, MemWrite=False,
+                         ALUSrc=True, RegWrite=True, jump=False)
+_STORE_WORD = ControlWord(RegDst=False, Branch=False, MemRead=False, MemtoReg=False, ALUOp=0b00, MemWrite=True,
+                          ALUSrc=True, RegWrite=False, jump=False)
+_IMMEDIATE = ControlWord(RegDst=False, Branch=False, MemRead=False, MemtoReg=False, ALUOp=0b11, MemWrite=False,
+                         ALUSrc=True, RegWrite=True, jump=False)
+_JUMP = ControlWord(RegDst=False, Branch=False, MemRead=False, MemtoReg=False, ALUOp=0b01, MemWrite=False,
+                    ALUSrc=False, RegWrite=False, jump=True)
+
+# opcode (int) -> ControlWord
+CONTROL_ROM = {0: _R_FORMAT,  # R-Format
+               4: _BRANCH, 5: _BRANCH,  # BEQ, BNE
+               35: _LOAD_WORD, 43: _STORE_WORD,
+               8: _IMMEDIATE, 12: _IMMEDIATE,  # ADD immediate, AND immediate
+               2: _JUMP}
+
+# 6-bit binary opcode string -> ControlWord, for the binary string datapath
+CONTROL_ROM_BY_FIELD = {format(opcode, '06b'): word for opcode, word in CONTROL_ROM.items()}
 
 
 class Control(object):
@@ -19,69 +58,77 @@ class Control(object):
         self.jump = None
 
     def update(self, opcode):
-        opcode = int(opcode, 2)
-        if opcode == 0:  # R-Format
-            self.RegDst = True
-            self.ALUSrc = False
-            self.MemtoReg = False
-            self.RegWrite = True
-            self.MemRead = False
-            self.MemWrite = False
-            self.Branch = False
-            self.ALUOp = 0b10
-            self.jump = False
-
-        elif opcode == 4 or opcode == 5:  # BEQ, BNE
-            self.RegDst = False
-            self.ALUSrc = False
-            self.MemtoReg = False
-            self.RegWrite = False
-            self.MemRead = False
-            self.MemWrite = False
-            self.Branch = True
-            self.ALUOp = 0b01  # TODO: Distinguish these in the ALUControl
-            self.jump = False
-
-        elif opcode == 35:  # Load Word
-            self.RegDst = False
-            self.ALUSrc = True
-            self.MemtoReg = True
-            self.RegWrite = True
-            self.MemRead = True
-            self.MemWrite = False
-            self.Branch = False
-            self.ALUOp = 0b00
-            self.jump = False
-
-        elif opcode == 43:  # Store Word
-            self.RegDst = False
-            self.ALUSrc = True
-            self.MemtoReg = False
-            self.RegWrite = False
-            self.MemRead = False
-            self.MemWrite = True
-            self.Branch = False
-            self.ALUOp = 0b00
-            self.jump = False
-
-        elif opcode == 8 or opcode == 12:  # ADD immediate, AND immediate
-            self.RegDst = False
-            self.ALUSrc = True
-            self.MemtoReg = False
-            self.RegWrite = True
-            self.MemRead = False
-            self.MemWrite = False
-            self.Branch = False
-            self.ALUOp = 0b11  # TODO: add logic in the ALU control to deal with immediates
-            self.jump = False
-
-        elif opcode == 2:  # Jump instruction
-            self.RegDst = False
-            self.ALUSrc = False
-            self.MemtoReg = False
-            self.RegWrite = False
-            self.MemRead = False
-            self.MemWrite = False
-            self.Branch = False
-            self.ALUOp = 0b01
-            self.jump = True
+        """
+        Sets every control signal from the control ROM. An unknown opcode leaves the signals as they were.
+        :param opcode: 6-bit binary opcode string
+        :return: None
+        """
+        word = CONTROL_ROM_BY_FIELD.get(opcode)
+        if word is not None:
+            (self.RegDst, self.Branch, self.MemRead, self.MemtoReg, self.ALUOp, self.MemWrite, self.ALUSrc,
+             self.RegWrite, self.jump) = word
+
+
+def precomputed_control(opcode):
+    """
+    Returns the ControlWord for the opcode. The same (immutable) object is shared by every instruction with that
+    opcode.
+    :param opcode: integer opcode
+    :return: ControlWord (UNKNOWN_CONTROL for an opcode the simulator doesn't know)
+    """
+    return CONTROL_ROM.get(opcode, UNKNOWN_CONTROL)
+
+
+# ALU control: the operation for the ALU, and which comparison a branch makes on the result of the subtraction
+AluControlWord = namedtuple('AluControlWord', ['operation', 'branch_equal', 'branch_not_equal'])
+
+ALU_AND, ALU_OR, ALU_ADD, ALU_DIV, ALU_MULT, ALU_SUB, ALU_SLT, ALU_XOR = (0b0000, 0b0001, 0b0010, 0b0011, 0b0100,
+                                                                         0b0110, 0b0111, 0b1000)
+
+# (ALUOp, selector) -> AluControlWord. The selector is the funct field for R-format instructions (ALUOp 0b10), the
+# opcode for branches and jumps (0b01) and immediates (0b11), and None for loads and stores (0b00), which always add.
+ALU_CONTROL = {(0b00, None): AluControlWord(ALU_ADD, False, False),  # LW/SW
+               (0b01, 4): AluControlWord(ALU_SUB, True, False),  # branch if equal
+               (0b01, 5): AluControlWord(ALU_SUB, False, True),  # branch if not equal
+               (0b01, 2): AluControlWord(ALU_SUB, False, False),  # jump
+               (0b10, 32): AluControlWord(ALU_ADD, False, False),
+               (0b10, 36): AluControlWord(ALU_AND, False, False),
+               (0b10, 26): AluControlWord(ALU_DIV, False, False),
+               (0b10, 37): AluControlWord(ALU_OR, False, False),
+               (0b10, 24): AluControlWord(ALU_MULT, False, False),
+               (0b10, 42): AluControlWord(ALU_SLT, False, False),
+               (0b10, 34): AluControlWord(ALU_SUB, False, False),
+               (0b10, 38): AluControlWord(ALU_XOR, False, False),
+               (0b11, 8): AluControlWord(ALU_ADD, False, False),  # ADD Immediate
+               (0b11, 12): AluControlWord(ALU_AND, False, False)}  # AND Immediate
+
+# Same table with the selector as a 6-bit binary string, for the binary string datapath
+ALU_CONTROL_BY_FIELD = {(alu_op, selector if selector is None else format(selector, '06b')): word
+                        for (alu_op, selector), word in ALU_CONTROL.items()}
+
+# Error raised when (ALUOp, selector) isn't in the table, by ALUOp
+ALU_CONTROL_ERRORS = {0b01: "(Execute): Invalid ALUOp and opcode combination! (branching ALUOp, but opcode != beq or "
+                            "bne",
+                      0b10: "(Execute): Invalid ALUOp and function field! (Couldn't decode correct ALU function from "
+                            "funct field!)",
+                      0b11: "(Execute): Error! Invalid immediate function and opcode combination!"}
+
+
+def alu_control_word(alu_op, opcode, funct, table=ALU_CONTROL):
+    """
+    Looks up the ALU control for an instruction
+    :param alu_op: ALUOp from the main control
+    :param opcode: opcode field (int, or binary string with ALU_CONTROL_BY_FIELD)
+    :param funct: funct field (int, or binary string with ALU_CONTROL_BY_FIELD)
+    :param table: ALU_CONTROL, or ALU_CONTROL_BY_FIELD for binary string fields
+    :return: AluControlWord. Raises UnsupportedInstruction if the table has no entry for the instruction.
+    """
+    if alu_op == 0b10:
+        word = table.get((0b10, funct))
+    elif alu_op == 0b00:
+        word = table[(0b00, None)]
+    else:
+        word = table.get((alu_op, opcode))
+    if word is None:
+        raise UnsupportedInstruction(ALU_CONTROL_ERRORS.get(alu_op, "(Execute): Invalid ALUOp!"))
+    return word
@@ -0,0 +1,120 @@
+"""
+control_benchmark.py
+
+Microbenchmark of the main control and ALU control decode for one instruction on the binary string datapath: the
+if/elif chains the pipeline used to run (an equivalent copy is kept here as the reference) against the lookups in
+the precomputed tables of control.py.
+
+    python control_benchmark.py [iterations]
+"""
+import sys
+import time
+
+from control import ALU_CONTROL_BY_FIELD, alu_control_word, CONTROL_ROM_BY_FIELD, UNKNOWN_CONTROL
+from Instruction import Instruction, decode_signed_binary_number
+
+BENCHMARK_INSTRUCTIONS = [Instruction('add', '$t1', '$t2', '$t3'), Instruction('addi', '$t1', '$t1', '1'),
+                          Instruction('lw', '$t0', '$a0', '0'), Instruction('sw', '$t0', '$a0', '4'),
+                          Instruction('beq', '$t0', '$t1', '2'), Instruction('slt', '$t2', '$t0', '$t1'),
+                          Instruction('j', '0'), Instruction('xor', '$t3', '$t3', '$t2')]
+
+
+class _ChainControl(object):
+    """
+    The main control and ALU control decode as they were written before the tables
+    """
+    def update(self, opcode):
+        opcode = int(opcode, 2)
+        if opcode == 0:
+            (self.RegDst, self.ALUSrc, self.MemtoReg, self.RegWrite, self.MemRead, self.MemWrite, self.Branch,
+             self.ALUOp, self.jump) = (True, False, False, True, False, False, False, 0b10, False)
+        elif opcode == 4 or opcode == 5:
+            (self.RegDst, self.ALUSrc, self.MemtoReg, self.RegWrite, self.MemRead, self.MemWrite, self.Branch,
+             self.ALUOp, self.jump) = (False, False, False, False, False, False, True, 0b01, False)
+        elif opcode == 35:
+            (self.RegDst, self.ALUSrc, self.MemtoReg, self.RegWrite, self.MemRead, self.MemWrite, self.Branch,
+             self.ALUOp, self.jump) = (False, True, True, True, True, False, False, 0b00, False)
+        elif opcode == 43:
+            (self.RegDst, self.ALUSrc, self.MemtoReg, self.RegWrite, self.MemRead, self.MemWrite, self.Branch,
+             self.ALUOp, self.jump) = (False, True, False, False, False, True, False, 0b00, False)
+        elif opcode == 8 or opcode == 12:
+            (self.RegDst, self.ALUSrc, self.MemtoReg, self.RegWrite, self.MemRead, self.MemWrite, self.Branch,
+             self.ALUOp, self.jump) = (False, True, False, True, False, False, False, 0b11, False)
+        elif opcode == 2:
+            (self.RegDst, self.ALUSrc, self.MemtoReg, self.RegWrite, self.MemRead, self.MemWrite, self.Branch,
+             self.ALUOp, self.jump) = (False, False, False, False, False, False, False, 0b01, True)
+
+    def alu_control(self, opcode_field, funct_field):
+        if self.ALUOp == 0b00:
+            self.operation = 0b0010
+        elif self.ALUOp == 0b01:
+            self.operation = 0b0110
+            opcode = decode_signed_binary_number(opcode_field, 6, True)
+            self.branch_equal = False
+            self.branch_not_equal = False
+            if opcode == 4:
+                self.branch_equal = True
+            elif opcode == 5:
+                self.branch_not_equal = True
+            elif opcode == 2:
+                pass
+            else:
+                raise Exception("(Execute): Invalid ALUOp and opcode combination!")
+        elif self.ALUOp == 0b10:
+            funct = decode_signed_binary_number(funct_field, 6, True)
+            for value, operation in ((32, 0b0010), (36, 0b0000), (26, 0b0011), (37, 0b0001), (24, 0b0100),
+                                     (42, 0b0111), (34, 0b0110), (38, 0b1000)):
+                if funct == value:
+                    self.operation = operation
+                    break
+            else:
+                raise Exception("(Execute): Invalid ALUOp and function field!")
+        elif self.ALUOp == 0b11:
+            opcode = decode_signed_binary_number(opcode_field, 6, True)
+            if opcode == 8:
+                self.operation = 0b0010
+            elif opcode == 12:
+                self.operation = 0b0000
+            else:
+                raise Exception("(Execute): Error! Invalid immediate function and opcode combination!")
+
+
+def time_chains(iterations):
+    """
+    :return: seconds to decode the benchmark instructions iterations times with the if/elif chains
+    """
+    control = _ChainControl()
+    fields = [(instruction.opcode, instruction.function_field) for instruction in BENCHMARK_INSTRUCTIONS]
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for opcode, funct in fields:
+            control.update(opcode)
+            control.alu_control(opcode, funct)
+    return time.perf_counter() - started
+
+
+def time_tables(iterations):
+    """
+    :return: seconds to decode the benchmark instructions iterations times with the control ROM and ALU control table
+    """
+    fields = [(instruction.opcode, instruction.function_field) for instruction in BENCHMARK_INSTRUCTIONS]
+    rom = CONTROL_ROM_BY_FIELD
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for opcode, funct in fields:
+            control = rom.get(opcode, UNKNOWN_CONTROL)
+            alu_control_word(control.ALUOp, opcode, funct, ALU_CONTROL_BY_FIELD)
+    return time.perf_counter() - started
+
+
+def main(iterations=20000):
+    decodes = iterations * len(BENCHMARK_INSTRUCTIONS)
+    chains = time_chains(iterations)
+    tables = time_tables(iterations)
+    print("if/elif chains: %.3fs (%.0f ns per instruction)" % (chains, 1e9 * chains / decodes))
+    print("lookup tables:  %.3fs (%.0f ns per instruction)" % (tables, 1e9 * tables / decodes))
+    print("speedup:        %.1fx" % (chains / tables))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
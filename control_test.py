@@ -1,5 +1,6 @@
 import unittest
-from control import Control
+from control import alu_control_word, ALU_CONTROL, ALU_CONTROL_BY_FIELD, ALU_SUB, Control, CONTROL_ROM, \
+    precomputed_control, UNKNOWN_CONTROL
 from Instruction import create_sized_binary_num
 
 
@@ -120,6 +121,42 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(0b01, control.ALUOp)
         self.assertEqual(True, control.jump)
 
+    def test_precomputed_control_lw(self):
+        control = precomputed_control(35)
+        self.assertEqual(True, control.MemRead)
+        self.assertEqual(True, control.MemtoReg)
+        self.assertEqual(0b00, control.ALUOp)
+
+    def test_precomputed_control_is_shared(self):
+        self.assertIs(precomputed_control(4), precomputed_control(4))
+        self.assertIsNot(precomputed_control(4), precomputed_control(0))
+
+    def test_control_words_are_immutable(self):
+        with self.assertRaises(AttributeError):
+            precomputed_control(0).RegWrite = False
+        self.assertIs(UNKNOWN_CONTROL, precomputed_control(63))
+
+    def test_update_matches_rom(self):
+        for opcode, word in CONTROL_ROM.items():
+            control = Control()
+            control.update(create_sized_binary_num(opcode, 6))
+            self.assertEqual(word, tuple(getattr(control, field) for field in word._fields))
+        control.update(create_sized_binary_num(63, 6))  # unknown opcodes leave the signals alone
+        self.assertEqual(True, control.jump)
+
+    def test_alu_control(self):
+        self.assertEqual((ALU_SUB, True, False), alu_control_word(0b01, 4, None))
+        self.assertEqual((ALU_SUB, False, True), alu_control_word(0b01, '000101', None, ALU_CONTROL_BY_FIELD))
+        self.assertEqual(alu_control_word(0b10, 0, 42), alu_control_word(0b10, '000000', '101010',
+                                                                         ALU_CONTROL_BY_FIELD))
+        self.assertIs(alu_control_word(0b00, None, None), alu_control_word(0b00, 35, 0))
+        self.assertEqual(len(ALU_CONTROL), len(ALU_CONTROL_BY_FIELD))
+        for alu_op, opcode, funct, message in [(0b10, 0, 0, 'function field'), (0b01, 8, 0, 'opcode combination'),
+                                               (0b11, 4, 0, 'immediate'), (None, 0, 0, 'Invalid ALUOp!')]:
+            with self.assertRaises(Exception) as cm:
+                alu_control_word(alu_op, opcode, funct)
+            self.assertIn(message, str(cm.exception))
+
 
 if __name__ == '__main__':
     unittest.main()